@@ -16,6 +16,8 @@ import network
 import os
 import time
 import binascii
+import hashlib
+import struct
 
 gc.collect()
 
@@ -34,6 +36,14 @@ except Exception:
 MIN_MPY = 2000
 LAN_OTA = 'http://192.168.1.219:9019'
 DEFAULT_HOST = 'update.immenseaccumulationonline.online'
+# OTA source selection: the last source that worked goes first, and every
+# candidate must accept a TCP connect within PROBE_TIMEOUT_S before it gets a
+# real request. Off-LAN, the dead LAN address costs seconds instead of minutes;
+# worst case is about hosts * PROBE_TIMEOUT_S + OTA_ATTEMPTS * OTA_TIMEOUT_S.
+OTA_SRC = '/ota_src.txt'
+PROBE_TIMEOUT_S = 2
+OTA_TIMEOUT_S = 12
+OTA_ATTEMPTS = 2
 
 # Load saved provisioning FIRST — before any BLE
 ssid = ''
@@ -58,11 +68,7 @@ except OSError:
     pass
 
 
-def http_get_bytes(url, timeout_s=25):
-    try:
-        import usocket as socket
-    except ImportError:
-        import socket
+def split_url(url):
     if not url.startswith('http://'):
         raise ValueError('http only')
     rest = url[7:]
@@ -74,42 +80,80 @@ def http_get_bytes(url, timeout_s=25):
         port = int(ps)
     else:
         host, port = hostport, 80
-    print('GET', host, port, path)
+    return host, port, path
+
+
+def tcp_socket(host, port, timeout_s):
+    try:
+        import usocket as socket
+    except ImportError:
+        import socket
     ai = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
-    addr = ai[0][-1]
     s = socket.socket()
     s.settimeout(timeout_s)
     try:
-        s.connect(addr)
-        req = b'GET %s HTTP/1.0\r\nHost: %s\r\nConnection: close\r\n\r\n' % (
+        s.connect(ai[0][-1])
+    except Exception:
+        s.close()
+        raise
+    return s
+
+
+def probe(base):
+    """True if base accepts a TCP connection within PROBE_TIMEOUT_S; a bad URL
+    is just another failed candidate."""
+    try:
+        host, port, _ = split_url(base)
+        tcp_socket(host, port, PROBE_TIMEOUT_S).close()
+        return True
+    except Exception as e:
+        print('probe fail', base, e)
+        return False
+
+
+def http_open(url, timeout_s=OTA_TIMEOUT_S, etag=None):
+    """GET url (If-None-Match etag). Returns (socket at the body, status, ETag,
+    Content-Length or -1); the caller closes the socket."""
+    host, port, path = split_url(url)
+    print('GET', host, port, path)
+    s = tcp_socket(host, port, timeout_s)
+    tag = None
+    length = -1
+    try:
+        req = b'GET %s HTTP/1.0\r\nHost: %s\r\nConnection: close\r\n' % (
             path.encode(), host.encode())
-        s.send(req)
-        buf = b''
+        if etag:
+            req += b'If-None-Match: "%s"\r\n' % etag.encode()
+        s.send(req + b'\r\n')
+        status = s.readline()
+        if not status.startswith(b'HTTP/'):
+            raise OSError('no http headers')
         while True:
-            try:
-                chunk = s.recv(1024)
-            except OSError:
-                break
-            if not chunk:
+            line = s.readline()
+            if line in (b'\r\n', b''):
                 break
-            buf += chunk
-            if len(buf) > 40000:
-                break
-    finally:
-        try:
-            s.close()
-        except Exception:
-            pass
-    if b'\r\n\r\n' not in buf:
-        raise OSError('no http headers')
-    header, body = buf.split(b'\r\n\r\n', 1)
-    if b' 200' not in header.split(b'\r\n', 1)[0]:
-        raise OSError(header.split(b'\r\n', 1)[0].decode('utf-8', 'ignore'))
-    return body
-
-
-def ota_urls():
-    urls = [LAN_OTA + '/secondary.mpy']
+            k, _, v = line.partition(b':')
+            k = k.strip().lower()
+            if k == b'etag':
+                # Cloudflare may weaken it; the sha256 inside is what matters
+                tag = v.strip().replace(b'W/', b'').strip(b'"').decode()
+            elif k == b'content-length':
+                length = int(v)
+    except Exception:
+        s.close()
+        raise
+    return s, int(status.split(None, 2)[1]), tag, length
+
+
+def ota_bases():
+    """OTA server base URLs, the last one that worked first."""
+    urls = [LAN_OTA]
+    try:
+        last = open(OTA_SRC).read().strip()
+        if last:
+            urls.insert(0, last)
+    except OSError:
+        pass
     hosts = []
     for h in (server_host, DEFAULT_HOST, 'ghostshrimp.immenseaccumulationonline.online'):
         h = (h or '').strip()
@@ -122,12 +166,12 @@ def ota_urls():
         if is_ip:
             p = (server_port or '').strip()
             if p and p not in ('80', '443', '8080'):
-                urls.append('http://%s:%s/secondary.mpy' % (h, p))
+                urls.append('http://%s:%s' % (h, p))
             else:
-                urls.append('http://%s/secondary.mpy' % h)
+                urls.append('http://%s' % h)
         else:
             # Cloudflare tunnel hostname — no port suffix
-            urls.append('http://%s/secondary.mpy' % h)
+            urls.append('http://%s' % h)
     out = []
     for u in urls:
         if u not in out:
@@ -172,28 +216,199 @@ def has_secondary():
         return False
 
 
+def file_sha256(path):
+    h = hashlib.sha256()
+    buf = bytearray(512)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(buf if n == len(buf) else buf[:n])
+    return binascii.hexlify(h.digest()).decode()
+
+
+def local_sha(path):
+    """sha256 of path, from its .sha sidecar while the size still matches (the
+    file is only rewritten through install), else hashed and stored."""
+    size = os.stat(path)[6]
+    try:
+        n, sha = open(path[:-4] + '.sha').read().split()
+        if int(n) == size:
+            return sha
+    except (OSError, ValueError):
+        pass
+    sha = file_sha256(path)
+    remember_sha(path, sha)
+    return sha
+
+
+def remember_sha(path, sha):
+    try:
+        with open(path[:-4] + '.sha', 'w') as f:
+            f.write('%d %s' % (os.stat(path)[6], sha))
+    except OSError:
+        pass
+
+
+# OTA writes go through one block buffer, so peak RAM does not grow with the .mpy
+# (file_sha256, remember_sha, pump and install are kept identical to circle_display/boot2.py:
+# each device flashes this one file, so nothing is imported between them)
+OTA_BLOCK = 1024
+ota_buf = bytearray(OTA_BLOCK)
+
+
+def pump(src, out, n, h):
+    """Copy n bytes (n < 0: to EOF) src → out in OTA_BLOCK pieces, hashing each
+    one into h. Returns the byte count."""
+    mv = memoryview(ota_buf)
+    done = 0
+    while n:
+        k = src.readinto(ota_buf, OTA_BLOCK if n < 0 else min(n, OTA_BLOCK))
+        if not k:
+            if n < 0:
+                break
+            raise OSError('short read')
+        out.write(mv[:k])
+        h.update(mv[:k])
+        done += k
+        if n > 0:
+            n -= k
+    return done
+
+
+def install(tmp, path, h, want):
+    """Swap tmp in for path, but only if its streamed hash h is want."""
+    sha = binascii.hexlify(h.digest()).decode()
+    if sha != want:
+        raise OSError('sha mismatch %s' % sha[:12])
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    os.rename(tmp, path)
+    remember_sha(path, sha)
+
+
+def fetch_to_flash(url, path, have=None):
+    """Stream url into path.tmp and install it once its sha256 matches the
+    ETag. True when path holds the build to run: the served one, or on a 304
+    the cached one (unchanged, or held back by the server's staged rollout)."""
+    s, status, etag, length = http_open(url, OTA_TIMEOUT_S, have)
+    tmp = path + '.tmp'
+    try:
+        if status == 304:
+            print(path, 'current')
+            return True
+        if status != 200:
+            raise OSError('HTTP %d' % status)
+        if not etag:
+            raise OSError('no ETag to verify against')
+        h = hashlib.sha256()
+        with open(tmp, 'wb') as out:
+            n = pump(s, out, length, h)
+        if n < MIN_MPY:
+            raise OSError('bad body %d' % n)
+        install(tmp, path, h, etag)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    finally:
+        s.close()
+    print('saved', path, n)
+    return True
+
+
+def delta_update(url, path):
+    """Bring path up to date from a /delta response (format in x_mas_server.py):
+    a 304 means keep it (current, or not yet this device's rollout slot); a
+    patched file only replaces path once its size and sha256 match the delta
+    header."""
+    s, status, _, _ = http_open(url, OTA_TIMEOUT_S)
+    tmp = path + '.tmp'
+    try:
+        if status == 304:
+            print(path, 'current')
+            return True
+        if status != 200:
+            print('no delta', status)
+            return False
+        head = s.read(39)
+        if len(head) != 39 or head[:3] != b'XD1':
+            raise OSError('bad delta')
+        size = struct.unpack('<I', head[3:7])[0]
+        h = hashlib.sha256()
+        done = 0
+        with open(path, 'rb') as old, open(tmp, 'wb') as out:
+            while True:
+                op = s.read(1)
+                if op == b'\x01':
+                    off, n = struct.unpack('<II', s.read(8))
+                    old.seek(off)
+                    done += pump(old, out, n, h)
+                elif op == b'\x02':
+                    n = struct.unpack('<H', s.read(2))[0]
+                    done += pump(s, out, n, h)
+                elif op == b'\x00':
+                    break
+                else:
+                    raise OSError('bad delta op')
+        if done != size:
+            raise OSError('delta size %d' % done)
+        install(tmp, path, h, binascii.hexlify(head[7:39]).decode())
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    finally:
+        s.close()
+    print('patched', path, size)
+    return True
+
+
+def remember_source(base):
+    try:
+        if open(OTA_SRC).read().strip() == base:
+            return
+    except OSError:
+        pass
+    try:
+        with open(OTA_SRC, 'w') as f:
+            f.write(base)
+    except OSError:
+        pass
+
+
 def download_secondary():
     print('OTA free', gc.mem_free())
-    for url in ota_urls():
-        for attempt in range(3):
+    sha = local_sha('/secondary.mpy') if has_secondary() else None
+    for base in ota_bases():
+        sta = network.WLAN(network.STA_IF)
+        if not sta.isconnected():
+            print('wifi down')
+            return False
+        if not probe(base):
+            continue
+        if sha:
             try:
-                sta = network.WLAN(network.STA_IF)
-                if not sta.isconnected():
-                    print('wifi down')
-                    return False
-                print('try', url, attempt)
-                body = http_get_bytes(url, 25)
-                if body and len(body) >= MIN_MPY and body[0:1] == b'M':
-                    with open('/secondary.mpy.tmp', 'wb') as f:
-                        f.write(body)
-                    try:
-                        os.remove('/secondary.mpy')
-                    except OSError:
-                        pass
-                    os.rename('/secondary.mpy.tmp', '/secondary.mpy')
-                    print('saved secondary.mpy', len(body))
+                if delta_update('%s/delta/secondary.mpy?from=%s&mac=%s' % (base, sha, mac_str),
+                                '/secondary.mpy'):
+                    remember_source(base)
+                    return True
+            except Exception as e:
+                print('delta err', e)
+            gc.collect()
+        for attempt in range(OTA_ATTEMPTS):
+            try:
+                print('try', base, attempt)
+                if fetch_to_flash('%s/secondary.mpy?mac=%s' % (base, mac_str), '/secondary.mpy', sha):
+                    remember_source(base)
                     return True
-                print('bad body', len(body) if body else 0)
             except Exception as e:
                 print('ota err', e)
             gc.collect()
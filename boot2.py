@@ -4,9 +4,11 @@
 import asyncio
 import bluetooth
 import gc
+import hashlib
 import machine
 import network
 import os
+import struct
 import time
 import urequests
 import binascii
@@ -168,36 +170,211 @@ def has_local_tertiary():
         return False
 
 
+def file_sha256(path):
+    h = hashlib.sha256()
+    buf = bytearray(512)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(buf if n == len(buf) else buf[:n])
+    return binascii.hexlify(h.digest()).decode()
+
+
+def local_sha(path):
+    """
+    sha256 of path, from its .sha sidecar while the size still matches (the file
+    is only rewritten through install), else hashed once and stored.
+    """
+    size = os.stat(path)[6]
+    try:
+        n, sha = open(path[:-4] + '.sha').read().split()
+        if int(n) == size:
+            return sha
+    except (OSError, ValueError):
+        pass
+    sha = file_sha256(path)
+    remember_sha(path, sha)
+    return sha
+
+
+def remember_sha(path, sha):
+    try:
+        with open(path[:-4] + '.sha', 'w') as f:
+            f.write('%d %s' % (os.stat(path)[6], sha))
+    except OSError:
+        pass
+
+
+# OTA writes go through one block buffer, so peak RAM does not grow with the .mpy
+# (file_sha256, remember_sha, pump and install are kept identical to boot.py:
+# each device flashes this one file, so nothing is imported between them)
+OTA_BLOCK = 1024
+ota_buf = bytearray(OTA_BLOCK)
+
+
+def pump(src, out, n, h):
+    """Copy n bytes (n < 0: to EOF) src → out in OTA_BLOCK pieces, hashing each
+    one into h. Returns the byte count."""
+    mv = memoryview(ota_buf)
+    done = 0
+    while n:
+        k = src.readinto(ota_buf, OTA_BLOCK if n < 0 else min(n, OTA_BLOCK))
+        if not k:
+            if n < 0:
+                break
+            raise OSError('short read')
+        out.write(mv[:k])
+        h.update(mv[:k])
+        done += k
+        if n > 0:
+            n -= k
+    return done
+
+
+def install(tmp, path, h, want):
+    """Swap tmp in for path, but only if its streamed hash h is want."""
+    sha = binascii.hexlify(h.digest()).decode()
+    if sha != want:
+        raise OSError('sha mismatch %s' % sha[:12])
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    os.rename(tmp, path)
+    remember_sha(path, sha)
+
+
+def header(resp, name):
+    for k, v in resp.headers.items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+def fetch_to_flash(url, path, have=None):
+    """
+    Stream url into path.tmp and install it once its sha256 matches the ETag.
+    True when path holds the build to run: the served one, or on a 304 the
+    cached one (unchanged, or held back by the staged rollout). Nothing but one
+    OTA_BLOCK is buffered, whatever the size of the .mpy.
+    """
+    resp = urequests.get(url, headers={'If-None-Match': '"%s"' % have} if have else {},
+                         timeout=10)
+    tmp = path + '.tmp'
+    try:
+        if resp.status_code == 304:
+            print(path, 'is current')
+            return True
+        if resp.status_code != 200:
+            raise OSError('HTTP %d' % resp.status_code)
+        etag = header(resp, 'etag')
+        if not etag:
+            raise OSError('no ETag to verify against')
+        length = header(resp, 'content-length')
+        h = hashlib.sha256()
+        with open(tmp, 'wb') as out:
+            n = pump(resp.raw, out, int(length) if length else -1, h)
+        if n < MIN_TERTIARY_BYTES:
+            raise OSError('bad body %d' % n)
+        # Cloudflare may weaken the tag; the sha256 inside is what matters
+        install(tmp, path, h, etag.replace('W/', '').strip('"'))
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    finally:
+        try:
+            resp.close()
+        except Exception:
+            pass
+    print('Downloaded %s (%d bytes)' % (path, n))
+    return True
+
+
+def delta_update(url, path):
+    """
+    Bring path up to date from a /delta response (format in x_mas_server.py),
+    streaming into path.tmp. A 304 means keep it (current, or not yet this
+    device's rollout slot); a patched file only replaces path once its size
+    and sha256 match the delta header, and any error leaves the old file in
+    place.
+    """
+    resp = urequests.get(url, timeout=10)
+    tmp = path + '.tmp'
+    try:
+        if resp.status_code == 304:
+            print(path, 'is current')
+            return True
+        if resp.status_code != 200:
+            print('No delta:', resp.status_code)
+            return False
+        s = resp.raw
+        head = s.read(39)
+        if len(head) != 39 or head[:3] != b'XD1':
+            raise OSError('bad delta')
+        size = struct.unpack('<I', head[3:7])[0]
+        h = hashlib.sha256()
+        done = 0
+        with open(path, 'rb') as old, open(tmp, 'wb') as out:
+            while True:
+                op = s.read(1)
+                if op == b'\x01':
+                    off, n = struct.unpack('<II', s.read(8))
+                    old.seek(off)
+                    done += pump(old, out, n, h)
+                elif op == b'\x02':
+                    n = struct.unpack('<H', s.read(2))[0]
+                    done += pump(s, out, n, h)
+                elif op == b'\x00':
+                    break
+                else:
+                    raise OSError('bad delta op')
+        if done != size:
+            raise OSError('delta size %d' % done)
+        install(tmp, path, h, binascii.hexlify(head[7:39]).decode())
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    finally:
+        try:
+            resp.close()
+        except Exception:
+            pass
+    print('Patched %s (%d bytes)' % (path, size))
+    return True
+
+
 async def download_tertiary():
     """
     Try a short OTA of tertiary.mpy. On any failure keep the existing cache.
     Never write a tiny/error body over a good local file.
     """
-    url = 'http://%s/tertiary.mpy' % provisioned_server_ip
+    url = 'http://%s/tertiary.mpy?mac=%s' % (provisioned_server_ip, mac_str)
+    sha = None
+    if has_local_tertiary():
+        # Most boots: a 304, or only what changed since our build
+        try:
+            sha = local_sha('/tertiary.mpy')
+            if delta_update('http://%s/delta/tertiary.mpy?from=%s&mac=%s'
+                            % (provisioned_server_ip, sha, mac_str), '/tertiary.mpy'):
+                return True
+        except Exception as e:
+            print('Delta error:', e)
+        gc.collect()
     print('Downloading from', url)
     print('Free memory before download:', gc.mem_free())
     # Few attempts, short timeout — soft-reset recovers better than sitting here 2 minutes
     for attempt in range(3):
         try:
-            resp = urequests.get(url, timeout=10)
-            code = resp.status_code
-            data = resp.content
-            try:
-                resp.close()
-            except Exception:
-                pass
-            if code == 200 and data and len(data) >= MIN_TERTIARY_BYTES:
-                # Atomic-ish replace so a reset mid-write is less likely to brick cache
-                with open('/tertiary.mpy.tmp', 'wb') as f:
-                    f.write(data)
-                try:
-                    os.remove('/tertiary.mpy')
-                except OSError:
-                    pass
-                os.rename('/tertiary.mpy.tmp', '/tertiary.mpy')
-                print('Downloaded tertiary.mpy (%d bytes)' % len(data))
+            if fetch_to_flash(url, '/tertiary.mpy', sha):
                 return True
-            print('Bad tertiary response:', code, len(data) if data else 0)
         except Exception as e:
             print('Download error:', e)
         gc.collect()
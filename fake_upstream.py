@@ -0,0 +1,102 @@
+"""fake_upstream.py - Local stand-in for CoinGecko + Yahoo so x_mas_server's price
+refresh can be exercised offline.
+
+  python3 fake_upstream.py --latency 800 --fail 0.2        # serve on :9031
+  XMAS_COINGECKO_BASE=http://127.0.0.1:9031 XMAS_YAHOO_BASE=http://127.0.0.1:9031 \\
+      python3 x_mas_server.py                              # then watch /upstream
+  python3 fake_upstream.py --bench 20 --rate-limit 5       # time refresh_prices()
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PORT = 9031
+
+# Rough real-world prices; each response drifts them a little
+BASE_PRICES = {
+    'bitcoin': 97000.0, 'solana': 180.0, 'dogecoin': 0.32, 'pepe': 0.000012,
+    'ripple': 2.3, 'litecoin': 105.0, 'tesla-xstock': 420.0,
+}
+
+opts = None
+hits = {'coingecko': 0, 'yahoo': 0}
+hits_lock = threading.Lock()
+
+def _price(cid):
+    return BASE_PRICES[cid] * random.uniform(0.99, 1.01)
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, like the real APIs
+
+    def _send(self, code, body=b'', headers=None):
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        source = 'yahoo' if self.path.startswith('/v8/finance/chart/') else 'coingecko'
+        if source == 'coingecko' and not self.path.startswith('/api/v3/simple/price'):
+            return self._send(404)
+        with hits_lock:
+            hits[source] += 1
+            n = hits[source]
+        time.sleep(opts.latency / 1000 * random.uniform(0.5, 1.5))
+        if opts.rate_limit and source == 'coingecko' and n % opts.rate_limit == 0:
+            return self._send(429, b'{"status":{"error_code":429}}', {'Retry-After': str(opts.retry_after)})
+        if random.random() < opts.fail:
+            return self._send(random.choice((500, 502, 503)))
+        if source == 'coingecko':
+            ids = [cid for cid in BASE_PRICES if not (opts.no_tsla and cid == 'tesla-xstock')]
+            body = {cid: {'usd': _price(cid)} for cid in ids}
+        else:
+            body = {'chart': {'result': [{'meta': {'regularMarketPrice': _price('tesla-xstock')}}]}}
+        self._send(200, json.dumps(body).encode())
+
+    # Silence the default logging spam
+    def log_message(self, format, *args):
+        return
+
+def bench(rounds):
+    """Run refresh_prices() against this server and print latency + breaker state."""
+    base = f'http://127.0.0.1:{opts.port}'
+    os.environ['XMAS_COINGECKO_BASE'] = base
+    os.environ['XMAS_YAHOO_BASE'] = base
+    import x_mas_server as xs
+    times = []
+    for _ in range(rounds):
+        t0 = time.time()
+        xs.refresh_prices()
+        times.append((time.time() - t0) * 1000)
+        cg = xs.breakers['coingecko']
+        print(f"refresh {times[-1]:7.1f} ms  btc={xs.cached_prices['btc']}  tsla={xs.cached_prices['tsla']}  "
+              f"coingecko fails={cg['fails']} open_for={max(0, cg['open_until'] - time.time()):.0f}s")
+    times.sort()
+    print(f"p50 {times[len(times) // 2]:.1f} ms  max {times[-1]:.1f} ms  upstream hits {hits}")
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--port', type=int, default=PORT)
+    ap.add_argument('--latency', type=float, default=150, help='mean response delay, ms')
+    ap.add_argument('--fail', type=float, default=0.0, help='fraction of 5xx responses')
+    ap.add_argument('--rate-limit', type=int, default=0, help='every Nth CoinGecko call gets a 429')
+    ap.add_argument('--retry-after', type=int, default=60, help='Retry-After sent with a 429, s')
+    ap.add_argument('--no-tsla', action='store_true', help='omit tesla-xstock so Yahoo is used')
+    ap.add_argument('--bench', type=int, default=0, metavar='N', help='run N refreshes then exit')
+    opts = ap.parse_args()
+
+    httpd = ThreadingHTTPServer(('127.0.0.1' if opts.bench else '', opts.port), UpstreamHandler)
+    if opts.bench:
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        bench(opts.bench)
+    else:
+        print(f"Fake upstream listening on port {opts.port}...")
+        httpd.serve_forever()
@@ -0,0 +1,199 @@
+# firmware_footprint.py - RAM/flash footprint of each device firmware target.
+#
+# The C2 is heap-starved (boot2 shuts BLE down just to make room for
+# `import tertiary`), so every build is measured before it is served:
+#   mpy    .mpy size; an imported .mpy's bytecode lives on the heap, so this is
+#          also the bulk of what `import` costs
+#   qstrs  qstr table size from the .mpy header (each one is interned at load)
+#   data   heap held by module-level objects (font dicts, device_config, init
+#          tables, frame buffers): every top-level assignment that only needs
+#          literals, earlier such names and a few pure builtins is executed
+#          under the unix MicroPython port and measured with gc.mem_free();
+#          without that port a 32-bit object-size model gives an estimate
+#   heap   mpy + data
+# x_mas_server runs this after each compile and refuses to deploy a build over
+# its BUDGETS entry; the CLI exits 1 in the same case:
+#   python3 firmware_footprint.py secondary.py:secondary.mpy tertiary.py ...
+import array
+import ast
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# target .mpy name → byte ceilings; a missing key is not checked
+BUDGETS = {
+    'boot.mpy':      {'mpy': 16000, 'heap': 20000},
+    'secondary.mpy': {'mpy': 40000, 'heap': 52000},
+    'tertiary.mpy':  {'mpy': 32000, 'heap': 40000},
+    'boot2.mpy':     {'mpy': 16000, 'heap': 20000},
+}
+MICROPYTHON = os.environ.get('MICROPYTHON_UNIX') or shutil.which('micropython')
+
+# Names a measurable top-level statement may use besides earlier measured names
+PURE_NAMES = {'bytearray', 'bytes', 'memoryview', 'array', 'random', 'range', 'len',
+              'list', 'tuple', 'dict', 'str', 'int', 'min', 'max', 'True', 'False', 'None'}
+
+def mpy_qstr_count(path):
+    """qstr count from a v6+ .mpy header (MicroPython 1.22+), else None."""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    if len(head) < 5 or head[0] != ord('M') or head[1] < 6:
+        return None
+    n = shift = 0
+    for b in head[4:]:           # header is 4 bytes, then a vuint qstr count
+        n |= (b & 0x7F) << shift
+        shift += 7
+        if not b & 0x80:
+            return n
+    return None
+
+def measurable_statements(source):
+    """[(name, source text)] for top-level assignments the estimate can run."""
+    tree = ast.parse(source)
+    known = set(PURE_NAMES)
+    out = []
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1 \
+                or not isinstance(node.targets[0], ast.Name):
+            continue
+        bound = {n.id for n in ast.walk(node.value)
+                 if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+        used = {n.id for n in ast.walk(node.value)
+                if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)} - bound
+        if used <= known:
+            name = node.targets[0].id
+            known.add(name)
+            out.append((name, ast.get_source_segment(source, node)))
+    return out
+
+# --- 32-bit MicroPython object model (GC blocks are 16 bytes) ---
+def _blocks(n):
+    return (n + 15) // 16 * 16
+
+def mp_sizeof(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen or obj is None or isinstance(obj, bool):
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, int):
+        return 0 if -2 ** 30 <= obj < 2 ** 30 else 16    # small ints are tagged
+    if isinstance(obj, float):
+        return 16
+    if isinstance(obj, str):
+        return 0                                         # literal → interned qstr
+    if isinstance(obj, bytes):
+        return _blocks(16 + len(obj))
+    if isinstance(obj, bytearray):
+        return 16 + _blocks(len(obj))
+    if isinstance(obj, array.array):
+        return 16 + _blocks(len(obj) * obj.itemsize)
+    if isinstance(obj, memoryview):
+        return 16
+    if isinstance(obj, tuple):
+        return _blocks(8 + 4 * len(obj)) + sum(mp_sizeof(v, seen) for v in obj)
+    if isinstance(obj, list):
+        return 16 + _blocks(4 * len(obj)) + sum(mp_sizeof(v, seen) for v in obj)
+    if isinstance(obj, dict):
+        alloc = len(obj) + (len(obj) + 3) // 4               # map slack
+        return 16 + _blocks(8 * alloc) + sum(mp_sizeof(k, seen) + mp_sizeof(v, seen)
+                                             for k, v in obj.items())
+    return 16
+
+def _data_model(stmts):
+    env = {'array': array, 'random': random}
+    sizes = []
+    for name, text in stmts:
+        try:
+            exec(text, env)
+            sizes.append((name, mp_sizeof(env[name])))
+        except Exception:
+            pass
+    return sizes
+
+_HARNESS = '''
+import gc, array, random
+g = {'array': array, 'random': random}
+codes = []
+for name, text in STMTS:
+    try:
+        codes.append((name, compile(text, name, 'exec')))
+    except Exception:
+        pass
+for name, code in codes:
+    gc.collect()
+    before = gc.mem_free()
+    try:
+        exec(code, g)
+    except Exception:
+        continue
+    gc.collect()
+    print(name, before - gc.mem_free())
+'''
+
+def _data_micropython(stmts):
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+        f.write('STMTS = %r\n' % (stmts,) + _HARNESS)
+    try:
+        result = subprocess.run([MICROPYTHON, '-X', 'heapsize=256k', f.name],
+                                capture_output=True, text=True, timeout=30)
+    finally:
+        os.remove(f.name)
+    if result.returncode != 0:
+        return None
+    sizes = []
+    for line in result.stdout.splitlines():
+        name, _, n = line.rpartition(' ')
+        sizes.append((name, max(0, int(n))))
+    return sizes if sizes or not stmts else None   # no compile() in this build
+
+def footprint(src, mpy=None):
+    """Footprint dict for one source and (optionally) its compiled .mpy."""
+    with open(src) as f:
+        stmts = measurable_statements(f.read())
+    sizes = _data_micropython(stmts) if MICROPYTHON else None
+    via = 'micropython'
+    if sizes is None:
+        sizes, via = _data_model(stmts), 'model'
+    data = sum(n for _, n in sizes)
+    size = os.path.getsize(mpy) if mpy and os.path.isfile(mpy) else None
+    return {
+        'mpy': size,
+        'qstrs': mpy_qstr_count(mpy) if size else None,
+        'data': data,
+        'heap': (size or 0) + data,
+        'via': via,
+        'top': sorted(sizes, key=lambda s: -s[1])[:5],
+    }
+
+def over_budget(target, fp, budgets=None):
+    """Messages for every limit fp exceeds; empty when within budget."""
+    limits = (BUDGETS if budgets is None else budgets).get(target, {})
+    return [f'{key} {fp[key]} > {limit}' for key, limit in limits.items()
+            if fp.get(key) is not None and fp[key] > limit]
+
+def format_row(target, fp):
+    top = ', '.join(f'{name} {n}' for name, n in fp['top'][:3] if n)
+    return (f"{target:<14} mpy {fp['mpy'] if fp['mpy'] is not None else '-':>6}  "
+            f"qstrs {fp['qstrs'] if fp['qstrs'] is not None else '-':>4}  data {fp['data']:>6}  "
+            f"heap {fp['heap']:>6} ({fp['via']})  {top}")
+
+if __name__ == '__main__':
+    # args: src[:out.mpy]; without an out path the .mpy is built into a temp dir
+    # with $MPY_CROSS (if set), else only the data estimate is reported
+    cross = os.environ.get('MPY_CROSS') or shutil.which('mpy-cross')
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for arg in sys.argv[1:]:
+            src, _, mpy = arg.partition(':')
+            target = os.path.basename(mpy or os.path.splitext(src)[0] + '.mpy')
+            if not mpy and cross:
+                mpy = os.path.join(tmp, target)
+                subprocess.run([cross, '-march=rv32imc', src, '-o', mpy], check=True)
+            fp = footprint(src, mpy or None)
+            problems = over_budget(target, fp)
+            print(format_row(target, fp) + (f"  OVER BUDGET: {'; '.join(problems)}" if problems else ''))
+            failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
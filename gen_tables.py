@@ -0,0 +1,201 @@
+# gen_tables.py - Packs the device fonts and lookup tables into bytes constants.
+#
+# The renderers used to build `font` (a dict of 5-item lists), `digit_patterns`
+# and `abbr_dict` on the heap at import. Each target now carries a generated
+# block of plain constants instead (one bytes/str object per table, loaded
+# straight from the .mpy), and reads glyphs by index:
+#   g = FONT_CHARS.find(ch) * 5      # -5 when the glyph is missing
+#   bits = FONT[g + col]             # col 0..4, bit 7 = top row
+#   bits = DIGITS[d * 16 + row]      # rank digit d, row 0..15, bit 4 = left column
+#   ABBR.find(mac) % 20 == 0 → ABBR[i + 17:i + 20]
+# Edit the tables here, then:
+#   python3 gen_tables.py            # rewrite the generated blocks in place
+#   python3 gen_tables.py --check    # exit 1 if any block is stale
+#   python3 gen_tables.py --measure  # import heap + time, dict form vs packed
+import os
+import sys
+import time
+
+import firmware_footprint
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BEGIN = '# === Generated tables (gen_tables.py; edit there and rerun) ==='
+END = '# === End generated tables ==='
+
+# 5x8 glyphs, one byte per column, bit 7 = top row
+GLYPHS = {
+    ' ': (0x00,0x00,0x00,0x00,0x00),
+    '0': (0x7C,0xA2,0x92,0x8A,0x7C),
+    '1': (0x00,0x42,0xFE,0x02,0x00),
+    '2': (0x42,0x86,0x8A,0x92,0x62),
+    '3': (0x84,0x82,0xA2,0xD2,0x8C),
+    '4': (0x18,0x28,0x48,0xFE,0x08),
+    '5': (0xE4,0xA2,0xA2,0xA2,0x9C),
+    '6': (0x3C,0x52,0x92,0x92,0x0C),
+    '7': (0x80,0x8E,0x90,0xA0,0xC0),
+    '8': (0x6C,0x92,0x92,0x92,0x6C),
+    '9': (0x60,0x92,0x92,0x94,0x78),
+    ':': (0x00,0x36,0x36,0x00,0x00),
+    '.': (0x00,0x00,0x00,0x06,0x06),
+    '$': (0x24,0x54,0xFE,0x54,0x48),
+    "'": (0x20,0x60,0x40,0x00,0x00),
+    '-': (0x08,0x08,0x08,0x08,0x08),
+    '&': (0x6C,0x92,0xAA,0x44,0x0A),
+    'A': (0x7E,0x90,0x90,0x90,0x7E),
+    'B': (0xFE,0x92,0x92,0x92,0x6C),
+    'C': (0x7C,0x82,0x82,0x82,0x44),
+    'D': (0xFE,0x82,0x82,0x82,0x7C),
+    'E': (0xFE,0x92,0x92,0x92,0x82),
+    'F': (0xFE,0x90,0x90,0x90,0x80),
+    'G': (0x7C,0x82,0x92,0x92,0x5C),
+    'H': (0xFE,0x10,0x10,0x10,0xFE),
+    'I': (0x00,0x82,0xFE,0x82,0x00),
+    'J': (0x04,0x02,0x82,0xFC,0x80),
+    'K': (0xFE,0x10,0x28,0x44,0x82),
+    'L': (0xFE,0x02,0x02,0x02,0x02),
+    'M': (0xFE,0x40,0x30,0x40,0xFE),
+    'N': (0xFE,0x20,0x10,0x08,0xFE),
+    'O': (0x7C,0x82,0x82,0x82,0x7C),
+    'P': (0xFE,0x90,0x90,0x90,0x60),
+    'Q': (0x7C,0x82,0x8A,0x84,0x7A),
+    'R': (0xFE,0x90,0x98,0x94,0x62),
+    'S': (0x62,0x92,0x92,0x92,0x8C),
+    'T': (0x80,0x80,0xFE,0x80,0x80),
+    'U': (0xFC,0x02,0x02,0x02,0xFC),
+    'V': (0xF8,0x04,0x02,0x04,0xF8),
+    'W': (0xFC,0x02,0x1C,0x02,0xFC),
+    'X': (0xC6,0x28,0x10,0x28,0xC6),
+    'Y': (0xE0,0x10,0x0E,0x10,0xE0),
+    'Z': (0x86,0x8A,0x92,0xA2,0xC2),
+}
+
+# 10x16 rank-medal digits (5 bits wide, each row doubled), one byte per row
+RANK_DIGITS = (
+    (14, 14, 17, 17, 25, 25, 21, 21, 19, 19, 17, 17, 14, 14, 0, 0),  # 0
+    (4, 4, 12, 12, 4, 4, 4, 4, 4, 4, 4, 4, 14, 14, 0, 0),  # 1
+    (14, 14, 17, 17, 1, 1, 2, 2, 4, 4, 8, 8, 31, 31, 0, 0),  # 2
+    (31, 31, 2, 2, 4, 4, 2, 2, 1, 1, 17, 17, 14, 14, 0, 0),  # 3
+    (2, 2, 6, 6, 10, 10, 18, 18, 31, 31, 2, 2, 2, 2, 0, 0),  # 4
+    (31, 31, 16, 16, 30, 30, 1, 1, 1, 1, 17, 17, 14, 14, 0, 0),  # 5
+    (6, 6, 8, 8, 16, 16, 30, 30, 17, 17, 17, 17, 14, 14, 0, 0),  # 6
+    (31, 31, 1, 1, 2, 2, 4, 4, 8, 8, 8, 8, 8, 8, 0, 0),  # 7
+    (14, 14, 17, 17, 17, 17, 14, 14, 17, 17, 17, 17, 14, 14, 0, 0),  # 8
+    (14, 14, 17, 17, 17, 17, 15, 15, 1, 1, 2, 2, 12, 12, 0, 0),  # 9
+)
+
+# Rival abbreviation per rect screen (new_secondary's abbr_dict)
+RANK_ABBR = {
+    '34:98:7A:07:13:B4': 'SYD',
+    '34:98:7A:07:14:D0': 'ALY',
+    '34:98:7A:06:FC:A0': 'PAT',
+    '34:98:7A:06:FB:D0': 'BRN',
+    '34:98:7A:07:11:24': 'MOM',
+    '34:98:7A:07:12:B8': 'TES',
+    '34:98:7A:07:06:B4': 'DAD',
+}
+
+# Owner label per rect screen (name_for_mac on the devices; the server's frames)
+SCREEN_NAMES = {
+    '34:98:7A:07:13:B4': "Sydney's",
+    '34:98:7A:07:14:D0': "Alyssa's",
+    '34:98:7A:06:FC:A0': "Patrick's",
+    '34:98:7A:06:FB:D0': "Braden's",
+    '34:98:7A:07:11:24': "Pattie's",
+    '34:98:7A:07:12:B8': "Test's",
+    '34:98:7A:07:06:B4': "Chris's",
+}
+
+# Glyph set per target: each keeps exactly the characters it had, so text widths
+# and skipped characters render as before.
+_AZ = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+TARGETS = {
+    'secondary.py':     {'font': " 0123456789:.$'" + _AZ, 'digits': True},
+    'tertiary.py':      {'font': ' 0123456789:.$-&' + _AZ},
+    'new_secondary.py': {'font': " 0123456789:.$'" + _AZ, 'digits': True, 'abbr': True},
+    'new_tertiary.py':  {'font': ' 0123456789:.$-' + _AZ},
+}
+
+def _bytes_line(values, comment):
+    return "    b'%s'  # %s" % (''.join('\\x%02x' % v for v in values), comment)
+
+def emit(spec):
+    """Source text of one target's generated block, markers included."""
+    chars = spec['font']
+    out = [BEGIN,
+           '# 5 column bytes per glyph in FONT_CHARS order (bit 7 = top row)',
+           'FONT_CHARS = %r' % chars,
+           'FONT = (']
+    out += [_bytes_line(GLYPHS[c], repr(c)) for c in chars]
+    out.append(')')
+    if spec.get('digits'):
+        out += ["# 16 row bytes per rank digit '0'-'9' (bit 4 = leftmost column)", 'DIGITS = (']
+        out += [_bytes_line(rows, str(d)) for d, rows in enumerate(RANK_DIGITS)]
+        out.append(')')
+    if spec.get('abbr'):
+        out += ['# 20 chars per screen: MAC then its 3-letter rank abbreviation',
+                'ABBR = (']
+        out += ['    %r' % (mac + abbr) for mac, abbr in RANK_ABBR.items()]
+        out.append(')')
+    out.append(END)
+    return '\n'.join(out) + '\n'
+
+def update(name, check=False):
+    """Rewrite (or with check, compare) one target's block; True if it differs."""
+    path = os.path.join(REPO_DIR, name)
+    with open(path) as f:
+        text = f.read()
+    start = text.index(BEGIN)
+    end = text.index(END, start) + len(END) + 1
+    block = emit(TARGETS[name])
+    if text[start:end] == block:
+        return False
+    if not check:
+        with open(path, 'w') as f:
+            f.write(text[:start] + block + text[end:])
+    return True
+
+def _dict_form(spec):
+    """The pre-generator statements, for --measure."""
+    stmts = [('font', 'font = {%s}' % ', '.join(
+        '%r: %r' % (c, list(GLYPHS[c])) for c in spec['font']))]
+    if spec.get('digits'):
+        stmts.append(('digit_patterns', 'digit_patterns = {%s}' % ', '.join(
+            '%r: %r' % (str(d), list(rows)) for d, rows in enumerate(RANK_DIGITS))))
+    if spec.get('abbr'):
+        stmts.append(('abbr_dict', 'abbr_dict = %r' % RANK_ABBR))
+    return stmts
+
+def _exec_us(stmts, rounds=200):
+    codes = [compile(text, name, 'exec') for name, text in stmts]
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for code in codes:
+            exec(code, {})
+    return (time.perf_counter() - t0) / rounds * 1e6
+
+def measure(name):
+    spec = TARGETS[name]
+    new_text = emit(spec)
+    new = firmware_footprint.measurable_statements(new_text)
+    old = _dict_form(spec)
+    rows = []
+    for label, stmts in (('dict', old), ('packed', new)):
+        sizes = firmware_footprint._data_micropython(stmts) if firmware_footprint.MICROPYTHON else None
+        via = 'micropython'
+        if sizes is None:
+            sizes, via = firmware_footprint._data_model(stmts), 'model'
+        rows.append('%-16s %-6s heap %5d B  build %6.1f us (CPython)  [%s]'
+                    % (name, label, sum(n for _, n in sizes), _exec_us(stmts), via))
+    return rows
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--measure' in args:
+        for name in TARGETS:
+            print('\n'.join(measure(name)))
+        sys.exit(0)
+    check = '--check' in args
+    stale = [name for name in TARGETS if update(name, check)]
+    for name in stale:
+        print(('stale: ' if check else 'updated: ') + name)
+    sys.exit(1 if check and stale else 0)
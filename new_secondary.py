@@ -67,72 +67,79 @@ set_window(0, 0, 159, 79)
 for _ in range(160 * 80):
     send_byte(0x00, 1)
     send_byte(0x00, 1)
-# === Full uppercase font (A-Z complete + digits + symbols) ===
-font = {
-    ' ': [0x00,0x00,0x00,0x00,0x00],
-    '0': [0x7C,0xA2,0x92,0x8A,0x7C],
-    '1': [0x00,0x42,0xFE,0x02,0x00],
-    '2': [0x42,0x86,0x8A,0x92,0x62],
-    '3': [0x84,0x82,0xA2,0xD2,0x8C],
-    '4': [0x18,0x28,0x48,0xFE,0x08],
-    '5': [0xE4,0xA2,0xA2,0xA2,0x9C],
-    '6': [0x3C,0x52,0x92,0x92,0x0C],
-    '7': [0x80,0x8E,0x90,0xA0,0xC0],
-    '8': [0x6C,0x92,0x92,0x92,0x6C],
-    '9': [0x60,0x92,0x92,0x94,0x78],
-    ':': [0x00,0x36,0x36,0x00,0x00],
-    '.': [0x00,0x00,0x00,0x06,0x06],
-    '$': [0x24,0x54,0xFE,0x54,0x48],
-    "'": [0x20,0x60,0x40,0x00,0x00],
-    'A': [0x7E,0x90,0x90,0x90,0x7E],
-    'B': [0xFE,0x92,0x92,0x92,0x6C],
-    'C': [0x7C,0x82,0x82,0x82,0x44],
-    'D': [0xFE,0x82,0x82,0x82,0x7C],
-    'E': [0xFE,0x92,0x92,0x92,0x82],
-    'F': [0xFE,0x90,0x90,0x90,0x80],
-    'G': [0x7C,0x82,0x92,0x92,0x5C],
-    'H': [0xFE,0x10,0x10,0x10,0xFE],
-    'I': [0x00,0x82,0xFE,0x82,0x00],
-    'J': [0x04,0x02,0x82,0xFC,0x80],
-    'K': [0xFE,0x10,0x28,0x44,0x82],
-    'L': [0xFE,0x02,0x02,0x02,0x02],
-    'M': [0xFE,0x40,0x30,0x40,0xFE],
-    'N': [0xFE,0x20,0x10,0x08,0xFE],
-    'O': [0x7C,0x82,0x82,0x82,0x7C],
-    'P': [0xFE,0x90,0x90,0x90,0x60],
-    'Q': [0x7C,0x82,0x8A,0x84,0x7A],
-    'R': [0xFE,0x90,0x98,0x94,0x62],
-    'S': [0x62,0x92,0x92,0x92,0x8C],
-    'T': [0x80,0x80,0xFE,0x80,0x80],
-    'U': [0xFC,0x02,0x02,0x02,0xFC],
-    'V': [0xF8,0x04,0x02,0x04,0xF8],
-    'W': [0xFC,0x02,0x1C,0x02,0xFC],
-    'X': [0xC6,0x28,0x10,0x28,0xC6],
-    'Y': [0xE0,0x10,0x0E,0x10,0xE0],
-    'Z': [0x86,0x8A,0x92,0xA2,0xC2],
-}
-# Simple 10x14 bold digits
-digit_patterns = {
-    '0': [14, 14, 17, 17, 25, 25, 21, 21, 19, 19, 17, 17, 14, 14, 0, 0],
-    '1': [4, 4, 12, 12, 4, 4, 4, 4, 4, 4, 4, 4, 14, 14, 0, 0],
-    '2': [14, 14, 17, 17, 1, 1, 2, 2, 4, 4, 8, 8, 31, 31, 0, 0],
-    '3': [31, 31, 2, 2, 4, 4, 2, 2, 1, 1, 17, 17, 14, 14, 0, 0],
-    '4': [2, 2, 6, 6, 10, 10, 18, 18, 31, 31, 2, 2, 2, 2, 0, 0],
-    '5': [31, 31, 16, 16, 30, 30, 1, 1, 1, 1, 17, 17, 14, 14, 0, 0],
-    '6': [6, 6, 8, 8, 16, 16, 30, 30, 17, 17, 17, 17, 14, 14, 0, 0],
-    '7': [31, 31, 1, 1, 2, 2, 4, 4, 8, 8, 8, 8, 8, 8, 0, 0],
-    '8': [14, 14, 17, 17, 17, 17, 14, 14, 17, 17, 17, 17, 14, 14, 0, 0],
-    '9': [14, 14, 17, 17, 17, 17, 15, 15, 1, 1, 2, 2, 12, 12, 0, 0],
-}
-abbr_dict = {
-    '34:98:7A:07:13:B4': "SYD",
-    '34:98:7A:07:14:D0': "ALY",
-    '34:98:7A:06:FC:A0': "PAT",
-    '34:98:7A:06:FB:D0': "BRN",
-    '34:98:7A:07:11:24': "MOM",
-    '34:98:7A:07:12:B8': "TES",
-    '34:98:7A:07:06:B4': "DAD",
-}
+# === Generated tables (gen_tables.py; edit there and rerun) ===
+# 5 column bytes per glyph in FONT_CHARS order (bit 7 = top row)
+FONT_CHARS = " 0123456789:.$'ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+FONT = (
+    b'\x00\x00\x00\x00\x00'  # ' '
+    b'\x7c\xa2\x92\x8a\x7c'  # '0'
+    b'\x00\x42\xfe\x02\x00'  # '1'
+    b'\x42\x86\x8a\x92\x62'  # '2'
+    b'\x84\x82\xa2\xd2\x8c'  # '3'
+    b'\x18\x28\x48\xfe\x08'  # '4'
+    b'\xe4\xa2\xa2\xa2\x9c'  # '5'
+    b'\x3c\x52\x92\x92\x0c'  # '6'
+    b'\x80\x8e\x90\xa0\xc0'  # '7'
+    b'\x6c\x92\x92\x92\x6c'  # '8'
+    b'\x60\x92\x92\x94\x78'  # '9'
+    b'\x00\x36\x36\x00\x00'  # ':'
+    b'\x00\x00\x00\x06\x06'  # '.'
+    b'\x24\x54\xfe\x54\x48'  # '$'
+    b'\x20\x60\x40\x00\x00'  # "'"
+    b'\x7e\x90\x90\x90\x7e'  # 'A'
+    b'\xfe\x92\x92\x92\x6c'  # 'B'
+    b'\x7c\x82\x82\x82\x44'  # 'C'
+    b'\xfe\x82\x82\x82\x7c'  # 'D'
+    b'\xfe\x92\x92\x92\x82'  # 'E'
+    b'\xfe\x90\x90\x90\x80'  # 'F'
+    b'\x7c\x82\x92\x92\x5c'  # 'G'
+    b'\xfe\x10\x10\x10\xfe'  # 'H'
+    b'\x00\x82\xfe\x82\x00'  # 'I'
+    b'\x04\x02\x82\xfc\x80'  # 'J'
+    b'\xfe\x10\x28\x44\x82'  # 'K'
+    b'\xfe\x02\x02\x02\x02'  # 'L'
+    b'\xfe\x40\x30\x40\xfe'  # 'M'
+    b'\xfe\x20\x10\x08\xfe'  # 'N'
+    b'\x7c\x82\x82\x82\x7c'  # 'O'
+    b'\xfe\x90\x90\x90\x60'  # 'P'
+    b'\x7c\x82\x8a\x84\x7a'  # 'Q'
+    b'\xfe\x90\x98\x94\x62'  # 'R'
+    b'\x62\x92\x92\x92\x8c'  # 'S'
+    b'\x80\x80\xfe\x80\x80'  # 'T'
+    b'\xfc\x02\x02\x02\xfc'  # 'U'
+    b'\xf8\x04\x02\x04\xf8'  # 'V'
+    b'\xfc\x02\x1c\x02\xfc'  # 'W'
+    b'\xc6\x28\x10\x28\xc6'  # 'X'
+    b'\xe0\x10\x0e\x10\xe0'  # 'Y'
+    b'\x86\x8a\x92\xa2\xc2'  # 'Z'
+)
+# 16 row bytes per rank digit '0'-'9' (bit 4 = leftmost column)
+DIGITS = (
+    b'\x0e\x0e\x11\x11\x19\x19\x15\x15\x13\x13\x11\x11\x0e\x0e\x00\x00'  # 0
+    b'\x04\x04\x0c\x0c\x04\x04\x04\x04\x04\x04\x04\x04\x0e\x0e\x00\x00'  # 1
+    b'\x0e\x0e\x11\x11\x01\x01\x02\x02\x04\x04\x08\x08\x1f\x1f\x00\x00'  # 2
+    b'\x1f\x1f\x02\x02\x04\x04\x02\x02\x01\x01\x11\x11\x0e\x0e\x00\x00'  # 3
+    b'\x02\x02\x06\x06\x0a\x0a\x12\x12\x1f\x1f\x02\x02\x02\x02\x00\x00'  # 4
+    b'\x1f\x1f\x10\x10\x1e\x1e\x01\x01\x01\x01\x11\x11\x0e\x0e\x00\x00'  # 5
+    b'\x06\x06\x08\x08\x10\x10\x1e\x1e\x11\x11\x11\x11\x0e\x0e\x00\x00'  # 6
+    b'\x1f\x1f\x01\x01\x02\x02\x04\x04\x08\x08\x08\x08\x08\x08\x00\x00'  # 7
+    b'\x0e\x0e\x11\x11\x11\x11\x0e\x0e\x11\x11\x11\x11\x0e\x0e\x00\x00'  # 8
+    b'\x0e\x0e\x11\x11\x11\x11\x0f\x0f\x01\x01\x02\x02\x0c\x0c\x00\x00'  # 9
+)
+# 20 chars per screen: MAC then its 3-letter rank abbreviation
+ABBR = (
+    '34:98:7A:07:13:B4SYD'
+    '34:98:7A:07:14:D0ALY'
+    '34:98:7A:06:FC:A0PAT'
+    '34:98:7A:06:FB:D0BRN'
+    '34:98:7A:07:11:24MOM'
+    '34:98:7A:07:12:B8TES'
+    '34:98:7A:07:06:B4DAD'
+)
+# === End generated tables ===
+def rank_abbr(mac):
+    i = ABBR.find(mac)
+    return ABBR[i + 17:i + 20] if i >= 0 and i % 20 == 0 else "??"
 last_current_rank = 99
 rank_dict = {}
 last_rank_dict = {} # Persistent full dict from last success
@@ -140,17 +147,17 @@ last_rank_dict = {} # Persistent full dict from last success
 def draw_text(x_start, y_start, text):
     x = x_start
     for char in text.upper():
-        if char not in font:
+        g = FONT_CHARS.find(char) * 5
+        if g < 0:
             x += 12
             continue
-        bitmap = font[char]
         for row in range(8):
             y0 = y_start + row * 2
             y1 = y0 + 1
             # Build list of x positions that need pixels this row
             active_cols = []
             for col in range(5):
-                if bitmap[col] & (1 << (7 - row)):
+                if FONT[g + col] & (1 << (7 - row)):
                     active_cols.append(col)
             if not active_cols:
                 continue
@@ -220,10 +227,10 @@ def draw_rank(rank_str, rank_num):
     x_base = cx - total_width // 2
     y_base = cy - 8 # Center vertically (16 rows tall)
     for i, ch in enumerate(rank_str):
-        pattern = digit_patterns.get(ch, digit_patterns['0'])
+        base = max(0, '0123456789'.find(ch)) * 16 # unknown → '0', as before
         x = x_base + i * (digit_width + 3) # small gap between multi-digit
         for row in range(16):
-            bits = pattern[row]
+            bits = DIGITS[base + row]
             for col in range(5):
                 if bits & (1 << (4 - col)): # Leftmost bit = col 0
                     draw_pixel(x + col * 2, y_base + row, bright)
@@ -506,7 +513,7 @@ while True:
                 # Fixed syntax + safe indexing
                 idx = random.randint(0, len(candidates) - 1)
                 rand_mac = candidates[idx]
-                abbr = abbr_dict.get(rand_mac, "??")
+                abbr = rank_abbr(rand_mac)
                 o_rank = rank_dict.get(rand_mac, 99)
                 if o_rank < 99:
                     string = f"{abbr} AT {o_rank}"
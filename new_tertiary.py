@@ -145,57 +145,61 @@ def update_photo():
     return pixel_index == TOTAL_PIXELS
 
 # === Font & draw_text (exactly as you had) ===
-font = {
-    ' ': [0x00,0x00,0x00,0x00,0x00],
-    '0': [0x7C,0xA2,0x92,0x8A,0x7C],
-    '1': [0x00,0x42,0xFE,0x02,0x00],
-    '2': [0x42,0x86,0x8A,0x92,0x62],
-    '3': [0x84,0x82,0xA2,0xD2,0x8C],
-    '4': [0x18,0x28,0x48,0xFE,0x08],
-    '5': [0xE4,0xA2,0xA2,0xA2,0x9C],
-    '6': [0x3C,0x52,0x92,0x92,0x0C],
-    '7': [0x80,0x8E,0x90,0xA0,0xC0],
-    '8': [0x6C,0x92,0x92,0x92,0x6C],
-    '9': [0x60,0x92,0x92,0x94,0x78],
-    ':': [0x00,0x36,0x36,0x00,0x00],
-    '.': [0x00,0x00,0x00,0x06,0x06],
-    '$': [0x24,0x54,0xFE,0x54,0x48],
-    '-': [0x08,0x08,0x08,0x08,0x08],
-    'A': [0x7E,0x90,0x90,0x90,0x7E],
-    'B': [0xFE,0x92,0x92,0x92,0x6C],
-    'C': [0x7C,0x82,0x82,0x82,0x44],
-    'D': [0xFE,0x82,0x82,0x82,0x7C],
-    'E': [0xFE,0x92,0x92,0x92,0x82],
-    'F': [0xFE,0x90,0x90,0x90,0x80],
-    'G': [0x7C,0x82,0x92,0x92,0x5C],
-    'H': [0xFE,0x10,0x10,0x10,0xFE],
-    'I': [0x00,0x82,0xFE,0x82,0x00],
-    'J': [0x04,0x02,0x82,0xFC,0x80],
-    'K': [0xFE,0x10,0x28,0x44,0x82],
-    'L': [0xFE,0x02,0x02,0x02,0x02],
-    'M': [0xFE,0x40,0x30,0x40,0xFE],
-    'N': [0xFE,0x20,0x10,0x08,0xFE],
-    'O': [0x7C,0x82,0x82,0x82,0x7C],
-    'P': [0xFE,0x90,0x90,0x90,0x60],
-    'Q': [0x7C,0x82,0x8A,0x84,0x7A],
-    'R': [0xFE,0x90,0x98,0x94,0x62],
-    'S': [0x62,0x92,0x92,0x92,0x8C],
-    'T': [0x80,0x80,0xFE,0x80,0x80],
-    'U': [0xFC,0x02,0x02,0x02,0xFC],
-    'V': [0xF8,0x04,0x02,0x04,0xF8],
-    'W': [0xFC,0x02,0x1C,0x02,0xFC],
-    'X': [0xC6,0x28,0x10,0x28,0xC6],
-    'Y': [0xE0,0x10,0x0E,0x10,0xE0],
-    'Z': [0x86,0x8A,0x92,0xA2,0xC2],
-}
+# === Generated tables (gen_tables.py; edit there and rerun) ===
+# 5 column bytes per glyph in FONT_CHARS order (bit 7 = top row)
+FONT_CHARS = ' 0123456789:.$-ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+FONT = (
+    b'\x00\x00\x00\x00\x00'  # ' '
+    b'\x7c\xa2\x92\x8a\x7c'  # '0'
+    b'\x00\x42\xfe\x02\x00'  # '1'
+    b'\x42\x86\x8a\x92\x62'  # '2'
+    b'\x84\x82\xa2\xd2\x8c'  # '3'
+    b'\x18\x28\x48\xfe\x08'  # '4'
+    b'\xe4\xa2\xa2\xa2\x9c'  # '5'
+    b'\x3c\x52\x92\x92\x0c'  # '6'
+    b'\x80\x8e\x90\xa0\xc0'  # '7'
+    b'\x6c\x92\x92\x92\x6c'  # '8'
+    b'\x60\x92\x92\x94\x78'  # '9'
+    b'\x00\x36\x36\x00\x00'  # ':'
+    b'\x00\x00\x00\x06\x06'  # '.'
+    b'\x24\x54\xfe\x54\x48'  # '$'
+    b'\x08\x08\x08\x08\x08'  # '-'
+    b'\x7e\x90\x90\x90\x7e'  # 'A'
+    b'\xfe\x92\x92\x92\x6c'  # 'B'
+    b'\x7c\x82\x82\x82\x44'  # 'C'
+    b'\xfe\x82\x82\x82\x7c'  # 'D'
+    b'\xfe\x92\x92\x92\x82'  # 'E'
+    b'\xfe\x90\x90\x90\x80'  # 'F'
+    b'\x7c\x82\x92\x92\x5c'  # 'G'
+    b'\xfe\x10\x10\x10\xfe'  # 'H'
+    b'\x00\x82\xfe\x82\x00'  # 'I'
+    b'\x04\x02\x82\xfc\x80'  # 'J'
+    b'\xfe\x10\x28\x44\x82'  # 'K'
+    b'\xfe\x02\x02\x02\x02'  # 'L'
+    b'\xfe\x40\x30\x40\xfe'  # 'M'
+    b'\xfe\x20\x10\x08\xfe'  # 'N'
+    b'\x7c\x82\x82\x82\x7c'  # 'O'
+    b'\xfe\x90\x90\x90\x60'  # 'P'
+    b'\x7c\x82\x8a\x84\x7a'  # 'Q'
+    b'\xfe\x90\x98\x94\x62'  # 'R'
+    b'\x62\x92\x92\x92\x8c'  # 'S'
+    b'\x80\x80\xfe\x80\x80'  # 'T'
+    b'\xfc\x02\x02\x02\xfc'  # 'U'
+    b'\xf8\x04\x02\x04\xf8'  # 'V'
+    b'\xfc\x02\x1c\x02\xfc'  # 'W'
+    b'\xc6\x28\x10\x28\xc6'  # 'X'
+    b'\xe0\x10\x0e\x10\xe0'  # 'Y'
+    b'\x86\x8a\x92\xa2\xc2'  # 'Z'
+)
+# === End generated tables ===
 
 def draw_text(x_start, y_start, text):
     x = x_start
     for char in text.upper():
-        if char in font:
-            bitmap = font[char]
+        g = FONT_CHARS.find(char) * 5
+        if g >= 0:
             for col in range(5):
-                bits = bitmap[col]
+                bits = FONT[g + col]
                 for row in range(8):
                     if bits & (1 << (7 - row)):
                         set_window(x + col, y_start + row, x + col, y_start + row)
@@ -9,7 +9,7 @@ import io
 import os
 from zoneinfo import ZoneInfo # Available in Python 3.9+, standard on modern Ubuntu
 import datetime
-import struct
+import numpy as np
 app = Flask(__name__)
 # Directories and files
 LOGO_DIR = "logos"
@@ -20,10 +20,10 @@ cached_time = "error"
 cached_logos = {} # coin -> "0xFFFF,0x0000,..." string
 last_fetch_time = 0
 CACHE_SECONDS = 180
-cached_big_logos = {} # coin -> list of int RGB565 pixels (160x80 = 12800)
+cached_big_logos = {} # coin -> 160x80 big-endian RGB565 bytes (25600)
 BIG_WIDTH = 160
 BIG_HEIGHT = 80
-CHUNK_SIZE = 256 # ~1000 pixels/chunk (~5-6KB response, safe)
+CHUNK_SIZE = 256 # pixels/chunk (512-byte response, safe)
 PRESERVE_ASPECT_RATIO = True # Set False to force-stretch to 160x80 (original behavior)
 lock = threading.Lock()
 # Hard-coded holdings
@@ -37,39 +37,62 @@ HOLDINGS = {
     '34:98:7A:07:06:B4': {'coin': 'btc', 'amount': 0.0000566},
 }
 TEST_MAC = '34:98:7A:07:12:B8'
-def rgb565(r, g, b):
-    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+def pack_rgb565(img):
+    # Whole image at once, big-endian RGB565
+    a = np.asarray(img, dtype=np.uint16)
+    packed = ((a[:, :, 0] & 0xF8) << 8) | ((a[:, :, 1] & 0xFC) << 3) | (a[:, :, 2] >> 3)
+    return packed.astype('>u2').tobytes()
+def load_packed(coin, name, size, build):
+    # logos/<coin>.<name>.rgb565, rebuilt with build(img) only when the PNG is newer
+    png = os.path.join(LOGO_DIR, f"{coin}.png")
+    path = os.path.join(LOGO_DIR, f"{coin}.{name}.rgb565")
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(png):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) == size:
+                return data
+    except OSError:
+        pass
+    with Image.open(png) as img:
+        data = build(img.convert('RGB'))
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+    return data
 def load_or_download_logo(coin, url):
     local_path = os.path.join(LOGO_DIR, f"{coin}.png")
-    if os.path.exists(local_path):
-        print(f"[{time.strftime('%H:%M:%S')}] Using local logo for {coin}")
-        try:
-            img = Image.open(local_path).convert('RGB')
-        except Exception as e:
-            print(f"Failed to open local {coin} logo: {e}")
-            return "error"
-    else:
+    if not os.path.exists(local_path):
         print(f"[{time.strftime('%H:%M:%S')}] Downloading logo for {coin}...")
         try:
             r = requests.get(url, timeout=15)
             r.raise_for_status()
-            img = Image.open(io.BytesIO(r.content)).convert('RGB')
-            img.save(local_path)
+            Image.open(io.BytesIO(r.content)).convert('RGB').save(local_path)
             print(f"Saved logo to {local_path}")
         except Exception as e:
             print(f"Failed to download {coin} logo: {e}")
             return "error"
     try:
-        img = img.resize((20, 20), Image.LANCZOS)
-        pixels = []
-        for y in range(20):
-            for x in range(20):
-                r, g, b = img.getpixel((x, y))
-                pixels.append(f"0x{rgb565(r,g,b):04X}")
-        return ','.join(pixels)
+        data = load_packed(coin, 'small', 800, lambda im: pack_rgb565(im.resize((20, 20), Image.LANCZOS)))
+        return ','.join(f"0x{v:04X}" for v in np.frombuffer(data, dtype='>u2'))
     except Exception as e:
         print(f"Logo processing error for {coin}: {e}")
         return "error"
+def big_frame(img):
+    orig_w, orig_h = img.size
+    if PRESERVE_ASPECT_RATIO:
+        # Uniform scale: limiting side fills its axis exactly
+        ratio = min(BIG_WIDTH / orig_w, BIG_HEIGHT / orig_h)
+        new_w = max(1, int(orig_w * ratio)) # Avoid zero size
+        new_h = max(1, int(orig_h * ratio))
+        # Centred on black, so the bars come out as explicit 0x0000
+        frame = Image.new('RGB', (BIG_WIDTH, BIG_HEIGHT), (0, 0, 0))
+        frame.paste(img.resize((new_w, new_h), Image.LANCZOS),
+                    ((BIG_WIDTH - new_w) // 2, (BIG_HEIGHT - new_h) // 2))
+    else:
+        # Original forced stretch
+        frame = img.resize((BIG_WIDTH, BIG_HEIGHT), Image.LANCZOS)
+    return pack_rgb565(frame)
 def generate_big_logo(coin):
     if coin in cached_big_logos:
         return cached_big_logos[coin]
@@ -80,39 +103,7 @@ def generate_big_logo(coin):
         return None
   
     try:
-        img = Image.open(local_path).convert('RGB')
-        orig_w, orig_h = img.size
-       
-        if PRESERVE_ASPECT_RATIO:
-            # Uniform scale: limiting side fills its axis exactly
-            ratio = min(BIG_WIDTH / orig_w, BIG_HEIGHT / orig_h)
-            new_w = max(1, int(orig_w * ratio)) # Avoid zero size
-            new_h = max(1, int(orig_h * ratio))
-            img = img.resize((new_w, new_h), Image.LANCZOS)
-           
-            # Centering offsets for black bars
-            offset_x = (BIG_WIDTH - new_w) // 2
-            offset_y = (BIG_HEIGHT - new_h) // 2
-        else:
-            # Original forced stretch
-            img = img.resize((BIG_WIDTH, BIG_HEIGHT), Image.LANCZOS)
-            new_w, new_h = BIG_WIDTH, BIG_HEIGHT
-            offset_x = offset_y = 0
-       
-        # Generate full 160x80 pixel list (black where bars are)
-        pixels = []
-        for y in range(BIG_HEIGHT):
-            for x in range(BIG_WIDTH):
-                if PRESERVE_ASPECT_RATIO and \
-                   (x < offset_x or x >= offset_x + new_w or
-                    y < offset_y or y >= offset_y + new_h):
-                    pixels.append(0) # Explicit black for bars
-                else:
-                    px_x = x - offset_x
-                    px_y = y - offset_y
-                    r, g, b = img.getpixel((px_x, px_y))
-                    pixels.append(rgb565(r, g, b))
-       
+        pixels = load_packed(coin, 'big' if PRESERVE_ASPECT_RATIO else 'stretch', BIG_WIDTH * BIG_HEIGHT * 2, big_frame)
         cached_big_logos[coin] = pixels
         print(f"[{time.strftime('%H:%M:%S')}] Generated big 160x80 logo for {coin} "
               f"({'preserved AR' if PRESERVE_ASPECT_RATIO else 'stretched'})")
@@ -172,7 +163,7 @@ def biglogo_chunks(coin):
     pixels = generate_big_logo(coin)
     if pixels is None:
         return "0"
-    chunks = (len(pixels) + CHUNK_SIZE - 1) // CHUNK_SIZE
+    chunks = (len(pixels) // 2 + CHUNK_SIZE - 1) // CHUNK_SIZE
     return str(chunks)
 @app.route('/biglogo/<coin>/<int:chunk>')
 def biglogo_chunk(coin, chunk):
@@ -180,15 +171,8 @@ def biglogo_chunk(coin, chunk):
     pixels = generate_big_logo(coin)
     if pixels is None:
         return b'' # empty bytes = error on client
-    start = chunk * CHUNK_SIZE
-    if start >= len(pixels):
-        return b''
-    end = min(start + CHUNK_SIZE, len(pixels))
-    chunk_pixels = pixels[start:end]
-    if not chunk_pixels:
-        return b''
-    # Binary RGB565, big-endian (high byte first)
-    return struct.pack(">{}H".format(len(chunk_pixels)), *chunk_pixels)
+    # Already binary RGB565, big-endian (high byte first); b'' past the end
+    return pixels[chunk * CHUNK_SIZE * 2:(chunk + 1) * CHUNK_SIZE * 2]
 @app.route('/time')
 def get_central_time():
     try:
@@ -6,6 +6,8 @@ import gc
 import ujson
 import random
 import os
+import framebuf
+import binascii
 
 # === MAC (non-fatal; short timeout so a down tunnel cannot stall boot) ===
 mac_bytes = machine.unique_id()
@@ -41,6 +43,21 @@ def send_command(cmd, data=b''):
     send_byte(cmd, 0)
     for b in data:
         send_byte(b, 1)
+spi_bytes = 0 # pixel bytes pushed since the last telemetry beacon
+def send_data(buf):
+    # Bulk pixel stream: DC set once, pin methods hoisted out of the bit loop
+    global spi_bytes
+    spi_bytes += len(buf)
+    dc.value(1)
+    clk = sck.value
+    out = mosi.value
+    for byte in buf:
+        for _ in range(8):
+            clk(0)
+            out(byte & 0x80)
+            byte <<= 1
+            clk(1)
+    clk(0)
 # === Reset ===
 rst.value(1)
 time.sleep_ms(50)
@@ -82,131 +99,161 @@ set_window(0, 0, 159, 79)
 for _ in range(160 * 80):
     send_byte(0x00, 1)
     send_byte(0x00, 1)
-# === Full uppercase font (A-Z complete + digits + symbols) ===
-font = {
-    ' ': [0x00,0x00,0x00,0x00,0x00],
-    '0': [0x7C,0xA2,0x92,0x8A,0x7C],
-    '1': [0x00,0x42,0xFE,0x02,0x00],
-    '2': [0x42,0x86,0x8A,0x92,0x62],
-    '3': [0x84,0x82,0xA2,0xD2,0x8C],
-    '4': [0x18,0x28,0x48,0xFE,0x08],
-    '5': [0xE4,0xA2,0xA2,0xA2,0x9C],
-    '6': [0x3C,0x52,0x92,0x92,0x0C],
-    '7': [0x80,0x8E,0x90,0xA0,0xC0],
-    '8': [0x6C,0x92,0x92,0x92,0x6C],
-    '9': [0x60,0x92,0x92,0x94,0x78],
-    ':': [0x00,0x36,0x36,0x00,0x00],
-    '.': [0x00,0x00,0x00,0x06,0x06],
-    '$': [0x24,0x54,0xFE,0x54,0x48],
-    "'": [0x20,0x60,0x40,0x00,0x00],
-    'A': [0x7E,0x90,0x90,0x90,0x7E],
-    'B': [0xFE,0x92,0x92,0x92,0x6C],
-    'C': [0x7C,0x82,0x82,0x82,0x44],
-    'D': [0xFE,0x82,0x82,0x82,0x7C],
-    'E': [0xFE,0x92,0x92,0x92,0x82],
-    'F': [0xFE,0x90,0x90,0x90,0x80],
-    'G': [0x7C,0x82,0x92,0x92,0x5C],
-    'H': [0xFE,0x10,0x10,0x10,0xFE],
-    'I': [0x00,0x82,0xFE,0x82,0x00],
-    'J': [0x04,0x02,0x82,0xFC,0x80],
-    'K': [0xFE,0x10,0x28,0x44,0x82],
-    'L': [0xFE,0x02,0x02,0x02,0x02],
-    'M': [0xFE,0x40,0x30,0x40,0xFE],
-    'N': [0xFE,0x20,0x10,0x08,0xFE],
-    'O': [0x7C,0x82,0x82,0x82,0x7C],
-    'P': [0xFE,0x90,0x90,0x90,0x60],
-    'Q': [0x7C,0x82,0x8A,0x84,0x7A],
-    'R': [0xFE,0x90,0x98,0x94,0x62],
-    'S': [0x62,0x92,0x92,0x92,0x8C],
-    'T': [0x80,0x80,0xFE,0x80,0x80],
-    'U': [0xFC,0x02,0x02,0x02,0xFC],
-    'V': [0xF8,0x04,0x02,0x04,0xF8],
-    'W': [0xFC,0x02,0x1C,0x02,0xFC],
-    'X': [0xC6,0x28,0x10,0x28,0xC6],
-    'Y': [0xE0,0x10,0x0E,0x10,0xE0],
-    'Z': [0x86,0x8A,0x92,0xA2,0xC2],
-}
-# Simple 10x14 bold digits
-digit_patterns = {
-    '0': [14, 14, 17, 17, 25, 25, 21, 21, 19, 19, 17, 17, 14, 14, 0, 0],
-    '1': [4, 4, 12, 12, 4, 4, 4, 4, 4, 4, 4, 4, 14, 14, 0, 0],
-    '2': [14, 14, 17, 17, 1, 1, 2, 2, 4, 4, 8, 8, 31, 31, 0, 0],
-    '3': [31, 31, 2, 2, 4, 4, 2, 2, 1, 1, 17, 17, 14, 14, 0, 0],
-    '4': [2, 2, 6, 6, 10, 10, 18, 18, 31, 31, 2, 2, 2, 2, 0, 0],
-    '5': [31, 31, 16, 16, 30, 30, 1, 1, 1, 1, 17, 17, 14, 14, 0, 0],
-    '6': [6, 6, 8, 8, 16, 16, 30, 30, 17, 17, 17, 17, 14, 14, 0, 0],
-    '7': [31, 31, 1, 1, 2, 2, 4, 4, 8, 8, 8, 8, 8, 8, 0, 0],
-    '8': [14, 14, 17, 17, 17, 17, 14, 14, 17, 17, 17, 17, 14, 14, 0, 0],
-    '9': [14, 14, 17, 17, 17, 17, 15, 15, 1, 1, 2, 2, 12, 12, 0, 0],
-}
-abbr_dict = {
-    '34:98:7A:07:13:B4': "SYD",
-    '34:98:7A:07:14:D0': "ALY",
-    '34:98:7A:06:FC:A0': "PAT",
-    '34:98:7A:06:FB:D0': "BRN",
-    '34:98:7A:07:11:24': "MOM",
-    '34:98:7A:07:12:B8': "TES",
-    '34:98:7A:07:06:B4': "DAD",
-}
+# === Generated tables (gen_tables.py; edit there and rerun) ===
+# 5 column bytes per glyph in FONT_CHARS order (bit 7 = top row)
+FONT_CHARS = " 0123456789:.$'ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+FONT = (
+    b'\x00\x00\x00\x00\x00'  # ' '
+    b'\x7c\xa2\x92\x8a\x7c'  # '0'
+    b'\x00\x42\xfe\x02\x00'  # '1'
+    b'\x42\x86\x8a\x92\x62'  # '2'
+    b'\x84\x82\xa2\xd2\x8c'  # '3'
+    b'\x18\x28\x48\xfe\x08'  # '4'
+    b'\xe4\xa2\xa2\xa2\x9c'  # '5'
+    b'\x3c\x52\x92\x92\x0c'  # '6'
+    b'\x80\x8e\x90\xa0\xc0'  # '7'
+    b'\x6c\x92\x92\x92\x6c'  # '8'
+    b'\x60\x92\x92\x94\x78'  # '9'
+    b'\x00\x36\x36\x00\x00'  # ':'
+    b'\x00\x00\x00\x06\x06'  # '.'
+    b'\x24\x54\xfe\x54\x48'  # '$'
+    b'\x20\x60\x40\x00\x00'  # "'"
+    b'\x7e\x90\x90\x90\x7e'  # 'A'
+    b'\xfe\x92\x92\x92\x6c'  # 'B'
+    b'\x7c\x82\x82\x82\x44'  # 'C'
+    b'\xfe\x82\x82\x82\x7c'  # 'D'
+    b'\xfe\x92\x92\x92\x82'  # 'E'
+    b'\xfe\x90\x90\x90\x80'  # 'F'
+    b'\x7c\x82\x92\x92\x5c'  # 'G'
+    b'\xfe\x10\x10\x10\xfe'  # 'H'
+    b'\x00\x82\xfe\x82\x00'  # 'I'
+    b'\x04\x02\x82\xfc\x80'  # 'J'
+    b'\xfe\x10\x28\x44\x82'  # 'K'
+    b'\xfe\x02\x02\x02\x02'  # 'L'
+    b'\xfe\x40\x30\x40\xfe'  # 'M'
+    b'\xfe\x20\x10\x08\xfe'  # 'N'
+    b'\x7c\x82\x82\x82\x7c'  # 'O'
+    b'\xfe\x90\x90\x90\x60'  # 'P'
+    b'\x7c\x82\x8a\x84\x7a'  # 'Q'
+    b'\xfe\x90\x98\x94\x62'  # 'R'
+    b'\x62\x92\x92\x92\x8c'  # 'S'
+    b'\x80\x80\xfe\x80\x80'  # 'T'
+    b'\xfc\x02\x02\x02\xfc'  # 'U'
+    b'\xf8\x04\x02\x04\xf8'  # 'V'
+    b'\xfc\x02\x1c\x02\xfc'  # 'W'
+    b'\xc6\x28\x10\x28\xc6'  # 'X'
+    b'\xe0\x10\x0e\x10\xe0'  # 'Y'
+    b'\x86\x8a\x92\xa2\xc2'  # 'Z'
+)
+# 16 row bytes per rank digit '0'-'9' (bit 4 = leftmost column)
+DIGITS = (
+    b'\x0e\x0e\x11\x11\x19\x19\x15\x15\x13\x13\x11\x11\x0e\x0e\x00\x00'  # 0
+    b'\x04\x04\x0c\x0c\x04\x04\x04\x04\x04\x04\x04\x04\x0e\x0e\x00\x00'  # 1
+    b'\x0e\x0e\x11\x11\x01\x01\x02\x02\x04\x04\x08\x08\x1f\x1f\x00\x00'  # 2
+    b'\x1f\x1f\x02\x02\x04\x04\x02\x02\x01\x01\x11\x11\x0e\x0e\x00\x00'  # 3
+    b'\x02\x02\x06\x06\x0a\x0a\x12\x12\x1f\x1f\x02\x02\x02\x02\x00\x00'  # 4
+    b'\x1f\x1f\x10\x10\x1e\x1e\x01\x01\x01\x01\x11\x11\x0e\x0e\x00\x00'  # 5
+    b'\x06\x06\x08\x08\x10\x10\x1e\x1e\x11\x11\x11\x11\x0e\x0e\x00\x00'  # 6
+    b'\x1f\x1f\x01\x01\x02\x02\x04\x04\x08\x08\x08\x08\x08\x08\x00\x00'  # 7
+    b'\x0e\x0e\x11\x11\x11\x11\x0e\x0e\x11\x11\x11\x11\x0e\x0e\x00\x00'  # 8
+    b'\x0e\x0e\x11\x11\x11\x11\x0f\x0f\x01\x01\x02\x02\x0c\x0c\x00\x00'  # 9
+)
+# === End generated tables ===
 last_current_rank = 99
-rank_dict = {}
-last_rank_dict = {} # Persistent full dict from last success
-# === Draw text ===
-def draw_text(x_start, y_start, text):
+rival_line = "" # Server-picked "XYZ LT n" from /state; "" when unknown
+# === Band compositor ===
+# The 160x80 screen is rendered BAND_H rows at a time into one preallocated
+# RGB565 FrameBuffer (5 KB) and each finished band is sent once: every pixel
+# reaches the panel exactly once per refresh instead of once per layer.
+# framebuf keeps pixels little-endian but the panel wants the high byte first,
+# so colours are byte-swapped on the way in (sw) while raw RGB565 bytes
+# (noise tile, logos) are copied in display order as-is.
+BAND_H = 16
+band_buf = bytearray(160 * BAND_H * 2)
+band_mv = memoryview(band_buf)
+band = framebuf.FrameBuffer(band_buf, 160, BAND_H, framebuf.RGB565)
+def sw(c):
+    return ((c & 0xFF) << 8) | (c >> 8)
+WHITE = 0xFFFF
+BLACK = 0x0000
+# === Band change detection ===
+# The panel keeps whatever it was sent last, so repainting the screen it already
+# shows only needs the bands that changed: one crc32 per band for that screen,
+# forgotten as soon as the other screen is drawn. The noise is seeded per screen
+# (a fresh seed on every switch) so an unchanged band composes to the same bytes.
+panel_kind = None
+band_crc = [None] * (80 // BAND_H)
+noise_seed = 0
+def begin_screen(kind):
+    global panel_kind, noise_seed
+    if kind != panel_kind:
+        panel_kind = kind
+        noise_seed = random.getrandbits(30)
+        for i in range(len(band_crc)):
+            band_crc[i] = None
+    random.seed(noise_seed)
+    roll_noise()
+def end_screen():
+    random.seed(time.ticks_us())   # the rest of the app stays random
+def send_band(by):
+    crc = binascii.crc32(band_buf)
+    i = by // BAND_H
+    if band_crc[i] == crc:
+        return
+    band_crc[i] = crc
+    set_window(0, by, 159, by + BAND_H - 1)
+    send_data(band_buf)
+def present(paint, kind):
+    # paint(by) draws every layer of the band whose top screen row is by
+    begin_screen(kind)
+    for by in range(0, 80, BAND_H):
+        paint(by)
+        send_band(by)
+    end_screen()
+# === Noise background ===
+NOISE_PIXELS = 480
+_noise = bytearray(NOISE_PIXELS * 2)
+_noise_mv = memoryview(_noise)
+def roll_noise():
+    # Roll the 480-px tile once per screen; noise_fill() copies it at a random
+    # offset per row: same per-pixel look, ~27x fewer random draws.
+    buf = _noise
+    for i in range(0, NOISE_PIXELS * 2, 2):
+        # red/blue 0-3 (max 31), green 0-6 (max 63 – eye is more sensitive)
+        color = (random.getrandbits(2) << 11) | (random.randint(0, 6) << 5) | random.getrandbits(2)
+        buf[i] = color >> 8
+        buf[i + 1] = color & 0xFF
+def noise_fill(start=0):
+    # Very dark noise into band_buf[start:] (start even), one tile copy per row run
+    end = len(band_buf)
+    while start < end:
+        k = 320 - start % 320
+        off = random.randint(0, NOISE_PIXELS - k // 2) * 2
+        band_mv[start:start + k] = _noise_mv[off:off + k]
+        start += k
+# === Draw text (5x8 font scaled 2x, white) ===
+def draw_text(x_start, y_start, text, by):
+    y = y_start - by
+    if y + 16 <= 0 or y >= BAND_H:
+        return
     x = x_start
     for char in text.upper():
-        if char not in font:
-            x += 12
-            continue
-        bitmap = font[char]
-        for row in range(8):
-            y0 = y_start + row * 2
-            y1 = y0 + 1
-            # Build list of x positions that need pixels this row
-            active_cols = []
+        g = FONT_CHARS.find(char) * 5
+        if g >= 0:
             for col in range(5):
-                if bitmap[col] & (1 << (7 - row)):
-                    active_cols.append(col)
-            if not active_cols:
-                continue
-            # Find contiguous runs to minimize window sets
-            start_col = active_cols[0]
-            prev_col = active_cols[0]
-            for col in active_cols[1:]:
-                if col != prev_col + 1:
-                    # End current run
-                    draw_scaled_hline(x + start_col*2, y0, x + prev_col*2 + 1, y1)
-                    start_col = col
-                prev_col = col
-            # Last run
-            draw_scaled_hline(x + start_col*2, y0, x + prev_col*2 + 1, y1)
+                bits = FONT[g + col]
+                for row in range(8):
+                    if bits & (1 << (7 - row)):
+                        band.fill_rect(x + col * 2, y + row * 2, 2, 2, WHITE)
         x += 12
-# === Draw colored pixel (for rank number) ===
-def draw_pixel(x, y, color565):
-    if 0 <= x < 160 and 0 <= y < 80:
-        set_window(x, y, x, y)
-        send_byte(color565 >> 8, 1)
-        send_byte(color565 & 0xFF, 1)
-def draw_filled_circle(xc, yc, r, color):
-    for dy in range(-r, r + 1):
-        for dx in range(-r, r + 1):
-            if dx * dx + dy * dy <= r * r:
-                px = xc + dx
-                py = yc + dy
-                if 0 <= px < 160 and 0 <= py < 80:
-                    draw_pixel(px, py, color)
-def draw_circle_outline(xc, yc, r, color, thickness=1):
-    outer = (r + thickness) * (r + thickness)
-    inner = r * r
-    for dy in range(-r - thickness - 1, r + thickness + 2):
-        for dx in range(-r - thickness - 1, r + thickness + 2):
-            dist = dx * dx + dy * dy
-            if inner < dist <= outer:
-                px = xc + dx
-                py = yc + dy
-                if 0 <= px < 160 and 0 <= py < 80:
-                    draw_pixel(px, py, color)
-def draw_rank(rank_str, rank_num):
+# === Rank medal ===
+def draw_rank(rank_str, rank_num, by):
+    # Medal position and size (fits nicely beside/below logo)
+    cx = 147 # Center X - adjust ±10 if needed for your logo placement
+    cy = 67 # Center Y - lower to avoid logo overlap
+    r = 10 # Larger radius for visible medal
+    if cy + r + 2 < by or cy - r - 2 >= by + BAND_H:
+        return
     # Bright medal colors (RGB565)
     colors = {
         1: 0xFFE0, # Gold
@@ -219,145 +266,131 @@ def draw_rank(rank_str, rank_num):
         2: 0x630C, # Darker silver/gray
         3: 0x0000, # Darker bronze
     }
-    bright = colors.get(rank_num, 0xFFFF) # White for 4+
-    dark = dark_colors.get(rank_num, 0x3186) # Dark gray for 4+
-    # Medal position and size (fits nicely beside/below logo)
-    cx = 147 # Center X - adjust ±10 if needed for your logo placement
-    cy = 67 # Center Y - lower to avoid logo overlap
-    r = 10 # Larger radius for visible medal
-    # Draw medal: dark fill first
-    draw_filled_circle(cx, cy, r, dark)
-    # Then thick bright rim on top
-    draw_circle_outline(cx, cy, r, bright, thickness=1)
-    # Draw the upscaled number centered on the medal (bright color)
+    bright = sw(colors.get(rank_num, 0xFFFF)) # White for 4+
+    dark = sw(dark_colors.get(rank_num, 0x3186)) # Dark gray for 4+
+    # Dark fill inside r, one-pixel bright rim just outside it
+    inner = r * r
+    outer = (r + 1) * (r + 1)
+    for dy in range(-r - 2, r + 3):
+        y = cy + dy - by
+        if not 0 <= y < BAND_H:
+            continue
+        for dx in range(-r - 2, r + 3):
+            dist = dx * dx + dy * dy
+            if dist <= inner:
+                band.pixel(cx + dx, y, dark)
+            elif dist <= outer:
+                band.pixel(cx + dx, y, bright)
+    # Upscaled number centered on the medal (bright color)
     digit_width = 10 # 5 columns * 2 pixels
     total_width = len(rank_str) * digit_width + (len(rank_str) - 1) * 3 # spacing
     x_base = cx - total_width // 2
-    y_base = cy - 8 # Center vertically (16 rows tall)
+    y_base = cy - 8 - by # Center vertically (16 rows tall)
     for i, ch in enumerate(rank_str):
-        pattern = digit_patterns.get(ch, digit_patterns['0'])
+        base = max(0, '0123456789'.find(ch)) * 16 # unknown → '0', as before
         x = x_base + i * (digit_width + 3) # small gap between multi-digit
         for row in range(16):
-            bits = pattern[row]
+            bits = DIGITS[base + row]
             for col in range(5):
                 if bits & (1 << (4 - col)): # Leftmost bit = col 0
-                    draw_pixel(x + col * 2, y_base + row, bright)
-                    draw_pixel(x + col * 2 + 1, y_base + row, bright)
-def draw_scaled_hline(x0, y0, x1, y1):
-    if x0 > x1:
-        return
-    set_window(x0, y0, x1, y0)
-    for _ in range(x1 - x0 + 1):
-        send_byte(0xFF, 1)
-        send_byte(0xFF, 1)
-    set_window(x0, y1, x1, y1)
-    for _ in range(x1 - x0 + 1):
-        send_byte(0xFF, 1)
-        send_byte(0xFF, 1)
-       
-# === Coin logo cache ===
-cached_logo_pixels = None
-# === Draw coin logo from cached RGB565 array (20x20) ===
-def draw_coin_logo(x, y):
-    global cached_logo_pixels
-    if cached_logo_pixels is None:
-        try:
-            r = urequests.get(f'{data_proxy_url}/logo/{coin_endpoint}', timeout=12)
-            if r.status_code == 200:
-                text = r.text.strip()
-                if text != "error" and text:
-                    cached_logo_pixels = [int(p, 16) for p in text.split(',')]
-            r.close()
-        except:
-            cached_logo_pixels = [] # Failed
-    if cached_logo_pixels and len(cached_logo_pixels) == 400:
-        idx = 0
-        for py in range(20):
-            for px in range(20):
-                color = cached_logo_pixels[idx]
-                idx += 1
-                set_window(x + px, y + py, x + px, y + py)
-                send_byte(color >> 8, 1) # High byte
-                send_byte(color & 0xFF, 1) # Low byte
-    else:
-        # Fallback placeholder circle if no logo
-        draw_xrp_logo(x + 10, y + 10, 10)
-def draw_big_coin_logo():
-    # Always start with fresh black screen for big logo mode
-    set_window(0, 0, 159, 79)
-    # for _ in range(160 * 80):
-    # send_byte(0x00, 1)
-    # send_byte(0x00, 1)
-    for _ in range(160 * 80):
-        # Very dark random color (adjust the upper limits for darker/brighter noise)
-        red = random.randint(0, 3) # 0-3 (max 31 for red)
-        green = random.randint(0, 6) # 0-6 (max 63 for green – slightly higher range OK since eye is more sensitive)
-        blue = random.randint(0, 3) # 0-3 (max 31 for blue)
-       
-        color = (red << 11) | (green << 5) | blue
-       
-        send_byte(color >> 8, 1)
-        send_byte(color & 0xFF, 1)
-   
-   
-    total_chunks = 0
+                    band.fill_rect(x + col * 2, y_base + row, 2, 1, bright)
+# === Flash logo cache ===
+# Logos never change: keep them on flash next to the server's ETag (a content
+# hash) and only revalidate with If-None-Match every LOGO_REVALIDATE_S.
+LOGO_META = '/logo_meta.json'
+LOGO_REVALIDATE_S = 6 * 3600
+try:
+    with open(LOGO_META) as f:
+        logo_meta = ujson.load(f)
+except:
+    logo_meta = {}
+def flash_size(path):
     try:
-        r = urequests.get(f'{data_proxy_url}/biglogo_chunks/{coin_endpoint}', timeout=25)
-        text = r.text.strip()
-        r.close()
-        if text.isdigit():
-            total_chunks = int(text)
+        return os.stat(path)[6]
     except:
-        pass
-   
-    if total_chunks == 0:
-        draw_coin_logo(70, 30) # Fallback immediately if no big logo available
-        return
-   
-    pixel_idx = 0
-    chunks_drawn = 0
-    for chunk_id in range(total_chunks):
+        return -1
+def fetch_asset(name, url_path, size):
+    # Make sure /<name> holds the current asset; True if a usable copy is on flash
+    path = '/' + name
+    ent = logo_meta.get(name)
+    have = ent is not None and flash_size(path) == size
+    # RTC restarts at 2000 after power loss, so a negative age also revalidates
+    if have and 0 <= time.time() - ent['t'] < LOGO_REVALIDATE_S:
+        return True
+    try:
+        t0 = time.ticks_ms()
+        headers = {'If-None-Match': ent['etag']} if have else {}
+        r = urequests.get(f'{data_proxy_url}{url_path}', headers=headers, timeout=25)
         try:
-            r = urequests.get(f'{data_proxy_url}/biglogo/{coin_endpoint}/{chunk_id}', timeout=30)
-            data = r.content # binary bytes
+            if r.status_code == 304:
+                ent['t'] = time.time()
+            elif r.status_code == 200:
+                etag = r.headers.get('ETag', '')
+                buf = bytearray(512)
+                got = 0
+                with open(path + '.tmp', 'wb') as f:
+                    while got < size:
+                        n = r.raw.readinto(buf)
+                        if not n:
+                            break
+                        f.write(buf if n == 512 else memoryview(buf)[:n])
+                        got += n
+                if got != size:
+                    try:
+                        os.remove(path + '.tmp')
+                    except:
+                        pass
+                    raise OSError('short logo')
+                os.rename(path + '.tmp', path)
+                ent = logo_meta[name] = {'etag': etag, 't': time.time()}
+                have = True
+            else:
+                return have
+        finally:
             r.close()
-           
-            if len(data) == 0 or len(data) % 2 != 0:
-                break
-           
-            chunks_drawn += 1
-            for i in range(0, len(data), 2):
-                if pixel_idx >= 12800:
-                    break
-                high = data[i]
-                low = data[i + 1]
-                px = pixel_idx % 160
-                py = pixel_idx // 160
-                set_window(px, py, px, py)
-                send_byte(high, 1)
-                send_byte(low, 1)
-                pixel_idx += 1
-           
-            time.sleep_ms(50) # Small pause between chunks for stability
-        except:
-            break
-   
-    # Only fallback if literally nothing was drawn
-    if chunks_drawn == 0:
-        draw_coin_logo(70, 30)
-    # Otherwise keep partial or full big logo (looks good even if incomplete)
-# === XRP logo function (unchanged from your version) ===
-def draw_xrp_logo(center_x, center_y, radius):
+        tm_lat(t0)
+        with open(LOGO_META, 'w') as f:
+            ujson.dump(logo_meta, f)
+    except Exception as e:
+        print("Logo fetch error:", e)
+        tm['ret'] += 1
+    return have
+
+# === Coin logo cache (20x20 RGB565, display byte order) ===
+cached_logo = None # None = not fetched yet, b'' = fetch failed
+logo_fb = None
+def load_coin_logo():
+    # Network stays outside the band painters: fetch once, before present()
+    global cached_logo, logo_fb
+    if cached_logo is None:
+        name = f'logo_{coin_endpoint}.rgb565'
+        cached_logo = b'' # Failed
+        if fetch_asset(name, f'/logo/{coin_endpoint}.rgb565', 800):
+            try:
+                with open('/' + name, 'rb') as f:
+                    cached_logo = bytearray(f.read()) # framebuf wants a writable buffer
+            except:
+                pass
+    if cached_logo and logo_fb is None:
+        logo_fb = framebuf.FrameBuffer(cached_logo, 20, 20, framebuf.RGB565)
+def draw_coin_logo(x, y, by):
+    if y + 20 <= by or y >= by + BAND_H:
+        return
+    if logo_fb is not None:
+        band.blit(logo_fb, x, y - by)
+    else:
+        # Fallback placeholder circle if no logo
+        draw_xrp_logo(x + 10, y + 10, 10, by)
+# === XRP logo function (unchanged look, drawn into the band) ===
+def draw_xrp_logo(center_x, center_y, radius, by):
     # Fill white circle
     for dy in range(-radius, radius + 1):
+        y = center_y + dy - by
+        if not 0 <= y < BAND_H:
+            continue
         for dx in range(-radius, radius + 1):
             if dx*dx + dy*dy <= radius*radius:
-                px = center_x + dx
-                py = center_y + dy
-                if 0 <= px < 160 and 0 <= py < 80:
-                    set_window(px, py, px, py)
-                    send_byte(0xFF, 1)
-                    send_byte(0xFF, 1)
+                band.pixel(center_x + dx, y, WHITE)
     # Black X lines
     points1 = [(center_x - radius//2, center_y - radius), (center_x, center_y - radius//3), (center_x + radius//2, center_y + radius)]
     points2 = [(center_x + radius//2, center_y - radius), (center_x, center_y - radius//3), (center_x - radius//2, center_y + radius)]
@@ -372,10 +405,7 @@ def draw_xrp_logo(center_x, center_y, radius):
             sy = 1 if y0 < y1 else -1
             err = dx - dy
             while True:
-                if 0 <= x0 < 160 and 0 <= y0 < 80:
-                    set_window(x0, y0, x0, y0)
-                    send_byte(0x00, 1)
-                    send_byte(0x00, 1)
+                band.pixel(x0, y0 - by, BLACK)
                 if x0 == x1 and y0 == y1: break
                 e2 = 2 * err
                 if e2 > -dy:
@@ -387,6 +417,115 @@ def draw_xrp_logo(center_x, center_y, radius):
     draw_line(points1)
     draw_line(points2)
     draw_line(points3)
+# === Streamed full frames (big logo, server-rendered screens) ===
+def stream_frame(r, kind, paint=None, copy=None):
+    # Read a 160x80 RGB565 body from r (socket or flash file) straight into each
+    # band, noise wherever it fell short, then paint(by) on top; what arrived is
+    # also written to the open file copy. Closes r; True if the whole frame came in.
+    begin_screen(kind)
+    complete = True
+    for by in range(0, 80, BAND_H):
+        got = 0
+        while r is not None and got < len(band_buf):
+            try:
+                n = r.readinto(band_mv[got:])
+            except:
+                n = 0
+            if not n:
+                r.close()
+                r = None
+                complete = False
+                tm['ret'] += 1
+            else:
+                got += n
+        if copy is not None and got:
+            try:
+                copy.write(band_mv[:got])
+            except:
+                copy = None   # flash full: still paint, just don't keep it
+        # Partial frame still looks fine; noise for whatever did not arrive
+        noise_fill(got & ~1)
+        if paint is not None:
+            paint(by)
+        send_band(by)
+    end_screen()
+    if r is not None:
+        r.close()
+    return complete
+def draw_big_coin_logo(overlay):
+    # The frame carries its own black bars, so only the overlay text is
+    # composited on top; noise is only needed where the logo did not arrive.
+    # Streamed from flash; the network only sees the occasional 304.
+    name = f'big_{coin_endpoint}.rgb565'
+    r = None
+    if fetch_asset(name, f'/biglogo/{coin_endpoint}.rgb565', 160 * 80 * 2):
+        try:
+            r = open('/' + name, 'rb')
+        except:
+            pass
+    if r is None:
+        load_coin_logo()
+        def paint(by):
+            noise_fill()
+            draw_coin_logo(70, 30, by) # Fallback if no big logo available
+            draw_text(30, 4, overlay, by)
+        present(paint, 'big')
+        return
+    stream_frame(r, 'big', lambda by: draw_text(30, 4, overlay, by))
+# === Thin-client mode ===
+# The server renders the same screens (x_mas_server /frame) so the device only
+# blits 25.6 KB per minute; the local renderer above stays as the fallback for
+# when /frame is unreachable, so a server rollback never blanks a screen.
+# Each screen's last frame is kept on flash with its ETag: a frame only changes
+# with the prices, so most minutes the server answers 304 and the panel is
+# repainted from flash. /state is still read every THIN_STATE_EVERY cycles so the
+# fallback renderer and the warm state never go stale.
+THIN_CLIENT = True
+THIN_STATE_EVERY = 10
+FRAME_BYTES = 160 * 80 * 2
+frame_etags = {}   # screen → ETag of /frame_<screen>.rgb565 (kept in warm state)
+def show_server_frame(screen):
+    t0 = time.ticks_ms()
+    path = f'/frame_{screen}.rgb565'
+    etag = frame_etags.get(screen) if flash_size(path) == FRAME_BYTES else None
+    try:
+        r = urequests.get(f'{data_proxy_url}/frame?mac={mac_str}&screen={screen}',
+                          headers={'If-None-Match': etag} if etag else {}, timeout=25)
+    except:
+        tm['ret'] += 1
+        return False
+    if r.status_code == 304:
+        r.close()
+        tm_lat(t0)
+        try:
+            stream_frame(open(path, 'rb'), screen)
+            return True
+        except:
+            frame_etags.pop(screen, None)
+            return False
+    if r.status_code != 200:
+        r.close()
+        return False
+    frame_etags.pop(screen, None)
+    new_etag = r.headers.get('ETag')
+    try:
+        f = open(path + '.tmp', 'wb')
+    except:
+        f = None
+    complete = stream_frame(r.raw, screen, copy=f)
+    if complete:
+        tm_lat(t0)
+    if f is not None:
+        f.close()
+        try:
+            if complete and new_etag:
+                os.rename(path + '.tmp', path)   # a short copy fails the size check above
+                frame_etags[screen] = new_etag
+            else:
+                os.remove(path + '.tmp')
+        except Exception as e:
+            print('frame save fail', e)
+    return True
    
 # === Get MAC and WiFi interface ===
 mac_bytes = machine.unique_id()
@@ -492,43 +631,189 @@ name_for_mac = {
     '34:98:7A:07:06:B4': "Chris's",
 }
 display_name = name_for_mac.get(mac_str, "Chris's")
-# === Data fetch ===
-def fetch_data():
-    global last_price, last_value, last_time, current_rank, last_current_rank, rank_dict, last_rank_dict
+
+# === Warm state (RTC memory: survives machine.reset(), not power loss) ===
+# The loop resets itself every 30 cycles; without this every reset re-fetched the
+# prices and rank it already had a minute earlier (the logo is cached on flash).
+# Layout: b'XW' + ver + 2-byte json length + json.
+WARM_MAGIC = b'XW'
+WARM_VER = 3
+WARM_MAX = 2048          # ESP32 RTC user memory size
+WARM_FRESH_S = 90        # restored data younger than this skips the first fetch
+warm_fresh = False
+reset_why = ''           # warm_reset() reason from before the last reset
+
+def save_warm_state(why=''):
     try:
-        r = urequests.get(f'{data_proxy_url}/{coin_endpoint}', timeout=10)
-        price_text = r.text.strip()
-        r.close()
-        if price_text != "error":
-            price = float(price_text)
-            if coin == 'BTC':
-                last_price = f"${round(price)}"
-            else:
-                last_price = f"${price}"
-            last_value = price * amount # Keep as float
-    except:
-        pass
+        js = ujson.dumps({
+            't': time.time(), 'p': last_price, 'v': last_value, 'tm': last_time,
+            'r': last_current_rank, 'rv': rival_line, 'why': why, 'fe': frame_etags,
+        }).encode()
+        if 5 + len(js) > WARM_MAX:
+            return
+        machine.RTC().memory(WARM_MAGIC + bytes([WARM_VER, len(js) >> 8, len(js) & 0xFF]) + js)
+    except Exception as e:
+        print('warm save fail', e)
+
+def load_warm_state():
+    global last_price, last_value, last_time, current_rank, last_current_rank
+    global rival_line, warm_fresh, reset_why
+    try:
+        raw = machine.RTC().memory()
+        if len(raw) < 5 or raw[:2] != WARM_MAGIC or raw[2] != WARM_VER:
+            return
+        n = (raw[3] << 8) | raw[4]
+        st = ujson.loads(raw[5:5 + n])
+        reset_why = st.get('why', '')
+        last_price = st['p']
+        last_value = float(st['v'])
+        last_time = st['tm']
+        current_rank = last_current_rank = st['r']
+        rival_line = st['rv']
+        frame_etags.update(st.get('fe', {}))
+        age = time.time() - st['t']
+        warm_fresh = 0 <= age < WARM_FRESH_S
+        print('warm state restored, age', age)
+    except Exception as e:
+        print('warm load fail', e)
+
+def warm_reset(reason=''):
+    print('RESET:', reason)
+    save_warm_state(reason)
+    machine.reset()
+
+load_warm_state()
+
+# === Telemetry (one small POST per cycle to /telemetry) ===
+LAT_EDGES = (100, 250, 500, 1000, 2500)   # ms bucket bounds; last bucket is the rest
+
+def tm_new():
+    return {'lat': [0] * (len(LAT_EDGES) + 1), 'ret': 0, 'mem': gc.mem_free(), 'paint': 0, 'big': 0}
+
+tm = tm_new()
+
+def tm_lat(t0):
+    ms = time.ticks_diff(time.ticks_ms(), t0)
+    i = 0
+    while i < len(LAT_EDGES) and ms >= LAT_EDGES[i]:
+        i += 1
+    tm['lat'][i] += 1
+
+def tm_mem():
+    f = gc.mem_free()
+    if f < tm['mem']:
+        tm['mem'] = f
+
+def send_telemetry():
+    """Best effort: a lost beacon is fine, a stalled cycle is not."""
+    global tm, spi_bytes
+    tm_mem()
+    tm['mac'] = mac_str
+    tm['rc'] = machine.reset_cause()
+    tm['why'] = reset_why
+    tm['spi'] = spi_bytes
+    spi_bytes = 0
     try:
-        r = urequests.get(f'{data_proxy_url}/time', timeout=10)
-        t = r.text.strip()
+        r = urequests.post(f'{data_proxy_url}/telemetry', data=ujson.dumps(tm),
+                           headers={'Content-Type': 'application/json'}, timeout=5)
         r.close()
-        if t != "error" and len(t) == 8:
-            hh = (int(t[:2]) + 1) % 24
-            last_time = f"{hh:02d}:{t[3:5]}"
-    except:
-        pass
+    except Exception as e:
+        print('telemetry fail', e)
+    tm = tm_new()
+# === Data fetch ===
+# One /state round trip per minute. Fixed five-line layout:
+#   price ("$0.5123" or "") / holding value ("12.34" or "") / "HH:MM" / own rank / rival line
+def fetch_data():
+    global last_price, last_value, last_time, current_rank, last_current_rank, rival_line
     try:
-        r = urequests.get(f'{data_proxy_url}/rank', timeout=10)
-        rank_json = ujson.loads(r.text)
+        t0 = time.ticks_ms()
+        r = urequests.get(f'{data_proxy_url}/state?mac={mac_str}', timeout=10)
+        code = r.status_code
+        lines = r.text.split('\n')
         r.close()
-        last_rank_dict = rank_json # Save full good dict
-        rank_dict = rank_json # Use for this cycle
-        new_rank = rank_json.get(mac_str, 99)
-        current_rank = new_rank
-        last_current_rank = new_rank
+        tm_lat(t0)
+        if code != 200 or len(lines) != 5:
+            raise ValueError('bad state')
+        new_rank = int(lines[3])
+        if lines[0]:
+            last_price = lines[0]
+        if lines[1]:
+            last_value = float(lines[1]) # Keep as float
+        if lines[2]:
+            last_time = lines[2]
+        current_rank = last_current_rank = new_rank
+        rival_line = lines[4]
     except:
+        tm['ret'] += 1
         current_rank = last_current_rank
-        rank_dict = last_rank_dict # Fall back to last good full dict
+    tm_mem()
+
+# === Local renderer (fallback when the server frame is unavailable) ===
+def draw_main_screen():
+    load_coin_logo()
+    title = display_name + " " + coin
+    price_str = f"{coin}:" + last_price
+    try:
+        val_str = "VAL:$%.2f" % float(last_value)
+    except Exception:
+        val_str = "VAL:$---"
+
+    string = "ERROR XD"
+    r = random.randint(1, 2)
+    if r == 1:
+        if rival_line:
+            string = rival_line
+    elif r == 2:
+        if random.randint(0, 3):
+            string = f"LUK N:{random.randint(0, 99)}"
+        else:
+            string = f"LUK N:{67}"
+
+    def paint(by):
+        noise_fill()
+        draw_text(8, 4, title, by)
+        draw_text(8, 22, price_str, by)
+        draw_text(8, 42, val_str, by)
+        draw_text(8, 62, string, by)
+        draw_coin_logo(114, 58, by)
+        if current_rank < 99:
+            draw_rank(str(current_rank), current_rank, by)
+    present(paint, 'main')
+
+# === Change wait (long poll) ===
+# On: idle by parking on the server's /wait, which answers early when this
+# screen's price, the ranks or secondary.mpy changed. Off, or whenever /wait
+# fails, the plain idle loop runs out the rest of the period as before.
+LONG_POLL = True
+wait_since = -1
+def wait_change(start, ms):
+    # Idle until ms after start; the change reason if one arrived first, else None
+    global wait_since
+    polling = LONG_POLL
+    while True:
+        left = ms - time.ticks_diff(time.ticks_ms(), start)
+        if left <= 0:
+            return None
+        if not polling:
+            machine.idle()
+            continue
+        try:
+            secs = min(left // 1000 + 1, 50)
+            r = urequests.get(f'{data_proxy_url}/wait?mac={mac_str}&app=rect&since={wait_since}&t={secs}',
+                              timeout=secs + 10)
+            try:
+                parts = r.text.split() if r.status_code == 200 else ()
+            finally:
+                r.close()
+            if len(parts) != 2:
+                polling = False
+                continue
+            wait_since = int(parts[0])
+            if parts[1] not in ('hello', 'reset', 'timeout'):
+                return parts[1]
+        except Exception as e:
+            print('wait fail', e)
+            polling = False
 
 # === Main loop ===
 it_C = 0
@@ -537,68 +822,42 @@ while True:
         current_time = time.ticks_ms()
         # Soft reboot every ~30 cycles so WiFi/DNS cannot stay wedged forever
         if it_C > 0 and it_C % 30 == 0:
-            machine.reset()
+            warm_reset('cycle %d' % it_C)
             it_C = 0
 
-        fetch_data()
-        set_window(0, 0, 159, 79)
-        for _ in range(160 * 80):
-            red = random.randint(0, 3)
-            green = random.randint(0, 6)
-            blue = random.randint(0, 3)
-            color = (red << 11) | (green << 5) | blue
-            send_byte(color >> 8, 1)
-            send_byte(color & 0xFF, 1)
-        draw_text(8, 4, display_name + " " + coin)
-        draw_text(8, 22, f"{coin}:" + last_price)
-        try:
-            val_str = "VAL:$%.2f" % float(last_value)
-        except Exception:
-            val_str = "VAL:$---"
-        draw_text(8, 42, val_str)
-
-        string = "ERROR XD"
-        r = random.randint(1, 2)
-        is_chris = mac_str == '34:98:7A:07:06:B4'
-        is_pattie = mac_str == '34:98:7A:07:11:24'
-        if r == 1:
-            if rank_dict and len(rank_dict) > 1:
-                candidates = [m for m in rank_dict if m != mac_str]
-                if is_chris:
-                    candidates = [m for m in candidates if m != '34:98:7A:07:11:24']
-                if is_pattie:
-                    candidates = [m for m in candidates if m != '34:98:7A:07:06:B4']
-                if candidates:
-                    idx = random.randint(0, len(candidates) - 1)
-                    rand_mac = candidates[idx]
-                    abbr = abbr_dict.get(rand_mac, "??")
-                    o_rank = rank_dict.get(rand_mac, 99)
-                    if o_rank < 99:
-                        string = f"{abbr} LT {o_rank}"
-        elif r == 2:
-            if random.randint(0, 3):
-                string = f"LUK N:{random.randint(0, 99)}"
-            else:
-                string = f"LUK N:{67}"
-
-        draw_text(8, 62, string)
-        draw_coin_logo(114, 58)
-
-        if current_rank < 99:
-            draw_rank(str(current_rank), current_rank)
+        t_paint = time.ticks_ms()
+        if THIN_CLIENT and show_server_frame('main'):
+            if it_C % THIN_STATE_EVERY == THIN_STATE_EVERY - 1:
+                fetch_data()   # lands just before the 30-cycle warm_reset saves it
+        elif warm_fresh:
+            warm_fresh = False   # first cycle after a soft reset: data is still current
+            draw_main_screen()
+        else:
+            fetch_data()
+            draw_main_screen()
+        tm['paint'] = time.ticks_diff(time.ticks_ms(), t_paint)
+        why = None
         if random.randint(1, 3) > 0:
-            while time.ticks_diff(time.ticks_ms(), current_time) < 60000:
-                machine.idle()
-            draw_big_coin_logo()
-            try:
-                draw_text(30, 4, "VAL:$%.2f" % float(last_value))
-            except Exception:
-                draw_text(30, 4, "VAL:$---")
+            why = wait_change(current_time, 60000)
+            if why and why.startswith('fw:'):
+                warm_reset('firmware')   # boot.py fetches the new build
+            if not why:
+                t_paint = time.ticks_ms()
+                if not (THIN_CLIENT and show_server_frame('big')):
+                    try:
+                        val_str = "VAL:$%.2f" % float(last_value)
+                    except Exception:
+                        val_str = "VAL:$---"
+                    draw_big_coin_logo(val_str)
+                tm['big'] = time.ticks_diff(time.ticks_ms(), t_paint)
 
         current_time = time.ticks_ms()
+        send_telemetry()
         it_C += 1
-        while time.ticks_diff(time.ticks_ms(), current_time) < 60000:
-            machine.idle()
+        if why:
+            continue   # new price/rank: skip the big screen, repaint main now
+        if (wait_change(current_time, 60000) or '').startswith('fw:'):
+            warm_reset('firmware')
     except Exception as e:
         print('MAIN EXC:', e)
         try:
@@ -611,4 +870,4 @@ while True:
             machine.idle()
         it_C += 1
         if it_C % 5 == 0:
-            machine.reset()
+            warm_reset('exception streak')
@@ -4,6 +4,7 @@ import machine
 import network
 import gc
 import os
+import ujson
 import usocket
 try:
     import random
@@ -11,7 +12,7 @@ except ImportError:                      # older MicroPython builds
     import urandom as random
 
 # Bump on every change to this file so the panel shows what it is running.
-VERSION = "1.2"
+VERSION = "1.4"
 
 # ===================== FIXED MAC CAPTURE (javamoss:9022 raw TCP) =====================
 # === Get MAC and WiFi interface ===
@@ -235,9 +236,48 @@ CHUNK_RETRIES = 2
 _resolved = None
 _fail_since = None                   # ticks_ms when current fail streak began
 _progress_timer = None
+_photo_next = 0                      # first chunk still to draw (resume point)
+reset_why = ''                       # soft_reset() reason from before the last reset
+
+# === Warm state (RTC memory: survives machine.reset(), not power loss) ===
+# Every healthy/fail reset used to redo DNS and restart the photo from chunk 0.
+# Layout: b'XT' + ver + 2-byte json length + json.
+WARM_MAGIC = b'XT'
+WARM_VER = 1
+# 15 chunks x 256 px = 16 full 240-px rows: the only places a fresh
+# row-aligned window can pick the stream back up.
+RESUME_CHUNKS = 15
+
+def save_warm_state(why=''):
+    try:
+        js = ujson.dumps({'ver': VERSION, 'addr': _resolved, 'next': _photo_next,
+                          'why': why}).encode()
+        machine.RTC().memory(WARM_MAGIC + bytes([WARM_VER, len(js) >> 8, len(js) & 0xFF]) + js)
+    except Exception as e:
+        print('warm save fail', e)
+
+def load_warm_state():
+    global _resolved, _photo_next, reset_why
+    try:
+        raw = machine.RTC().memory()
+        if len(raw) < 5 or raw[:2] != WARM_MAGIC or raw[2] != WARM_VER:
+            return
+        st = ujson.loads(raw[5:5 + ((raw[3] << 8) | raw[4])])
+        reset_why = st.get('why', '')
+        if st.get('ver') != VERSION:
+            return
+        if st.get('addr'):
+            _resolved = tuple(st['addr'])
+        _photo_next = st.get('next', 0)
+        print('warm state restored', _resolved, _photo_next)
+    except Exception as e:
+        print('warm load fail', e)
+
+load_warm_state()
 
 def soft_reset(reason=''):
     print('RESET:', reason)
+    save_warm_state(reason)
     time.sleep_ms(150)
     machine.reset()
 
@@ -404,22 +444,77 @@ def fill_band(y0, y1, hi, lo):
         send_byte(hi, 1)
         send_byte(lo, 1)
 
-# Life-sign: blue band so we know display works before network I/O
-try:
-    fill_band(0, 39, 0x00, 0x1F)   # top strip, RGB565 blue
-    print('display life-sign OK')
-except Exception as e:
-    print('display life-sign failed', e)
+# Life-sign: blue band so we know display works before network I/O.
+# Skipped when resuming: the panel keeps its frame memory across the RST pulse,
+# so the rows above the resume point are still the half-drawn photo.
+if not _photo_next:
+    try:
+        fill_band(0, 39, 0x00, 0x1F)   # top strip, RGB565 blue
+        print('display life-sign OK')
+    except Exception as e:
+        print('display life-sign failed', e)
 
 # Arm progress timer only AFTER display init so a reboot still shows life-sign next boot
 arm_progress_timer(HANG_MS)
 
+# === Telemetry (one small POST per photo dwell to /telemetry) ===
+LAT_EDGES = (100, 250, 500, 1000, 2500)   # ms bucket bounds; last bucket is the rest
+
+def tm_new():
+    return {'lat': [0] * (len(LAT_EDGES) + 1), 'ret': 0, 'mem': gc.mem_free(), 'paint': 0}
+
+tm = tm_new()
+
+def tm_lat(t0):
+    ms = time.ticks_diff(time.ticks_ms(), t0)
+    i = 0
+    while i < len(LAT_EDGES) and ms >= LAT_EDGES[i]:
+        i += 1
+    tm['lat'][i] += 1
+
+def tm_mem():
+    f = gc.mem_free()
+    if f < tm['mem']:
+        tm['mem'] = f
+
+def send_telemetry():
+    """Best effort: a lost beacon is fine, a stalled dwell is not."""
+    global tm
+    tm_mem()
+    tm['mac'] = mac_str
+    tm['ver'] = VERSION
+    tm['rc'] = machine.reset_cause()
+    tm['why'] = reset_why
+    try:
+        r = urequests.post(BASE_URL + '/telemetry', data=ujson.dumps(tm),
+                           headers={'Content-Type': 'application/json'}, timeout=SOCK_TIMEOUT)
+        r.close()
+    except Exception as e:
+        print('telemetry fail', e)
+    tm = tm_new()
+
 # === Photo constants ===
 CHUNKS = 225
 TOTAL_PIXELS = 240 * 240
 CHUNK_BYTES = 512
 
+def fetch_chunk(chunk_n):
+    """http_get_chunk with retries. Returns CHUNK_BYTES of data or None."""
+    for attempt in range(CHUNK_RETRIES):
+        t0 = time.ticks_ms()
+        data = http_get_chunk(chunk_n)
+        if data is not None and len(data) == CHUNK_BYTES:
+            tm_lat(t0)
+            return data
+        tm['ret'] += 1
+        time.sleep_ms(150)
+        if attempt == CHUNK_RETRIES - 1:
+            ensure_wifi()
+        gc.collect()
+    return None
+
 def update_photo():
+    global _photo_next
     kick_progress()
     maybe_healthy_reboot()
     maybe_fail_reboot()
@@ -428,23 +523,30 @@ def update_photo():
         return False
     gc.collect()
     print('update_photo free=', gc.mem_free())
+    t_paint = time.ticks_ms()
+
+    # Resume only works while the server still holds this MAC's photo (600 s);
+    # if the first resumed chunk is refused, start a new picture instead.
+    start = _photo_next
+    first = None
+    if start:
+        first = fetch_chunk(start)
+        if first is None:
+            print('resume failed at', start, '- new photo')
+            start = _photo_next = 0
+        else:
+            print('resuming photo at chunk', start)
 
-    set_window(0, 0, 239, 239)
-    pixel_index = 0
+    set_window(0, start * 256 // 240, 239, 239)
+    pixel_index = start * 256
 
-    for chunk_n in range(CHUNKS):
+    for chunk_n in range(start, CHUNKS):
         kick_progress()
         maybe_healthy_reboot()
-        data = None
-        for attempt in range(CHUNK_RETRIES):
-            data = http_get_chunk(chunk_n)
-            if data is not None and len(data) == CHUNK_BYTES:
-                break
-            data = None
-            time.sleep_ms(150)
-            if attempt == CHUNK_RETRIES - 1:
-                ensure_wifi()
-            gc.collect()
+        if first is not None:
+            data, first = first, None
+        else:
+            data = fetch_chunk(chunk_n)
 
         if data is None:
             print('chunk fail', chunk_n)
@@ -458,59 +560,69 @@ def update_photo():
             pixel_index += 1
 
         data = None
+        if (chunk_n + 1) % RESUME_CHUNKS == 0:
+            _photo_next = chunk_n + 1
+            save_warm_state()
         if (chunk_n & 0x1F) == 0:
+            tm_mem()
             gc.collect()
             if chunk_n:
                 print('chunk', chunk_n)
 
+    _photo_next = 0
+    save_warm_state()
+    tm['paint'] = time.ticks_diff(time.ticks_ms(), t_paint)
     print('All chunks ok', pixel_index)
     return pixel_index == TOTAL_PIXELS
 
-# === Font (unchanged) ===
-font = {
-    ' ': [0x00,0x00,0x00,0x00,0x00],
-    '0': [0x7C,0xA2,0x92,0x8A,0x7C],
-    '1': [0x00,0x42,0xFE,0x02,0x00],
-    '2': [0x42,0x86,0x8A,0x92,0x62],
-    '3': [0x84,0x82,0xA2,0xD2,0x8C],
-    '4': [0x18,0x28,0x48,0xFE,0x08],
-    '5': [0xE4,0xA2,0xA2,0xA2,0x9C],
-    '6': [0x3C,0x52,0x92,0x92,0x0C],
-    '7': [0x80,0x8E,0x90,0xA0,0xC0],
-    '8': [0x6C,0x92,0x92,0x92,0x6C],
-    '9': [0x60,0x92,0x92,0x94,0x78],
-    ':': [0x00,0x36,0x36,0x00,0x00],
-    '.': [0x00,0x00,0x00,0x06,0x06],
-    '$': [0x24,0x54,0xFE,0x54,0x48],
-    '-': [0x08,0x08,0x08,0x08,0x08],
-    '&': [0x6C,0x92,0xAA,0x44,0x0A],
-    'A': [0x7E,0x90,0x90,0x90,0x7E],
-    'B': [0xFE,0x92,0x92,0x92,0x6C],
-    'C': [0x7C,0x82,0x82,0x82,0x44],
-    'D': [0xFE,0x82,0x82,0x82,0x7C],
-    'E': [0xFE,0x92,0x92,0x92,0x82],
-    'F': [0xFE,0x90,0x90,0x90,0x80],
-    'G': [0x7C,0x82,0x92,0x92,0x5C],
-    'H': [0xFE,0x10,0x10,0x10,0xFE],
-    'I': [0x00,0x82,0xFE,0x82,0x00],
-    'J': [0x04,0x02,0x82,0xFC,0x80],
-    'K': [0xFE,0x10,0x28,0x44,0x82],
-    'L': [0xFE,0x02,0x02,0x02,0x02],
-    'M': [0xFE,0x40,0x30,0x40,0xFE],
-    'N': [0xFE,0x20,0x10,0x08,0xFE],
-    'O': [0x7C,0x82,0x82,0x82,0x7C],
-    'P': [0xFE,0x90,0x90,0x90,0x60],
-    'Q': [0x7C,0x82,0x8A,0x84,0x7A],
-    'R': [0xFE,0x90,0x98,0x94,0x62],
-    'S': [0x62,0x92,0x92,0x92,0x8C],
-    'T': [0x80,0x80,0xFE,0x80,0x80],
-    'U': [0xFC,0x02,0x02,0x02,0xFC],
-    'V': [0xF8,0x04,0x02,0x04,0xF8],
-    'W': [0xFC,0x02,0x1C,0x02,0xFC],
-    'X': [0xC6,0x28,0x10,0x28,0xC6],
-    'Y': [0xE0,0x10,0x0E,0x10,0xE0],
-    'Z': [0x86,0x8A,0x92,0xA2,0xC2],
-}
+# === Generated tables (gen_tables.py; edit there and rerun) ===
+# 5 column bytes per glyph in FONT_CHARS order (bit 7 = top row)
+FONT_CHARS = ' 0123456789:.$-&ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+FONT = (
+    b'\x00\x00\x00\x00\x00'  # ' '
+    b'\x7c\xa2\x92\x8a\x7c'  # '0'
+    b'\x00\x42\xfe\x02\x00'  # '1'
+    b'\x42\x86\x8a\x92\x62'  # '2'
+    b'\x84\x82\xa2\xd2\x8c'  # '3'
+    b'\x18\x28\x48\xfe\x08'  # '4'
+    b'\xe4\xa2\xa2\xa2\x9c'  # '5'
+    b'\x3c\x52\x92\x92\x0c'  # '6'
+    b'\x80\x8e\x90\xa0\xc0'  # '7'
+    b'\x6c\x92\x92\x92\x6c'  # '8'
+    b'\x60\x92\x92\x94\x78'  # '9'
+    b'\x00\x36\x36\x00\x00'  # ':'
+    b'\x00\x00\x00\x06\x06'  # '.'
+    b'\x24\x54\xfe\x54\x48'  # '$'
+    b'\x08\x08\x08\x08\x08'  # '-'
+    b'\x6c\x92\xaa\x44\x0a'  # '&'
+    b'\x7e\x90\x90\x90\x7e'  # 'A'
+    b'\xfe\x92\x92\x92\x6c'  # 'B'
+    b'\x7c\x82\x82\x82\x44'  # 'C'
+    b'\xfe\x82\x82\x82\x7c'  # 'D'
+    b'\xfe\x92\x92\x92\x82'  # 'E'
+    b'\xfe\x90\x90\x90\x80'  # 'F'
+    b'\x7c\x82\x92\x92\x5c'  # 'G'
+    b'\xfe\x10\x10\x10\xfe'  # 'H'
+    b'\x00\x82\xfe\x82\x00'  # 'I'
+    b'\x04\x02\x82\xfc\x80'  # 'J'
+    b'\xfe\x10\x28\x44\x82'  # 'K'
+    b'\xfe\x02\x02\x02\x02'  # 'L'
+    b'\xfe\x40\x30\x40\xfe'  # 'M'
+    b'\xfe\x20\x10\x08\xfe'  # 'N'
+    b'\x7c\x82\x82\x82\x7c'  # 'O'
+    b'\xfe\x90\x90\x90\x60'  # 'P'
+    b'\x7c\x82\x8a\x84\x7a'  # 'Q'
+    b'\xfe\x90\x98\x94\x62'  # 'R'
+    b'\x62\x92\x92\x92\x8c'  # 'S'
+    b'\x80\x80\xfe\x80\x80'  # 'T'
+    b'\xfc\x02\x02\x02\xfc'  # 'U'
+    b'\xf8\x04\x02\x04\xf8'  # 'V'
+    b'\xfc\x02\x1c\x02\xfc'  # 'W'
+    b'\xc6\x28\x10\x28\xc6'  # 'X'
+    b'\xe0\x10\x0e\x10\xe0'  # 'Y'
+    b'\x86\x8a\x92\xa2\xc2'  # 'Z'
+)
+# === End generated tables ===
 
 WHITE = 0xFFFF
 # Bright RGB565 colors only — text sits on top of a photo, so it has to stay readable.
@@ -533,10 +645,10 @@ def draw_text(x_start, y_start, text, color=WHITE):
     lo = color & 0xFF
     x = x_start
     for char in text.upper():
-        if char in font:
-            bitmap = font[char]
+        g = FONT_CHARS.find(char) * 5
+        if g >= 0:
             for col in range(5):
-                bits = bitmap[col]
+                bits = FONT[g + col]
                 for row in range(8):
                     if bits & (1 << (7 - row)):
                         set_window(x + col, y_start + row, x + col, y_start + row)
@@ -546,12 +658,50 @@ def draw_text(x_start, y_start, text, color=WHITE):
 
 def text_width(text):
     """Drawn width in px — unknown chars are skipped without advancing x."""
-    return sum(6 for c in text.upper() if c in font)
+    return sum(6 for c in text.upper() if c in FONT_CHARS)
 
 def draw_text_centered(y_start, text, color=WHITE):
     x = 120 - text_width(text) // 2
     draw_text(x if x > 0 else 0, y_start, text, color)
 
+# === Change wait (long poll) ===
+# On: the dwell parks on the server's /wait, so a photo added to this screen's
+# folder shows within seconds and a new tertiary.mpy triggers the OTA reset.
+# Each poll is capped well under HANG_MS and kicks progress. Off, or whenever
+# /wait fails, the dwell is the plain sleep loop as before.
+LONG_POLL = True
+_wait_since = -1
+
+def wait_change(start, ms):
+    """Dwell until ms after start; the change reason if one arrived first, else None."""
+    global _wait_since
+    polling = LONG_POLL
+    while time.ticks_diff(time.ticks_ms(), start) < ms:
+        kick_progress()
+        maybe_healthy_reboot()
+        if not polling:
+            machine.idle()
+            time.sleep_ms(200)
+            continue
+        try:
+            secs = min((ms - time.ticks_diff(time.ticks_ms(), start)) // 1000 + 1, 50)
+            r = urequests.get(BASE_URL + '/wait?mac=%s&app=circle&since=%d&t=%d'
+                              % (mac_str, _wait_since, secs), timeout=secs + 10)
+            try:
+                parts = r.text.split() if r.status_code == 200 else ()
+            finally:
+                r.close()
+            if len(parts) != 2:
+                polling = False
+                continue
+            _wait_since = int(parts[0])
+            if parts[1] not in ('hello', 'reset', 'timeout'):
+                return parts[1]
+        except Exception as e:
+            print('wait fail', e)
+            polling = False
+    return None
+
 # === Main loop: keep retrying forever; never sit permanently hung ===
 # - success: dwell PHOTO_DWELL_MS, then next photo
 # - fail: show NO PHOTO / CHECK SERVER, retry immediately, soft reboot after ~30s
@@ -571,14 +721,15 @@ while True:
             draw_text_centered(100, "ENJOY!!!", text_color)
             draw_text_centered(112, "V" + VERSION, text_color)
             draw_text_centered(124, OWNER, text_color)
-            t0 = time.ticks_ms()
-            while time.ticks_diff(time.ticks_ms(), t0) < PHOTO_DWELL_MS:
-                kick_progress()
-                maybe_healthy_reboot()
-                machine.idle()
-                time.sleep_ms(200)
+            send_telemetry()
+            why = wait_change(time.ticks_ms(), PHOTO_DWELL_MS)
+            if why:
+                print('change:', why)
+                if why.startswith('fw:'):
+                    soft_reset('firmware')   # boot2 fetches the new build
         else:
             note_fail_start()
+            _photo_next = 0   # error text below paints over the partial photo
             print('Photo FAIL elapsed_ms=', fail_elapsed_ms())
             # Draw error first so a soft reboot still leaves a useful message on panel
             try:
@@ -596,6 +747,7 @@ while True:
             maybe_fail_reboot()
     except Exception as e:
         note_fail_start()
+        _photo_next = 0
         print('MAIN EXC:', e)
         try:
             import sys
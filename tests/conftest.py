@@ -0,0 +1,67 @@
+"""Shared fixtures: x_mas_server imported from the repo root, with the files it
+writes under REPO_DIR and its in-memory state redirected per test.
+
+    python3 -m pytest -q tests
+"""
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import x_mas_server as xs
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(xs, 'BUILD_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(xs, 'BUILD_INDEX', str(tmp_path / 'cache' / 'index.json'))
+    monkeypatch.setattr(xs, 'HISTORY_FILE', str(tmp_path / 'price_history.bin'))
+    monkeypatch.setattr(xs, 'LOGO_DIR', str(tmp_path))
+    for name in ('build_index', 'releases', 'device_builds', 'fw_sent', 'delta_cache',
+                 '_build_sha256', '_asset_etags', '_compile_state', 'frame_cache',
+                 'logo_assets', 'device_telemetry', 'spark_cache', 'bus_topics'):
+        monkeypatch.setattr(xs, name, {})
+    monkeypatch.setattr(xs, 'cached_prices', dict.fromkeys(xs.COINGECKO_IDS, 'error'))
+    monkeypatch.setattr(xs, 'price_updated', {})
+    monkeypatch.setattr(xs, 'price_history', np.zeros_like(xs.price_history))
+    monkeypatch.setattr(xs, 'history_next', [0] * len(xs.HISTORY_COINS))
+    monkeypatch.setattr(xs, 'snapshot', xs.build_snapshot())
+    for target in xs.OTA_TARGETS:
+        monkeypatch.setitem(xs.OTA_TARGETS, target, str(tmp_path / target))
+    return xs
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.fixture
+def set_prices(server):
+    """What a price refresh leaves behind: cached_prices plus a new snapshot."""
+    def set_prices(**prices):
+        server.cached_prices.update(prices)
+        server.price_version += 1
+        server.snapshot = server.build_snapshot()
+    return set_prices
+
+
+@pytest.fixture
+def deploy(server):
+    """What compile_firmware_loop does for a new build; returns its sha256."""
+    def deploy(target, data):
+        key = hashlib.sha1(data).hexdigest()
+        os.makedirs(server.BUILD_CACHE_DIR, exist_ok=True)
+        with open(os.path.join(server.BUILD_CACHE_DIR, key + '.mpy'), 'wb') as f:
+            f.write(data)
+        server.build_index[key] = {'target': target, 'built': time.time()}
+        with open(server.OTA_TARGETS[target], 'wb') as f:
+            f.write(data)
+        server._asset_etags.pop(server.OTA_TARGETS[target], None)   # same-size rewrites can keep the mtime
+        server.start_release(target)
+        return hashlib.sha256(data).hexdigest()
+    return deploy
@@ -0,0 +1,51 @@
+import os
+
+from PIL import Image
+
+
+def make_logo(server, coin='btc', color=(255, 128, 0)):
+    path = os.path.join(server.LOGO_DIR, f'{coin}.png')
+    Image.new('RGB', (64, 64), color).save(path)
+    return path
+
+
+def test_small_logo_etag_and_304(server, client):
+    make_logo(server)
+    r = client.get('/logo/btc.rgb565')
+    assert r.status_code == 200 and len(r.data) == 800
+    assert r.data[:2] == bytes.fromhex('fc00')       # (255, 128, 0) as big-endian RGB565
+    assert r.cache_control.public and r.cache_control.max_age == server.LOGO_MAX_AGE
+    assert client.get('/logo/btc.rgb565',
+                      headers={'If-None-Match': r.headers['ETag']}).status_code == 304
+    assert client.get('/logo/nope.rgb565').status_code == 404
+
+
+def test_new_png_changes_the_etag(server, client):
+    path = make_logo(server)
+    etag = client.get('/biglogo/btc.rgb565').headers['ETag']
+    make_logo(server, color=(0, 0, 255))
+    os.utime(path, (1, os.path.getmtime(path) + 10))
+    r = client.get('/biglogo/btc.rgb565', headers={'If-None-Match': etag})
+    assert r.status_code == 200 and r.headers['ETag'] != etag and len(r.data) == 160 * 80 * 2
+
+
+def test_biglogo_chunks(server, client):
+    make_logo(server)
+    whole = client.get('/biglogo/btc.rgb565').data
+    n = int(client.get('/biglogo_chunks/btc').data)
+    assert n == 50
+    last = client.get(f'/biglogo/btc/{n - 1}')
+    assert last.status_code == 200 and last.data == whole[-512:]
+    assert client.get(f'/biglogo/btc/{n}').status_code == 404
+    assert client.get('/biglogo_chunks/nope').data == b'0'
+
+
+def test_firmware_source_revalidates(server, client, tmp_path, monkeypatch):
+    boot = tmp_path / 'boot.py'
+    boot.write_text('# boot\n')
+    monkeypatch.setattr(server, 'BOOT_PY', str(boot))
+    r = client.get('/boot.py')
+    assert r.status_code == 200 and r.cache_control.no_cache and r.cache_control.public
+    assert client.get('/boot.py', headers={'If-None-Match': r.headers['ETag']}).status_code == 304
+    boot.write_text('# boot v2\n')
+    assert client.get('/boot.py', headers={'If-None-Match': r.headers['ETag']}).status_code == 200
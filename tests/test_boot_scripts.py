@@ -0,0 +1,105 @@
+"""The boot scripts run on the devices, so they are loaded here a function at a
+time (by name, from their source) into a namespace that stands in for the
+MicroPython globals they use."""
+import ast
+import binascii
+import hashlib
+import io
+import os
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOOT = os.path.join(REPO_DIR, 'boot.py')
+CIRCLE_BOOT = os.path.join(REPO_DIR, 'circle_display', 'boot2.py')
+# Each device flashes one boot file, so these are copied between them on purpose
+SHARED = ('file_sha256', 'remember_sha', 'pump', 'install')
+
+
+def functions(path):
+    with open(path) as f:
+        src = f.read()
+    return {n.name: ast.get_source_segment(src, n) for n in ast.parse(src).body
+            if isinstance(n, ast.FunctionDef)}
+
+
+def load(path, *names, **env):
+    ns = dict(env)
+    defs = functions(path)
+    for name in names:
+        exec(defs[name], ns)
+    return ns
+
+
+class Stream(io.BytesIO):
+    """A socket's readinto(buf, nbytes), in small pieces like the network gives."""
+    def readinto(self, buf, n=None):
+        n = min(len(buf), n or len(buf), 300)
+        data = self.read(n)
+        buf[:len(data)] = data
+        return len(data)
+
+
+def test_circle_boot_copy_is_identical():
+    with open(CIRCLE_BOOT, 'rb') as a, open(os.path.join(REPO_DIR, 'boot2.py'), 'rb') as b:
+        assert a.read() == b.read()
+
+
+@pytest.mark.parametrize('name', SHARED)
+def test_shared_helpers_match(name):
+    assert functions(BOOT)[name] == functions(CIRCLE_BOOT)[name]
+
+
+@pytest.fixture
+def ota():
+    return load(BOOT, *SHARED, os=os, hashlib=hashlib, binascii=binascii,
+                OTA_BLOCK=1024, ota_buf=bytearray(1024))
+
+
+def test_pump_streams_and_hashes(ota):
+    body = os.urandom(5000)
+    for n in (len(body), -1):
+        out, h = io.BytesIO(), hashlib.sha256()
+        assert ota['pump'](Stream(body), out, n, h) == len(body)
+        assert out.getvalue() == body and h.digest() == hashlib.sha256(body).digest()
+    with pytest.raises(OSError):
+        ota['pump'](Stream(body), io.BytesIO(), len(body) + 1, hashlib.sha256())
+
+
+def test_install_only_on_matching_sha(ota, tmp_path):
+    path, tmp = str(tmp_path / 'secondary.mpy'), str(tmp_path / 'secondary.mpy.tmp')
+    (tmp_path / 'secondary.mpy').write_bytes(b'old')
+    (tmp_path / 'secondary.mpy.tmp').write_bytes(b'new')
+    with pytest.raises(OSError):
+        ota['install'](tmp, path, hashlib.sha256(b'new'), '0' * 64)
+    assert (tmp_path / 'secondary.mpy').read_bytes() == b'old'
+    sha = hashlib.sha256(b'new').hexdigest()
+    ota['install'](tmp, path, hashlib.sha256(b'new'), sha)
+    assert (tmp_path / 'secondary.mpy').read_bytes() == b'new' and not os.path.exists(tmp)
+    assert (tmp_path / 'secondary.sha').read_text() == f'3 {sha}'
+    assert ota['file_sha256'](path) == sha
+
+
+def test_probe_fails_quietly(capsys):
+    connects = []
+
+    def tcp_socket(host, port, timeout_s):
+        connects.append((host, port, timeout_s))
+        if host == 'down':
+            raise OSError('ETIMEDOUT')
+        return io.BytesIO()
+    ns = load(BOOT, 'split_url', 'probe', tcp_socket=tcp_socket, PROBE_TIMEOUT_S=2)
+    assert ns['probe']('http://up:9019')
+    assert not ns['probe']('http://down')
+    assert not ns['probe']('https://up') and not ns['probe']('http://up:x')   # bad URLs
+    assert connects == [('up', 9019, 2), ('down', 80, 2)]
+
+
+def test_last_good_source_goes_first(tmp_path):
+    src = tmp_path / 'ota_src.txt'
+    ns = load(BOOT, 'ota_bases', LAN_OTA='http://lan:9019', OTA_SRC=str(src),
+              server_host='10.0.0.5', server_port='9019', DEFAULT_HOST='update.example')
+    first = ns['ota_bases']()
+    assert first[:3] == ['http://lan:9019', 'http://10.0.0.5:9019', 'http://update.example']
+    src.write_text('http://update.example\n')
+    assert ns['ota_bases']() == ['http://update.example'] + [u for u in first if u != 'http://update.example']
@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture
+def build(server, tmp_path, monkeypatch):
+    """_build on tmp_path/app.py → tmp_path/secondary.mpy with mpy-cross and the
+    footprint faked; the fake compiler counts its runs in build.runs."""
+    cross = tmp_path / 'mpy-cross'
+    cross.write_bytes(b'fake')
+    monkeypatch.setattr(server, 'MPY_CROSS_PATH', str(cross))
+    monkeypatch.setattr(server, '_cross_sha', (None, None))
+    src, dst = str(tmp_path / 'app.py'), str(tmp_path / 'secondary.mpy')
+
+    def compile_mpy(src, out, label):
+        if build.fail:
+            return None
+        build.runs += 1
+        with open(src, 'rb') as f, open(out, 'wb') as o:
+            o.write(b'MPY' + f.read())
+        return 0.01
+
+    def footprint(src, mpy=None):
+        return {'mpy': os.path.getsize(mpy), 'qstrs': 1, 'data': 0, 'heap': build.heap,
+                'via': 'model', 'top': []}
+    monkeypatch.setattr(server, '_compile_mpy', compile_mpy)
+    monkeypatch.setattr(server.firmware_footprint, 'footprint', footprint)
+
+    def build(text=None):
+        if text is not None:
+            with open(src, 'w') as f:
+                f.write(text)
+        return server._build(src, dst, 'app')
+    build.runs, build.fail, build.heap = 0, False, 1000
+    build.src, build.dst = src, dst
+    return build
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_unchanged_source_is_not_rebuilt(server, build):
+    assert build('x = 1\n') and read(build.dst) == b'MPYx = 1\n'
+    assert not build() and build.runs == 1
+    os.utime(build.src)                                # touched, same bytes
+    assert not build() and build.runs == 1
+    entry, = server.build_index.values()
+    assert entry['target'] == 'secondary.mpy' and entry['over_budget'] == []
+    assert json.load(open(server.BUILD_INDEX)) == server.build_index
+
+
+def test_revert_and_restart_restore_from_cache(server, build):
+    build('x = 1\n')
+    assert build('x = 2\n') and build.runs == 2
+    assert build('x = 1\n') and read(build.dst) == b'MPYx = 1\n'
+    assert build.runs == 2                             # back to a cached build
+    server._compile_state.clear()                      # restart, right build in place
+    assert not build() and build.runs == 2
+    os.remove(build.dst)
+    server._compile_state.clear()
+    assert build() and read(build.dst) == b'MPYx = 1\n' and build.runs == 2
+
+
+def test_failed_build_retries(server, build):
+    build.fail = True
+    assert not build('x = 1\n') and not os.path.exists(build.dst)
+    build.fail = False
+    assert build() and build.runs == 1
+
+
+def test_missing_source_or_compiler(server, build):
+    assert not build()
+    os.remove(server.MPY_CROSS_PATH)
+    assert not build('x = 1\n') and build.runs == 0
+
+
+def test_over_budget_build_is_refused_until_the_budget_allows_it(server, build, monkeypatch):
+    monkeypatch.setitem(server.firmware_footprint.BUDGETS, 'secondary.mpy', {'heap': 500})
+    assert not build('x = 1\n') and not os.path.exists(build.dst)
+    entry, = server.build_index.values()
+    assert entry['over_budget'] == ['heap 1000 > 500']
+    assert server.delta_bases('secondary.mpy') == {}
+    assert not build() and build.runs == 1            # cached, still refused
+    monkeypatch.setitem(server.firmware_footprint.BUDGETS, 'secondary.mpy', {'heap': 2000})
+    assert len(server.delta_bases('secondary.mpy')) == 1
+    assert build() and read(build.dst) == b'MPYx = 1\n' and build.runs == 1
+    assert entry['over_budget'] == []
+    monkeypatch.setitem(server.firmware_footprint.BUDGETS, 'secondary.mpy', {'heap': 500})
+    assert server.delta_bases('secondary.mpy') == {}  # budget cut: no longer a delta base
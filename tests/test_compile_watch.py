@@ -0,0 +1,67 @@
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+
+class Stop(Exception):
+    pass
+
+
+@pytest.fixture
+def watcher(server, tmp_path, monkeypatch):
+    """compile_firmware_loop on two sources in tmp_path; yields (srcs, compiled queue)."""
+    src_dir = tmp_path / 'src'
+    src_dir.mkdir()
+    srcs = [str(src_dir / 'a.py'), str(src_dir / 'b.py')]
+    for src in srcs:
+        open(src, 'w').write('x = 1\n')
+    if server._inotify_watch([str(src_dir)])[0] is None:
+        pytest.skip('no inotify here')
+    monkeypatch.setattr(server, 'COMPILE_TARGETS', [(src, src + '.mpy', src) for src in srcs])
+    compiled = queue.Queue()
+
+    def compile_one(target):
+        if target[0] == 'stop':
+            raise Stop
+        compiled.put((target[0], time.monotonic()))
+    monkeypatch.setattr(server, '_compile_one', compile_one)
+    monkeypatch.setattr(server, '_compile_all', lambda: None)
+
+    def run():
+        try:
+            server.compile_firmware_loop()
+        except Stop:
+            pass
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    time.sleep(0.1)                                    # watches in place
+    yield srcs, compiled
+    monkeypatch.setattr(server, '_compile_all', lambda: compile_one(('stop',)))
+    monkeypatch.setattr(server, 'COMPILE_RESCAN_S', 0)
+    open(srcs[0], 'a').close()                         # wake it so it sees the rescan
+    thread.join(2)
+
+
+def test_burst_of_saves_compiles_once_after_quiet(server, watcher):
+    (a, b), compiled = watcher
+    for i in range(5):
+        open(a, 'w').write(f'x = {i}\n')
+        last = time.monotonic()
+        time.sleep(server.COMPILE_DEBOUNCE_S / 3)
+    src, at = compiled.get(timeout=2)
+    assert src == a and at - last >= server.COMPILE_DEBOUNCE_S * 0.9
+    with pytest.raises(queue.Empty):
+        compiled.get(timeout=server.COMPILE_DEBOUNCE_S * 2)
+
+
+def test_rename_over_and_unrelated_files(server, watcher):
+    (a, b), compiled = watcher
+    open(os.path.join(os.path.dirname(a), 'notes.txt'), 'w').write('hi')
+    open(b + '.tmp', 'w').write('y = 2\n')
+    os.replace(b + '.tmp', b)                          # how most editors save
+    assert compiled.get(timeout=2)[0] == b
+    with pytest.raises(queue.Empty):
+        compiled.get(timeout=server.COMPILE_DEBOUNCE_S * 2)
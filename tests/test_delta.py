@@ -0,0 +1,101 @@
+import hashlib
+import random
+import struct
+
+import x_mas_server as xs
+
+CANARY = '34:98:7A:07:12:B8'
+OTHER = '34:98:7A:07:13:B4'      # a wave 1+ holding, so held after a release
+
+
+def apply_delta(old, delta):
+    """The boot scripts' patcher, checked the same way before install."""
+    magic, size, digest = xs.DELTA_HEADER.unpack_from(delta)
+    assert magic == b'XD1'
+    pos = xs.DELTA_HEADER.size
+    out = bytearray()
+    while True:
+        op = delta[pos]
+        pos += 1
+        if op == 0:
+            break
+        if op == 1:
+            off, n = struct.unpack_from('<II', delta, pos)
+            pos += 8
+            assert off + n <= len(old)
+            out += old[off:off + n]
+        elif op == 2:
+            (n,) = struct.unpack_from('<H', delta, pos)
+            pos += 2
+            out += delta[pos:pos + n]
+            pos += n
+        else:
+            raise AssertionError(f'bad op {op}')
+    assert pos == len(delta)
+    assert len(out) == size and hashlib.sha256(out).digest() == digest
+    return bytes(out)
+
+
+def edited(rng, old):
+    """old with a few inserts, deletes, overwrites and moved blocks."""
+    new = bytearray(old)
+    for _ in range(rng.randrange(0, 8)):
+        at = rng.randrange(0, len(new) + 1)
+        kind = rng.randrange(4)
+        if kind == 0:
+            new[at:at] = rng.randbytes(rng.randrange(1, 200))
+        elif kind == 1:
+            del new[at:at + rng.randrange(1, 200)]
+        elif kind == 2:
+            n = rng.randrange(1, 50)
+            new[at:at + n] = rng.randbytes(n)
+        elif new:
+            s = rng.randrange(len(new))
+            new[at:at] = new[s:s + rng.randrange(1, 300)]
+    return bytes(new)
+
+
+def test_make_delta_round_trip():
+    rng = random.Random(46)
+    for i in range(200):
+        if i % 20 == 0:
+            old, new = rng.randbytes(rng.randrange(0, 500)), rng.randbytes(rng.randrange(0, 500))
+        elif i % 20 == 1:
+            old = b'\x00' * rng.randrange(0, 3000)      # long runs: overlapping matches
+            new = edited(rng, old)
+        else:
+            old = rng.randbytes(rng.randrange(0, 6000))
+            new = edited(rng, old)
+        assert apply_delta(old, xs.make_delta(old, new)) == new
+
+
+def test_make_delta_small_edit_is_small():
+    rng = random.Random(1)
+    old = rng.randbytes(20000)
+    new = old[:5000] + b'VERSION 2' + old[5000:]
+    assert len(xs.make_delta(old, new)) < 100
+
+
+def test_delta_paths(server, client, deploy):
+    rng = random.Random(50)
+    old = rng.randbytes(8000)
+    new = old[:3000] + b'fix' + old[3000:]
+    v1 = deploy('secondary.mpy', old)
+    v2 = deploy('secondary.mpy', new)
+
+    r = client.get(f'/delta/secondary.mpy?from={v2}&mac={OTHER}')
+    assert r.status_code == 304 and 'Retry-After' not in r.headers
+
+    r = client.get(f'/delta/secondary.mpy?from={v1}&mac={CANARY}')
+    assert r.status_code == 200
+    assert len(r.data) < len(new) // 10
+    assert apply_delta(old, r.data) == new
+    # sent is not installed: only the device's next report moves its build
+    assert server.device_builds[(CANARY, 'secondary.mpy')] == v1
+
+    assert client.get(f'/delta/secondary.mpy?from={"0" * 64}&mac={CANARY}').status_code == 404
+    assert client.get('/delta/boot.mpy?from=x').status_code == 404
+
+    v3 = deploy('secondary.mpy', rng.randbytes(8000))  # unrelated: full download is cheaper
+    assert client.get(f'/delta/secondary.mpy?from={v2}&mac={CANARY}').status_code == 404
+    assert client.get(f'/delta/secondary.mpy?from={v3}').status_code == 304
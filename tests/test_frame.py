@@ -0,0 +1,39 @@
+SYD = '34:98:7A:07:13:B4'
+
+
+def frame(client, screen='main', mac=SYD, **headers):
+    return client.get(f'/frame?mac={mac}&screen={screen}', headers=headers)
+
+
+def test_frame_screens(client):
+    main, big = frame(client), frame(client, 'big')
+    assert main.status_code == big.status_code == 200
+    assert len(main.data) == len(big.data) == 160 * 80 * 2
+    assert main.headers['ETag'] != big.headers['ETag']
+    assert frame(client, 'side').status_code == 400
+
+
+def test_frame_bytes_only_change_with_what_they_show(server, client, set_prices):
+    set_prices(xrp='2.5')
+    first = frame(client).data
+    set_prices()                                       # refresh, same prices
+    assert frame(client).data == first
+    assert server.frame_cache[(SYD, 'main')][0] == server.price_version   # re-rendered
+    set_prices(xrp='2.6')
+    assert frame(client).data != first
+
+
+def test_unknown_mac_is_rendered_but_not_cached(server, client):
+    assert frame(client, mac='00:00:00:00:00:00').status_code == 200
+    assert server.frame_cache == {}
+
+
+def test_unchanged_frame_revalidates_to_304(client, set_prices):
+    set_prices(xrp='2.5')
+    etag = frame(client).headers['ETag']
+    r = frame(client, **{'If-None-Match': etag})
+    assert r.status_code == 304 and not r.data
+    set_prices()                                       # refresh, same prices
+    assert frame(client, **{'If-None-Match': etag}).status_code == 304
+    set_prices(xrp='2.6')
+    assert frame(client, **{'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,43 @@
+import shutil
+
+import pytest
+
+import gen_tables
+
+
+def test_generated_blocks_are_current():
+    assert [name for name in gen_tables.TARGETS if gen_tables.update(name, check=True)] == []
+
+
+@pytest.mark.parametrize('name', sorted(gen_tables.TARGETS))
+def test_block_decodes_back_to_the_tables(name):
+    spec = gen_tables.TARGETS[name]
+    ns = {}
+    exec(gen_tables.emit(spec), ns)
+    chars, font = ns['FONT_CHARS'], ns['FONT']
+    assert chars == spec['font'] and len(font) == 5 * len(chars)
+    for ch in chars:
+        g = chars.find(ch) * 5
+        assert tuple(font[g:g + 5]) == gen_tables.GLYPHS[ch]
+    assert chars.find('~') * 5 == -5
+    assert ('DIGITS' in ns, 'ABBR' in ns) == (bool(spec.get('digits')), bool(spec.get('abbr')))
+    if spec.get('digits'):
+        for d, rows in enumerate(gen_tables.RANK_DIGITS):
+            assert tuple(ns['DIGITS'][d * 16:d * 16 + 16]) == rows
+    if spec.get('abbr'):
+        abbr = ns['ABBR']
+        for mac, name3 in gen_tables.RANK_ABBR.items():
+            i = abbr.find(mac)
+            assert i % 20 == 0 and abbr[i + 17:i + 20] == name3
+
+
+def test_update_rewrites_only_a_stale_block(tmp_path, monkeypatch):
+    shutil.copy(f'{gen_tables.REPO_DIR}/tertiary.py', tmp_path / 'tertiary.py')
+    monkeypatch.setattr(gen_tables, 'REPO_DIR', str(tmp_path))
+    before = (tmp_path / 'tertiary.py').read_text()
+    (tmp_path / 'tertiary.py').write_text(before.replace("FONT_CHARS = '", "FONT_CHARS = 'x"))
+    assert gen_tables.update('tertiary.py', check=True)
+    assert (tmp_path / 'tertiary.py').read_text() != before          # check leaves it alone
+    assert gen_tables.update('tertiary.py')
+    assert (tmp_path / 'tertiary.py').read_text() == before
+    assert not gen_tables.update('tertiary.py', check=True)
@@ -0,0 +1,20 @@
+def test_mpy_etag_and_304(client, deploy):
+    sha = deploy('secondary.mpy', b'build one' * 100)
+    r = client.get('/secondary.mpy')
+    assert r.status_code == 200 and r.data == b'build one' * 100
+    assert r.headers['ETag'] == f'"{sha}"'
+    assert 'no-cache' in r.headers['Cache-Control']        # stored, but always revalidated
+    r = client.get('/secondary.mpy', headers={'If-None-Match': f'"{sha}"'})
+    assert r.status_code == 304 and not r.data
+
+
+def test_new_build_is_downloaded(client, deploy, server):
+    old = deploy('tertiary.mpy', b'build one' * 100)
+    server.releases.clear()                                # fully rolled out
+    new = deploy('tertiary.mpy', b'build two' * 100)
+    r = client.get('/tertiary.mpy', headers={'If-None-Match': f'"{old}"'})
+    assert r.status_code == 200 and r.headers['ETag'] == f'"{new}"'
+
+
+def test_missing_build_is_404(client):
+    assert client.get('/secondary.mpy').status_code == 404
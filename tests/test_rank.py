@@ -0,0 +1,28 @@
+import json
+
+
+def test_ranks_share_ties_and_skip(server, set_prices):
+    set_prices(sol='0', doge='0', pepe='0', ltc='5', tsla='5')   # the rest tie at 0
+    ranks = server.compute_ranks()
+    assert sorted(ranks.values()) == [1, 2, 3, 3, 3, 3, 3]
+    assert ranks['34:98:7A:07:11:24'] == 1               # ltc 0.0676 x 5 beats tsla 0.0122 x 5
+
+
+def test_rank_body_and_304(server, client, set_prices):
+    set_prices(btc='97000', xrp='2.5')
+    r = client.get('/rank')
+    assert r.status_code == 200 and json.loads(r.data) == server.compute_ranks()
+    assert client.get('/rank', headers={'If-None-Match': r.headers['ETag']}).status_code == 304
+    set_prices(xrp='1')                                # drops below btc
+    assert client.get('/rank', headers={'If-None-Match': r.headers['ETag']}).status_code == 200
+
+
+def test_price_route_serves_the_snapshot(server, client, set_prices):
+    set_prices(doge='0.2')
+    r = client.get('/DOGE')
+    assert r.data == b'0.2'
+    server.cached_prices['doge'] = '0.3'               # not yet swapped in
+    assert client.get('/doge').data == b'0.2'
+    set_prices()
+    assert client.get('/doge', headers={'If-None-Match': r.headers['ETag']}).data == b'0.3'
+    assert client.get('/nope').data == b'error'
@@ -0,0 +1,55 @@
+CANARY = '34:98:7A:07:12:B8'
+OTHER = '34:98:7A:07:13:B4'      # a wave 1+ holding, so held after a release
+
+
+def test_rollout_holds_all_but_canaries(server, client, deploy):
+    v1 = deploy('secondary.mpy', b'build one' * 100)
+    server.releases.clear()                                # v1 fully rolled out
+    deploy('secondary.mpy', b'build two' * 100)
+    have = {'If-None-Match': f'"{v1}"'}
+
+    r = client.get(f'/secondary.mpy?mac={OTHER}', headers=have)
+    assert r.status_code == 304 and r.headers['ETag'] == f'"{v1}"'
+    assert int(r.headers['Retry-After']) > 0
+    assert client.get(f'/secondary.mpy?mac={CANARY}', headers=have).status_code == 200
+    assert client.get('/secondary.mpy', headers=have).status_code == 200   # no mac: old boot
+    assert client.get(f'/secondary.mpy?mac={OTHER}').status_code == 200   # nothing to keep
+
+    r = client.get(f'/delta/secondary.mpy?from={v1}&mac={OTHER}')
+    assert r.status_code == 304 and 'Retry-After' in r.headers
+    assert server.device_builds[(OTHER, 'secondary.mpy')] == v1
+
+    server.releases['secondary.mpy']['started'] -= server.ROLLOUT_WAVES * server.ROLLOUT_WAVE_S
+    assert client.get(f'/secondary.mpy?mac={OTHER}', headers=have).status_code == 200
+
+
+def test_manifest(client, deploy):
+    sha = deploy('secondary.mpy', b'build one' * 100)
+    client.get(f'/delta/secondary.mpy?from=abc&mac={OTHER}')
+    m = client.get(f'/manifest?mac={OTHER.lower()}').get_json()
+    assert 'tertiary.mpy' not in m                     # not built
+    entry = m['secondary.mpy']
+    assert entry['sha'] == sha and entry['size'] == 900
+    assert entry['wave'] >= 1 and entry['have'] == 'abc' and entry['hold_s'] > 0
+    assert client.get(f'/manifest?mac={CANARY}').get_json()['secondary.mpy']['hold_s'] == 0
+    assert 'wave' not in client.get('/manifest').get_json()['secondary.mpy']
+
+
+def wait(server, client, mac):
+    return client.get(f'/wait?mac={mac}&app=rect&since={server.bus_seq}&t=1').data.decode().split()[1]
+
+
+def test_wait_sends_fw_only_in_slot(server, client, deploy):
+    v1 = deploy('secondary.mpy', b'build one' * 100)
+    server.releases.clear()
+    for mac in (CANARY, OTHER):
+        client.get(f'/secondary.mpy?mac={mac}', headers={'If-None-Match': f'"{v1}"'})
+        assert wait(server, client, mac) == 'timeout'          # up to date
+    deploy('secondary.mpy', b'build two' * 100)
+
+    assert wait(server, client, CANARY) == 'fw:secondary.mpy'
+    assert wait(server, client, CANARY) == 'timeout'           # not again before ROLLOUT_RENOTIFY_S
+    assert wait(server, client, OTHER) == 'timeout'
+    server.releases['secondary.mpy']['started'] -= server.ROLLOUT_WAVES * server.ROLLOUT_WAVE_S
+    assert wait(server, client, OTHER) == 'fw:secondary.mpy'
+    assert wait(server, client, '34:98:7A:07:14:D0') == 'timeout'   # build never reported
@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+
+
+def record(server, coin, price, t):
+    server.cached_prices[coin] = str(price)
+    server.price_updated[coin] = t
+    server.record_prices(t)
+
+
+def test_ring_wraps_and_persists(server):
+    t0 = time.time() - 3600
+    for n in range(server.HISTORY_SLOTS + 5):
+        record(server, 'btc', 100 + n, t0 + n)
+    i = server.HISTORY_COINS.index('btc')
+    assert server.history_next[i] == 5
+    assert server.price_history[i]['p'].max() == 100 + server.HISTORY_SLOTS + 4
+    assert not server.price_history[server.HISTORY_COINS.index('sol')]['t'].any()
+    assert np.array_equal(server._load_history(), server.price_history)
+
+
+def test_spark_shape_and_etag(server, client):
+    now = time.time()
+    for n in range(48):                                # rising over the last day
+        record(server, 'sol', 100 + n, now - server.SPARK_WINDOW_S + 1800 * n + 60)
+    r = client.get('/spark/sol')
+    assert r.status_code == 200 and len(r.data) == 160 * 2
+    assert r.headers['X-Spark-Range'] == '100,147'
+    cols = np.frombuffer(r.data, np.uint8).reshape(-1, 2)
+    drawn = cols[cols[:, 0] != 255]
+    assert drawn[0, 1] == 15 and drawn[-1, 0] == 0     # bottom-left to top-right
+    assert client.get('/spark/sol', headers={'If-None-Match': r.headers['ETag']}).status_code == 304
+    assert len(client.get('/spark/sol?w=1000&h=1').data) == 240 * 2
+    assert client.get('/spark/nope').status_code == 404
+
+
+def test_spark_cache_is_bounded(server, client):
+    for w in range(1, 120):
+        client.get(f'/spark/btc?w={w}')
+    assert len(server.spark_cache) <= server.SPARK_CACHE_MAX
+    record(server, 'btc', 1, time.time())
+    assert server.spark_cache == {}                    # a new sample invalidates every shape
@@ -0,0 +1,39 @@
+import re
+
+DAD = '34:98:7A:07:06:B4'     # btc, never shown MOM as a rival
+MOM = '34:98:7A:07:11:24'     # ltc
+SYD = '34:98:7A:07:13:B4'     # xrp
+
+
+def state(client, mac):
+    r = client.get(f'/state?mac={mac}')
+    assert r.status_code == 200 and r.mimetype == 'text/plain'
+    lines = r.data.decode().split('\n')
+    assert len(lines) == 5
+    return lines
+
+
+def test_state_lines(server, client, set_prices):
+    set_prices(btc='97000.6', xrp='2.5', ltc='80', sol='150', doge='0.2', pepe='0.00001', tsla='400')
+    price, value, clock, rank, rival = state(client, SYD)
+    assert price == '$2.5'
+    assert value == '%.2f' % (2.5 * server.HOLDINGS[SYD]['amount'])
+    assert re.fullmatch(r'\d\d:\d\d', clock)
+    assert rank == str(server.snapshot['ranks'][SYD])
+    assert re.fullmatch(r'[A-Z?]{3} LT \d+', rival) and not rival.startswith('SYD')
+    assert state(client, DAD)[0] == '$97001'   # btc rounds to whole dollars
+
+
+def test_state_unknown_mac_and_prices(client, set_prices):
+    price, value, _, rank, _ = state(client, SYD)
+    assert (price, value) == ('', '')            # no upstream value yet
+    set_prices(btc='97000')
+    price, value, _, rank, _ = state(client, '00:00:00:00:00:00')
+    assert price == '$97000' and value and rank == '99'
+
+
+def test_state_skips_household_rival(client, set_prices):
+    set_prices(btc='97000', ltc='80', xrp='2.5', sol='150', doge='0.2', pepe='0.00001', tsla='400')
+    for _ in range(50):
+        assert not state(client, DAD)[4].startswith('MOM')
+        assert not state(client, MOM)[4].startswith('DAD')
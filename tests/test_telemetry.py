@@ -0,0 +1,41 @@
+MAC = '34:98:7A:07:13:B4'
+
+
+def beacon(**fields):
+    return dict({'mac': MAC, 'lat': [3, 1, 0, 0, 0, 1], 'ret': 1, 'mem': 40000,
+                 'paint': 120, 'spi': 25600, 'rc': 4, 'why': 'cycle 30'}, **fields)
+
+
+def test_summary(client):
+    for mem, paint in ((40000, 120), (38000, 300), (41000, 90)):
+        assert client.post('/telemetry', json=beacon(mem=mem, paint=paint)).status_code == 204
+    s = client.get('/telemetry').get_json()[MAC]
+    assert s['beacons'] == 3 and s['retries'] == 3
+    assert s['lat_hist'] == [9, 3, 0, 0, 0, 3]
+    assert s['mem_free_min'] == 38000
+    assert s['paint_ms_p50'] == 120 and s['paint_ms_max'] == 300
+    assert s['reset_why'] == 'cycle 30' and s['spi_bytes_last'] == 25600
+    raw = client.get(f'/telemetry?mac={MAC.lower()}').get_json()
+    assert len(raw['entries']) == 3 and 'mac' not in raw['entries'][0]
+
+
+def test_bad_beacons_are_refused(client):
+    for bad in (beacon(lat=5), beacon(lat=[1, 'x']), beacon(mem='40000'), beacon(paint=1.5),
+                beacon(spi=None), beacon(ret=True), beacon(mac='nope'), [1, 2]):
+        assert client.post('/telemetry', json=bad).status_code == 400
+    assert client.post('/telemetry', data='{' + ' ' * 2000 + '}').status_code == 413
+    assert client.get('/telemetry').get_json() == {}
+
+
+def test_summary_skips_malformed_entries(server, client):
+    client.post('/telemetry', json=beacon())
+    server.device_telemetry[MAC].append({'t': 0, 'lat': 5, 'mem': 'x'})
+    server.device_telemetry['34:98:7A:07:14:D0'] = [{'t': 0, 'lat': 5}]
+    fleet = client.get('/telemetry').get_json()
+    assert list(fleet) == [MAC] and fleet[MAC]['beacons'] == 1
+
+
+def test_ring_is_bounded(server, client):
+    for _ in range(server.TELEMETRY_RING + 10):
+        client.post('/telemetry', json=beacon())
+    assert client.get('/telemetry').get_json()[MAC]['beacons'] == server.TELEMETRY_RING
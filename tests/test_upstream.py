@@ -0,0 +1,118 @@
+import time
+
+import pytest
+import requests
+
+from x_mas_server import COINGECKO_IDS
+
+
+class Resp:
+    def __init__(self, status, body=None, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+        self._body = body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code}', response=self)
+
+    def json(self):
+        return self._body
+
+
+class Source:
+    """Stand-in session: answers from a list (last one repeats), optionally late."""
+    def __init__(self, *answers, delay=0.0):
+        self.answers = list(answers)
+        self.delay = delay
+        self.calls = []
+
+    def get(self, url, timeout=None, **kw):
+        self.calls.append(time.monotonic())
+        time.sleep(self.delay)
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def coingecko(tsla=True):
+    body = {cid: {'usd': 2.0} for cid, _ in COINGECKO_IDS.values()}
+    if not tsla:
+        del body['tesla-xstock']
+    return Resp(200, body)
+
+
+YAHOO = Resp(200, {'chart': {'result': [{'meta': {'regularMarketPrice': 412.5}}]}})
+
+
+@pytest.fixture
+def upstream(server, monkeypatch):
+    monkeypatch.setattr(server, 'breakers', {src: {'fails': 0, 'open_until': 0.0, 'last_ms': None,
+                                                   'last_error': ''} for src in ('coingecko', 'yahoo')})
+
+    def use(cg, yahoo=YAHOO):
+        cg = cg if isinstance(cg, Source) else Source(cg)
+        yahoo = yahoo if isinstance(yahoo, Source) else Source(yahoo)
+        monkeypatch.setattr(server, 'upstream_sessions', {'coingecko': cg, 'yahoo': yahoo})
+        return cg, yahoo
+    return use
+
+
+def test_yahoo_only_without_coingecko_tsla(server, upstream):
+    cg, yf = upstream(coingecko())
+    server.refresh_prices()
+    assert server.cached_prices['btc'] == '2.00000000' and server.cached_prices['tsla'] == '2.00'
+    assert not yf.calls
+    upstream(coingecko(tsla=False))
+    server.refresh_prices()
+    assert server.cached_prices['tsla'] == '412.50'
+
+
+def test_slow_coingecko_starts_yahoo_alongside(server, upstream, monkeypatch):
+    monkeypatch.setattr(server, 'YAHOO_HEDGE_S', 0.05)
+    cg, yf = upstream(Source(coingecko(tsla=False), delay=0.5))
+    t0 = time.monotonic()
+    server.refresh_prices()
+    assert yf.calls[0] - t0 < 0.3                      # did not wait for CoinGecko
+    assert time.monotonic() - t0 < 0.9                 # the two ran together
+    assert server.cached_prices['tsla'] == '412.50'
+
+
+def test_coingecko_past_deadline_counts_on_its_breaker(server, upstream, monkeypatch):
+    monkeypatch.setattr(server, 'UPSTREAM_DEADLINE_S', 0.1)
+    monkeypatch.setattr(server, 'YAHOO_HEDGE_S', 0.05)
+    upstream(Source(coingecko(), delay=0.5))
+    server.refresh_prices()
+    assert server.breakers['coingecko']['fails'] == 1
+    assert server.cached_prices['btc'] == 'error' and server.cached_prices['tsla'] == '412.50'
+
+
+def test_breaker_opens_backs_off_and_recovers(server, upstream, client):
+    cg, _ = upstream(Source(Resp(500), Resp(500), Resp(500), coingecko()))
+    br = server.breakers['coingecko']
+    assert server.upstream_get('coingecko', 'u') is None and not server.breaker_open('coingecko')
+    assert server.upstream_get('coingecko', 'u') is None and server.breaker_open('coingecko')
+    assert br['open_until'] - time.time() == pytest.approx(server.BREAKER_BACKOFF_S, abs=2)
+    assert server.upstream_get('coingecko', 'u') is None and len(cg.calls) == 2   # skipped
+    assert client.get('/upstream').get_json()['sources']['coingecko']['open_for'] > 0
+
+    br['open_until'] = 0.0
+    assert server.upstream_get('coingecko', 'u') is None                          # third failure
+    assert br['open_until'] - time.time() == pytest.approx(2 * server.BREAKER_BACKOFF_S, abs=2)
+    br['open_until'] = 0.0
+    assert server.upstream_get('coingecko', 'u') is not None
+    assert br['fails'] == 0 and not server.breaker_open('coingecko')
+
+
+def test_rate_limit_opens_at_once_for_retry_after(server, upstream):
+    upstream(Resp(429, headers={'Retry-After': '900'}))
+    assert server.upstream_get('coingecko', 'u') is None
+    assert server.breakers['coingecko']['open_until'] - time.time() == pytest.approx(900, abs=2)
+
+
+def test_open_coingecko_breaker_goes_straight_to_yahoo(server, upstream):
+    cg, yf = upstream(coingecko())
+    server.breakers['coingecko']['open_until'] = time.time() + 60
+    server.refresh_prices()
+    assert not cg.calls and yf.calls and server.cached_prices['tsla'] == '412.50'
@@ -0,0 +1,51 @@
+import threading
+import time
+
+SYD = '34:98:7A:07:13:B4'          # rect, xrp
+CIRCLE = '34:98:7A:07:11:7C'       # screen2
+
+
+def wait(client, mac, since, app='rect', t=1):
+    query = f'/wait?mac={mac}&since={since}&t={t}' + (f'&app={app}' if app else '')
+    cursor, reason = client.get(query).data.decode().split()
+    return int(cursor), reason
+
+
+def later(server, *topics, after=0.2):
+    threading.Timer(after, server.publish, topics).start()
+
+
+def test_hello_reset_and_timeout(server, client):
+    cursor, reason = wait(client, SYD, -1)
+    assert (cursor, reason) == (server.bus_seq, 'hello')
+    assert wait(client, SYD, cursor + 5)[1] == 'reset'        # server restarted under it
+    t0 = time.monotonic()
+    assert wait(client, SYD, cursor) == (cursor, 'timeout')
+    assert 0.9 < time.monotonic() - t0 < 2
+
+
+def test_own_topics_wake_others_do_not(server, client):
+    cursor = server.bus_seq
+    later(server, 'price:btc')
+    assert wait(client, SYD, cursor)[1] == 'timeout'
+    cursor = server.bus_seq
+    later(server, 'price:xrp')
+    t0 = time.monotonic()
+    new, reason = wait(client, SYD, cursor, t=5)
+    assert reason == 'price:xrp' and new == cursor + 1 and time.monotonic() - t0 < 1
+    server.publish('rank')
+    assert wait(client, SYD, new)[1] == 'rank'                # missed while away: no wait
+
+
+def test_circle_topics(server, client):
+    cursor = server.bus_seq
+    server.publish('price:xrp', 'photos:screen2')
+    assert wait(client, CIRCLE, cursor, app='circle')[1] == 'photos:screen2'
+    assert wait(client, CIRCLE, cursor - 1, app=None)[1] == 'photos:screen2'   # known circle MAC
+
+
+def test_wait_cap(server, client, monkeypatch):
+    monkeypatch.setattr(server, 'WAIT_TIMEOUT_S', 1)
+    t0 = time.monotonic()
+    assert wait(client, SYD, server.bus_seq, t=600)[1] == 'timeout'
+    assert time.monotonic() - t0 < 2
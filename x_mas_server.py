@@ -12,20 +12,35 @@ import requests
 from PIL import Image
 import numpy as np
 import io
+import ctypes
+import ctypes.util
+import select
 import struct
+import json
 from zoneinfo import ZoneInfo
 import datetime
 import random
+import collections
+import concurrent.futures
+import zlib
+import firmware_footprint
+from gen_tables import GLYPHS, RANK_DIGITS, RANK_ABBR, SCREEN_NAMES, TARGETS
 
 app = Flask(__name__)
 
 # === CONFIGURATION ===
 REPO_DIR = '/home/preston/Desktop/x_mas_gift'
-# How often to *check* whether a source changed. The check is a stat() per file
-# (a few microseconds); mpy-cross only actually runs when the content changed,
-# so this can be short without costing anything.
+# Sources are watched with inotify and compiled once an editor's write burst has
+# been quiet for COMPILE_DEBOUNCE_S. Without inotify the loop falls back to a
+# stat() of every target each COMPILE_CHECK_INTERVAL; with it, a full rescan
+# every COMPILE_RESCAN_S only guards against missed events.
 COMPILE_CHECK_INTERVAL = 30
+COMPILE_DEBOUNCE_S = 0.3
+COMPILE_RESCAN_S = 600
 MPY_CROSS_PATH = '/home/preston/micropython/mpy-cross/build/mpy-cross'
+# Upstream price APIs; point both at fake_upstream.py to benchmark offline
+COINGECKO_BASE = os.environ.get('XMAS_COINGECKO_BASE', 'https://api.coingecko.com')
+YAHOO_BASE = os.environ.get('XMAS_YAHOO_BASE', 'https://query1.finance.yahoo.com')
 
 # File paths for crypto screens
 SECONDARY_PY = os.path.join(REPO_DIR, 'secondary.py')
@@ -87,6 +102,12 @@ def get_image_files(directory):
     _listing_cache[directory] = (mtime, files)
     return files
 
+def pack_rgb565(img):
+    """RGB PIL image → big-endian RGB565 bytes (the byte order both panels take)."""
+    a = np.asarray(img, dtype=np.uint16)
+    packed = ((a[:, :, 0] & 0xF8) << 8) | ((a[:, :, 1] & 0xFC) << 3) | (a[:, :, 2] >> 3)
+    return packed.astype('>u2').tobytes()
+
 def image_to_rgb565_bytes(image_path):
     try:
         with Image.open(image_path) as img:
@@ -97,9 +118,7 @@ def image_to_rgb565_bytes(image_path):
             offset = ((TARGET_SIZE - img.size[0]) // 2, (TARGET_SIZE - img.size[1]) // 2)
             background.paste(img, offset)
             # Vectorized RGB565 — byte-identical to the old per-pixel loop, ~22x cheaper
-            a = np.asarray(background, dtype=np.uint16)
-            packed = ((a[:, :, 0] & 0xF8) << 8) | ((a[:, :, 1] & 0xFC) << 3) | (a[:, :, 2] >> 3)
-            return packed.astype('>u2').tobytes()
+            return pack_rgb565(background)
     except Exception as e:
         print(f"Failed to process {image_path}: {e}")
         return None
@@ -108,7 +127,9 @@ def image_to_rgb565_bytes(image_path):
 cached_prices = {'btc': "error", 'sol': "error", 'doge': "error", 'pepe': "error",
                  'xrp': "error", 'ltc': "error", 'tsla': "error"}
 cached_logos = {}
-cached_big_logos = {}
+logo_assets = {}             # (coin, kind) → (png mtime, big-endian RGB565 bytes, etag)
+LOGO_MAX_AGE = 3600          # logos only change when a PNG under logos/ is replaced
+price_version = 0            # bumped by fetch_data after every price refresh
 
 HOLDINGS = {
     '34:98:7A:07:13:B4': {'coin': 'xrp', 'amount': 2.76412},
@@ -120,114 +141,310 @@ HOLDINGS = {
     '34:98:7A:07:06:B4': {'coin': 'btc', 'amount': 0.0000566},
 }
 
-def rgb565(r, g, b):
-    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+def _render_logo(img, kind):
+    if kind == 'small':
+        return pack_rgb565(img.resize((20, 20), Image.LANCZOS))
+    # big: aspect kept, centred on a black 160x80 frame
+    ratio = min(160 / img.width, 80 / img.height)
+    new_w = max(1, int(img.width * ratio))
+    new_h = max(1, int(img.height * ratio))
+    frame = Image.new('RGB', (160, 80), (0, 0, 0))
+    frame.paste(img.resize((new_w, new_h), Image.LANCZOS), ((160 - new_w) // 2, (80 - new_h) // 2))
+    return pack_rgb565(frame)
+
+def logo_asset(coin, kind):
+    """(bytes, etag) for logos/<coin>.png as a 'small' 20x20 or 'big' 160x80 RGB565 blob.
+
+    Converted once and persisted as logos/<coin>.<kind>.rgb565; both are rebuilt
+    only when the PNG's mtime moves past them.
+    """
+    png = os.path.join(LOGO_DIR, f"{coin}.png")
+    try:
+        mtime = os.path.getmtime(png)
+    except OSError:
+        return None
+    entry = logo_assets.get((coin, kind))
+    if entry is not None and entry[0] == mtime:
+        return entry[1:]
+    path = os.path.join(LOGO_DIR, f"{coin}.{kind}.rgb565")
+    size = 20 * 20 * 2 if kind == 'small' else 160 * 80 * 2
+    data = None
+    try:
+        if os.path.getmtime(path) >= mtime:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) != size:
+                data = None
+    except OSError:
+        pass
+    if data is None:
+        try:
+            with Image.open(png) as img:
+                data = _render_logo(img.convert('RGB'), kind)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f'{kind} logo failed for {coin}: {e}')
+            return None
+    entry = logo_assets[(coin, kind)] = (mtime, data, hashlib.sha1(data).hexdigest()[:16])
+    return entry[1:]
 
 def load_or_download_logo(coin, url):
     """Prefer on-disk PNG under logos/; only hit network if missing."""
     local_path = os.path.join(LOGO_DIR, f"{coin}.png")
     try:
-        if os.path.exists(local_path):
-            img = Image.open(local_path).convert('RGB')
-        else:
-            r = requests.get(url, timeout=15, headers={'User-Agent': 'x-mas-gift/1.0'})
+        if not os.path.exists(local_path):
+            r = requests.get(url, timeout=15, headers={'User-Agent': 'Mozilla/5.0'})
             r.raise_for_status()
-            img = Image.open(io.BytesIO(r.content)).convert('RGB')
-            img.save(local_path)
-        img = img.resize((20, 20), Image.LANCZOS)
-        pixels = []
-        for y in range(20):
-            for x in range(20):
-                r, g, b = img.getpixel((x, y))
-                pixels.append(f"0x{rgb565(r,g,b):04X}")
-        return ','.join(pixels)
+            Image.open(io.BytesIO(r.content)).convert('RGB').save(local_path)
+        entry = logo_asset(coin, 'small')
+        if entry is None:
+            return "error"
+        return ','.join(f"0x{v:04X}" for v in np.frombuffer(entry[0], dtype='>u2'))
     except Exception as e:
         print(f'logo load failed for {coin}: {e}')
         return "error"
 
-def generate_big_logo(coin):
-    if coin in cached_big_logos:
-        return cached_big_logos[coin]
-    local_path = os.path.join(LOGO_DIR, f"{coin}.png")
-    if not os.path.exists(local_path):
+def small_logo_bytes(coin):
+    """Binary twin of the /logo/<coin> text: the same 400 pixels as 800 bytes."""
+    return logo_asset(coin, 'small')
+
+def big_logo_bytes(coin):
+    """Whole big-logo frame, packed once and served as-is to every screen."""
+    return logo_asset(coin, 'big')
+
+# === UPSTREAM CLIENT ===
+# One pooled keep-alive session per source, fetched on a small pool: Yahoo is the
+# TSLA fallback and starts alongside CoinGecko as soon as CoinGecko is slow or its
+# breaker is open. A breaker per source leaves a rate-limited API alone
+# (Retry-After honoured) instead of hammering it every cycle. cached_prices is
+# stale-while-revalidate: routes always answer from it and never wait on an upstream.
+PRICE_REFRESH_S = 180
+UPSTREAM_TIMEOUT = 10
+UPSTREAM_DEADLINE_S = 15      # whole call, however slowly the body arrives
+YAHOO_HEDGE_S = 2.0           # CoinGecko still running after this: start Yahoo too
+BREAKER_THRESHOLD = 2         # straight failures before a source is skipped
+BREAKER_BACKOFF_S = 180       # first skip; doubles per further failure
+BREAKER_BACKOFF_MAX = 1800
+COINGECKO_IDS = {              # coin → (CoinGecko id, display format)
+    'btc': ('bitcoin', '{:.8f}'), 'sol': ('solana', '{:.4f}'), 'doge': ('dogecoin', '{:.6f}'),
+    'pepe': ('pepe', '{:.10f}'), 'xrp': ('ripple', '{:.4f}'), 'ltc': ('litecoin', '{:.4f}'),
+    'tsla': ('tesla-xstock', '{:.2f}'),
+}
+
+def _upstream_session():
+    sess = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2)
+    sess.mount('https://', adapter)
+    sess.mount('http://', adapter)
+    sess.headers['User-Agent'] = 'Mozilla/5.0'
+    return sess
+
+upstream_sessions = {'coingecko': _upstream_session(), 'yahoo': _upstream_session()}
+breakers = {src: {'fails': 0, 'open_until': 0.0, 'last_ms': None, 'last_error': ''}
+            for src in upstream_sessions}
+upstream_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+price_updated = {}            # coin → time.time() of its last good upstream value
+last_refresh = 0.0            # when refresh_prices last ran, good or not
+refresh_wake = threading.Event()
+
+def breaker_open(source):
+    return time.time() < breakers[source]['open_until']
+
+def _breaker_fail(source, e):
+    br = breakers[source]
+    br['fails'] += 1
+    br['last_error'] = str(e)[:120]
+    resp = getattr(e, 'response', None)
+    limited = resp is not None and resp.status_code == 429
+    if limited or br['fails'] >= BREAKER_THRESHOLD:
+        backoff = min(BREAKER_BACKOFF_MAX,
+                      BREAKER_BACKOFF_S * 2 ** max(0, br['fails'] - BREAKER_THRESHOLD))
+        try:
+            backoff = max(backoff, float(resp.headers.get('Retry-After', 0)))
+        except (AttributeError, ValueError):
+            pass
+        br['open_until'] = time.time() + backoff
+        print(f'[{time.strftime("%H:%M:%S")}] {source} breaker open {backoff:.0f}s: {e}')
+    else:
+        print(f'[{time.strftime("%H:%M:%S")}] {source} fetch failed: {e}')
+
+def upstream_get(source, url, **kw):
+    """GET JSON through the source's session and breaker; None while open or on failure."""
+    br = breakers[source]
+    if breaker_open(source):
         return None
+    t0 = time.time()
     try:
-        img = Image.open(local_path).convert('RGB')
-        orig_w, orig_h = img.size
-        ratio = min(160 / orig_w, 80 / orig_h)
-        new_w = max(1, int(orig_w * ratio))
-        new_h = max(1, int(orig_h * ratio))
-        img = img.resize((new_w, new_h), Image.LANCZOS)
-        offset_x = (160 - new_w) // 2
-        offset_y = (80 - new_h) // 2
-        pixels = []
-        for y in range(80):
-            for x in range(160):
-                if x < offset_x or x >= offset_x + new_w or y < offset_y or y >= offset_y + new_h:
-                    pixels.append(0)
-                else:
-                    px_x = x - offset_x
-                    px_y = y - offset_y
-                    r, g, b = img.getpixel((px_x, px_y))
-                    pixels.append(rgb565(r, g, b))
-        cached_big_logos[coin] = pixels
-        return pixels
+        r = upstream_sessions[source].get(url, timeout=UPSTREAM_TIMEOUT, **kw)
+        r.raise_for_status()
+        data = r.json()
     except Exception as e:
-        print(f'biglogo failed for {coin}: {e}')
+        _breaker_fail(source, e)
         return None
+    br['fails'] = 0
+    br['open_until'] = 0.0
+    br['last_ms'] = round((time.time() - t0) * 1000)
+    return data
+
+def _coingecko_prices():
+    ids = ','.join(cid for cid, _ in COINGECKO_IDS.values())
+    return upstream_get('coingecko',
+                        f'{COINGECKO_BASE}/api/v3/simple/price?ids={ids}&vs_currencies=usd') or {}
 
 def _yahoo_tsla_price():
     """Fallback when CoinGecko tesla-xstock is missing/rate-limited."""
+    data = upstream_get('yahoo', f'{YAHOO_BASE}/v8/finance/chart/TSLA?interval=1d&range=1d')
     try:
-        r = requests.get(
-            'https://query1.finance.yahoo.com/v8/finance/chart/TSLA?interval=1d&range=1d',
-            timeout=10,
-            headers={'User-Agent': 'Mozilla/5.0'},
-        )
-        r.raise_for_status()
-        meta = r.json()['chart']['result'][0]['meta']
+        meta = data['chart']['result'][0]['meta']
         price = meta.get('regularMarketPrice') or meta.get('previousClose')
         if price is not None:
             return float(price)
-    except Exception as e:
-        print(f'yahoo TSLA fallback failed: {e}')
+    except (KeyError, IndexError, TypeError, ValueError):
+        pass
     return None
 
+def _upstream_result(source, future):
+    """The future's value, or None once it overruns UPSTREAM_DEADLINE_S, which
+    counts as a failure on the source's breaker."""
+    try:
+        return future.result(timeout=UPSTREAM_DEADLINE_S)
+    except concurrent.futures.TimeoutError:
+        _breaker_fail(source, TimeoutError(f'no answer in {UPSTREAM_DEADLINE_S}s'))
+        return None
+
+def refresh_prices():
+    """One CoinGecko round with Yahoo as the TSLA fallback, started alongside when
+    CoinGecko's breaker is open or it is still running after YAHOO_HEDGE_S, else
+    only if CoinGecko has no TSLA. A coin keeps its last good price when its
+    source fails."""
+    global last_refresh
+    cg = upstream_pool.submit(_coingecko_prices)
+    yf = upstream_pool.submit(_yahoo_tsla_price) if breaker_open('coingecko') else None
+    if yf is None and not concurrent.futures.wait([cg], timeout=YAHOO_HEDGE_S).done:
+        yf = upstream_pool.submit(_yahoo_tsla_price)
+    data = _upstream_result('coingecko', cg) or {}
+    now = time.time()
+    for coin, (cid, fmt) in COINGECKO_IDS.items():
+        try:
+            cached_prices[coin] = fmt.format(data[cid]['usd'])
+            price_updated[coin] = now
+        except (KeyError, TypeError, ValueError):
+            pass
+    if 'tesla-xstock' not in data:
+        if yf is None:
+            yf = upstream_pool.submit(_yahoo_tsla_price)
+        yp = _upstream_result('yahoo', yf)
+        if yp is not None:
+            cached_prices['tsla'] = f"{yp:.2f}"
+            price_updated['tsla'] = time.time()
+    last_refresh = time.time()
+
+def note_price_read(coin):
+    """Serve-stale hook for routes: a value two cycles old wakes the refresher
+    early (laptop slept through its timer), unless it ran recently and the
+    source is simply down, which the breakers already handle."""
+    now = time.time()
+    if (now - price_updated.get(coin, 0) > 2 * PRICE_REFRESH_S
+            and now - last_refresh > PRICE_REFRESH_S):
+        refresh_wake.set()
+
+# === PRICE HISTORY (sparklines) ===
+# One ring of (unix time, price) per coin in a single NumPy structured array,
+# persisted whole after every refresh (~40 KB). Ring order is recovered from the
+# timestamps, so no head pointers are stored.
+HISTORY_FILE = os.path.join(REPO_DIR, 'price_history.bin')
+HISTORY_COINS = list(COINGECKO_IDS)
+HISTORY_SLOTS = 512           # 24 h at one sample per PRICE_REFRESH_S, plus slack
+HISTORY_DTYPE = np.dtype([('t', '<u4'), ('p', '<f8')])
+SPARK_WINDOW_S = 24 * 3600
+history_lock = threading.Lock()
+SPARK_CACHE_MAX = 32          # w/h come from the query string: keep the oldest out
+spark_cache = {}              # (coin, w, h) → (bytes, etag, lo, hi); cleared per sample
+
+def _load_history():
+    try:
+        arr = np.fromfile(HISTORY_FILE, dtype=HISTORY_DTYPE)
+        if arr.size == len(HISTORY_COINS) * HISTORY_SLOTS:
+            return arr.reshape(len(HISTORY_COINS), HISTORY_SLOTS)
+        print(f'[{time.strftime("%H:%M:%S")}] price history shape changed, starting fresh')
+    except (OSError, ValueError):
+        pass
+    return np.zeros((len(HISTORY_COINS), HISTORY_SLOTS), dtype=HISTORY_DTYPE)
+
+price_history = _load_history()
+history_next = [int(np.argmax(row['t']) + 1) % HISTORY_SLOTS if row['t'].any() else 0
+                for row in price_history]
+
+def record_prices(since):
+    """Append every coin that got a good upstream price at or after `since`."""
+    with history_lock:
+        for i, coin in enumerate(HISTORY_COINS):
+            if price_updated.get(coin, 0) < since:
+                continue
+            try:
+                price = float(cached_prices[coin])
+            except (KeyError, ValueError):
+                continue
+            price_history[i, history_next[i]] = (int(price_updated[coin]), price)
+            history_next[i] = (history_next[i] + 1) % HISTORY_SLOTS
+        spark_cache.clear()
+        try:
+            price_history.tofile(HISTORY_FILE + '.tmp')
+            os.replace(HISTORY_FILE + '.tmp', HISTORY_FILE)
+        except OSError as e:
+            print(f'price history save failed: {e}')
+
+def spark_bytes(coin, w, h):
+    """(bytes, etag, lo, hi) for the last 24 h of `coin` squeezed into w columns.
+
+    Two bytes per column: the pixel rows (0 = top, h-1 = bottom) of the column's
+    max and min price, so the device draws one vline each; 255 marks a column
+    with no samples. lo/hi are the prices at the bottom and top rows.
+    """
+    key = (coin, w, h)
+    with history_lock:
+        entry = spark_cache.get(key)
+        if entry is not None:
+            return entry
+        row = price_history[HISTORY_COINS.index(coin)]
+        start = time.time() - SPARK_WINDOW_S
+        live = row[row['t'] >= start]
+        out = np.full((w, 2), 255, dtype=np.uint8)
+        lo = hi = 0.0
+        if live.size:
+            col = ((live['t'] - start) * w // SPARK_WINDOW_S).astype(np.intp).clip(0, w - 1)
+            cmax = np.full(w, -np.inf)
+            cmin = np.full(w, np.inf)
+            np.maximum.at(cmax, col, live['p'])
+            np.minimum.at(cmin, col, live['p'])
+            lo, hi = float(live['p'].min()), float(live['p'].max())
+            scale = (h - 1) / (hi - lo) if hi > lo else 0.0
+            has = np.isfinite(cmax)
+            mid = (h - 1) // 2
+            out[has, 0] = np.rint((hi - cmax[has]) * scale).astype(np.uint8) if scale else mid
+            out[has, 1] = np.rint((hi - cmin[has]) * scale).astype(np.uint8) if scale else mid
+        data = out.tobytes()
+        if len(spark_cache) >= SPARK_CACHE_MAX:
+            spark_cache.pop(next(iter(spark_cache)))
+        entry = spark_cache[key] = (data, hashlib.sha1(data).hexdigest()[:16], lo, hi)
+        return entry
+
 def fetch_data():
-    global cached_prices, cached_logos, cached_big_logos
+    global cached_prices, cached_logos, price_version, snapshot
     while True:
-        ids = "bitcoin,solana,dogecoin,pepe,ripple,litecoin,tesla-xstock"
-        try:
-            r = requests.get(
-                f'https://api.coingecko.com/api/v3/simple/price?ids={ids}&vs_currencies=usd',
-                timeout=10,
-            )
-            data = r.json()
-            if 'bitcoin' in data:
-                cached_prices['btc'] = f"{data['bitcoin']['usd']:.8f}"
-            if 'solana' in data:
-                cached_prices['sol'] = f"{data['solana']['usd']:.4f}"
-            if 'dogecoin' in data:
-                cached_prices['doge'] = f"{data['dogecoin']['usd']:.6f}"
-            if 'pepe' in data:
-                cached_prices['pepe'] = f"{data['pepe']['usd']:.10f}"
-            if 'ripple' in data:
-                cached_prices['xrp'] = f"{data['ripple']['usd']:.4f}"
-            if 'litecoin' in data:
-                cached_prices['ltc'] = f"{data['litecoin']['usd']:.4f}"
-            if 'tesla-xstock' in data:
-                cached_prices['tsla'] = f"{data['tesla-xstock']['usd']:.2f}"
-            else:
-                yp = _yahoo_tsla_price()
-                if yp is not None:
-                    cached_prices['tsla'] = f"{yp:.2f}"
-        except Exception as e:
-            print(f'coingecko fetch failed: {e}')
-            # Keep last good crypto prices; still try Yahoo for TSLA
-            if cached_prices.get('tsla') in (None, 'error'):
-                yp = _yahoo_tsla_price()
-                if yp is not None:
-                    cached_prices['tsla'] = f"{yp:.2f}"
+        t0 = time.time()
+        refresh_prices()
+        record_prices(t0)
+        for coin in HISTORY_COINS:
+            spark_bytes(coin, 160, 16)  # precompute the shape rect screens ask for
+        price_version += 1
+        prev, snapshot = snapshot, build_snapshot()
+        publish(*['price:' + c for c, body in snapshot['prices'].items()
+                  if prev['prices'].get(c) != body],
+                *(['rank'] if prev['rank'] != snapshot['rank'] else []))
 
         # Local logos preferred; remote URLs only for first-time seed if file missing
         logo_urls = {
@@ -239,32 +456,80 @@ def fetch_data():
             'ltc': 'https://cryptologos.cc/logos/litecoin-ltc-logo.png',
             'tsla': 'https://upload.wikimedia.org/wikipedia/commons/e/e8/Tesla_logo.png',
         }
+        # Cheap when nothing changed: logo_asset only reconverts a PNG with a new mtime
         for coin, url in logo_urls.items():
-            if coin not in cached_logos or cached_logos.get(coin) == "error":
-                try:
-                    cached_logos[coin] = load_or_download_logo(coin, url)
-                except Exception as e:
-                    print(f'logo cache {coin}: {e}')
-            generate_big_logo(coin)
-        time.sleep(180)
+            try:
+                cached_logos[coin] = load_or_download_logo(coin, url)
+            except Exception as e:
+                print(f'logo cache {coin}: {e}')
+            big_logo_bytes(coin)
+        refresh_wake.wait(PRICE_REFRESH_S)
+        refresh_wake.clear()
 
 
 # === ROUTES ===
 @app.route('/<coin>')
 def get_price(coin):
     coin = coin.lower()
-    return cached_prices.get(coin, "error")
+    entry = snapshot['prices'].get(coin)
+    if entry is None:
+        return "error"
+    note_price_read(coin)
+    resp = Response(entry[0])
+    resp.set_etag(entry[1])
+    return resp.make_conditional(request)
+
+@app.route('/spark/<coin>')
+def get_spark(coin):
+    """24 h min/max sparkline: ?w= columns (default 160), ?h= rows (default 16)."""
+    coin = coin.lower()
+    if coin not in HISTORY_COINS:
+        abort(404)
+    w = min(max(request.args.get('w', 160, type=int), 1), 240)
+    h = min(max(request.args.get('h', 16, type=int), 2), 80)
+    data, etag, lo, hi = spark_bytes(coin, w, h)
+    resp = Response(data, mimetype='application/octet-stream')
+    resp.headers['X-Spark-Range'] = f'{lo:.10g},{hi:.10g}'
+    resp.set_etag(etag)
+    resp.cache_control.max_age = 60
+    return resp.make_conditional(request)
+
+@app.route('/upstream')
+def upstream_status():
+    """Breaker state, last upstream latency and per-coin price age (seconds)."""
+    now = time.time()
+    return {
+        'sources': {src: {'fails': br['fails'], 'last_ms': br['last_ms'],
+                          'open_for': max(0, round(br['open_until'] - now)),
+                          'last_error': br['last_error']}
+                    for src, br in breakers.items()},
+        'age': {coin: round(now - t) for coin, t in price_updated.items()},
+    }
+
+_clock_memo = (None, b"error", b"")   # (unix second, b'HH:MM:SS', b'HH:MM' +1h)
+
+def clock_bytes():
+    """Chicago wall clock, formatted at most once per second for every screen."""
+    global _clock_memo
+    sec = int(time.time())
+    memo = _clock_memo
+    if memo[0] != sec:
+        try:
+            now = datetime.datetime.now(ZoneInfo("America/Chicago"))
+            # Devices always showed Chicago time shifted one hour ahead
+            ahead = now + datetime.timedelta(hours=1)
+            memo = _clock_memo = (sec, now.strftime('%H:%M:%S').encode(),
+                                  ahead.strftime('%H:%M').encode())
+        except Exception:
+            memo = _clock_memo = (sec, b"error", b"")
+    return memo
 
 @app.route('/time')
 def get_time():
-    try:
-        now = datetime.datetime.now(ZoneInfo("America/Chicago"))
-        return now.strftime('%H:%M:%S')
-    except:
-        return "error"
+    return Response(clock_bytes()[1])
 
-@app.route('/rank')
-def get_rank():
+def compute_ranks():
+    """Competition ranks (ties share a rank, the next one skips) by USD value."""
     values = {}
     for mac, info in HOLDINGS.items():
         coin_key = info['coin']
@@ -286,29 +551,293 @@ def get_rank():
         i = j
     return rank_dict
 
+@app.route('/rank')
+def get_rank():
+    body, etag = snapshot['rank']
+    resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    return resp.make_conditional(request)
+
+# === /state: everything a rect screen draws, in one round trip ===
+# Replaces the device's /<coin> + /time + /rank sequence (3 tunnel round trips and
+# a JSON parse of every screen's rank) with five fixed lines:
+#   price ("$0.5123", "" if unknown) / holding value "%.2f" / "HH:MM" / own rank / rival line
+# Screens that never show each other as a rival (same household).
+RIVAL_EXCLUDE = {
+    '34:98:7A:07:06:B4': '34:98:7A:07:11:24',
+    '34:98:7A:07:11:24': '34:98:7A:07:06:B4',
+}
+DEFAULT_HOLDING_MAC = '34:98:7A:07:06:B4'   # devices fall back to this BTC holding
+
+def _format_price(coin_key, price):
+    # Same text the device used to build from the raw /<coin> value
+    if coin_key == 'btc':
+        return f"${round(price)}"
+    return f"${price}"
+
+def _pick_rival(mac, ranks, rng=random):
+    skip = RIVAL_EXCLUDE.get(mac)
+    candidates = [m for m in ranks if m != mac and m != skip and ranks[m] < 99]
+    if not candidates:
+        return ""
+    rival = rng.choice(candidates)
+    return f"{RANK_ABBR.get(rival, '??')} LT {ranks[rival]}"
+
+# === PRICE SNAPSHOT ===
+# Everything the device routes send that only depends on cached_prices, encoded
+# once per refresh. fetch_data builds a fresh dict and swaps the module global
+# in one assignment, so a request sees either the old snapshot or the new one,
+# never a mix; routes only look things up (plus the clock and a rival pick).
+def _etag(data):
+    return hashlib.sha1(data).hexdigest()[:16]
+
+def build_snapshot():
+    ranks = compute_ranks()
+    rank_body = json.dumps(ranks, sort_keys=True, separators=(',', ':')).encode()
+    prices = {}
+    for coin, text in cached_prices.items():
+        body = text.encode()
+        prices[coin] = (body, _etag(body))
+    # /state lines 1-2 per holding (None = unknown MAC → default holding)
+    state_head = {}
+    rivals = {}
+    for mac in list(HOLDINGS) + [None]:
+        info = HOLDINGS.get(mac, HOLDINGS[DEFAULT_HOLDING_MAC])
+        price_str = value_str = ""
+        try:
+            price = float(cached_prices.get(info['coin'], "error"))
+            price_str = _format_price(info['coin'], price)
+            value_str = "%.2f" % (price * info['amount'])
+        except ValueError:
+            pass
+        state_head[mac] = f"{price_str}\n{value_str}\n".encode()
+        skip = RIVAL_EXCLUDE.get(mac)
+        rivals[mac] = [f"{RANK_ABBR.get(m, '??')} LT {ranks[m]}".encode()
+                       for m in ranks if m != mac and m != skip and ranks[m] < 99] or [b""]
+    return {
+        'version': price_version,
+        'ranks': ranks,
+        'rank': (rank_body, _etag(rank_body)),
+        'prices': prices,
+        'state_head': state_head,
+        'state_rank': {mac: str(r).encode() for mac, r in ranks.items()},
+        'rivals': rivals,
+    }
+
+snapshot = build_snapshot()
+
+@app.route('/state')
+def get_state():
+    mac = request.args.get('mac', '').upper()
+    snap = snapshot
+    key = mac if mac in HOLDINGS else None
+    note_price_read(HOLDINGS.get(mac, HOLDINGS[DEFAULT_HOLDING_MAC])['coin'])
+    body = b''.join((snap['state_head'][key], clock_bytes()[2], b'\n',
+                     snap['state_rank'].get(mac, b'99'), b'\n', random.choice(snap['rivals'][key])))
+    return Response(body, mimetype='text/plain')
+
+def _logo_response(data, etag):
+    """Logo bytes with a content-hash ETag; 304 when the client already has them."""
+    resp = Response(data, mimetype='application/octet-stream')
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = LOGO_MAX_AGE
+    return resp.make_conditional(request)
+
 @app.route('/logo/<coin>')
 def get_logo(coin):
     coin = coin.lower()
-    return cached_logos.get(coin, "error")
+    text = cached_logos.get(coin, "error")
+    entry = small_logo_bytes(coin)
+    if text == "error" or entry is None:
+        return text
+    resp = Response(text)
+    resp.set_etag(entry[1] + '-txt')
+    resp.cache_control.public = True
+    resp.cache_control.max_age = LOGO_MAX_AGE
+    return resp.make_conditional(request)
+
+@app.route('/logo/<coin>.rgb565')
+def get_logo_rgb565(coin):
+    """800-byte binary logo; the comma-separated text route stays for old firmware."""
+    entry = small_logo_bytes(coin.lower())
+    if entry is None:
+        abort(404)
+    return _logo_response(*entry)
 
 @app.route('/biglogo_chunks/<coin>')
 def biglogo_chunks(coin):
-    pixels = generate_big_logo(coin.lower())
-    if pixels is None:
+    entry = big_logo_bytes(coin.lower())
+    if entry is None:
         return "0"
-    return str((len(pixels) + 255) // 256)
+    return str((len(entry[0]) + 511) // 512)
 
 @app.route('/biglogo/<coin>/<int:chunk>')
 def biglogo_chunk(coin, chunk):
-    pixels = generate_big_logo(coin.lower())
-    if pixels is None:
-        return b''
-    start = chunk * 256
-    if start >= len(pixels):
+    entry = big_logo_bytes(coin.lower())
+    if entry is None:
         return b''
-    end = min(start + 256, len(pixels))
-    chunk_pixels = pixels[start:end]
-    return struct.pack(">{}H".format(len(chunk_pixels)), *chunk_pixels)
+    data, etag = entry
+    if chunk * 512 >= len(data):
+        abort(404)
+    return _logo_response(data[chunk * 512:(chunk + 1) * 512], f'{etag}-{chunk}')
+
+@app.route('/biglogo/<coin>.rgb565')
+def biglogo_rgb565(coin):
+    """Whole 160x80 frame in one response; the chunk routes above stay for old firmware."""
+    entry = big_logo_bytes(coin.lower())
+    if entry is None:
+        abort(404)
+    return _logo_response(*entry)
+
+# === SERVER-RENDERED RECT FRAMES (thin-client mode) ===
+# The same layout secondary.py draws locally, rendered here with NumPy so a rect
+# screen only has to blit one 25.6 KB big-endian RGB565 frame. Frames are cached
+# per (mac, screen) until the next price refresh. The noise and the bottom-line
+# coin flip are seeded from what the frame shows, so a refresh that leaves the
+# prices and ranks alone renders the same bytes and the device's ETag still holds.
+RECT_W, RECT_H = 160, 80
+# The rect firmware's glyph set, so text renders exactly as secondary.py draws it
+RECT_FONT = {ch: GLYPHS[ch] for ch in TARGETS['secondary.py']['font']}
+MEDAL_COLORS = {1: (0xFFE0, 0x83E0), 2: (0xC618, 0x630C), 3: (0xCD72, 0x0000)}   # (rim, fill)
+MEDAL_DEFAULT = (0xFFFF, 0x3186)
+
+frame_lock = threading.Lock()
+frame_cache = {}   # (mac, screen) → (price_version, bytes, etag)
+
+def _noise_frame(seed):
+    # Very dark random noise, same ranges as the device (r/b 0-3, g 0-6)
+    rng = np.random.default_rng(seed)
+    r = rng.integers(0, 4, (RECT_H, RECT_W), dtype=np.uint16)
+    g = rng.integers(0, 7, (RECT_H, RECT_W), dtype=np.uint16)
+    b = rng.integers(0, 4, (RECT_H, RECT_W), dtype=np.uint16)
+    return (r << 11) | (g << 5) | b
+
+def _draw_text(frame, x, y, text):
+    for ch in text.upper():
+        bitmap = RECT_FONT.get(ch)
+        if bitmap is not None:
+            for col, bits in enumerate(bitmap):
+                for row in range(8):
+                    if bits & (1 << (7 - row)):
+                        frame[y + row * 2:y + row * 2 + 2, x + col * 2:x + col * 2 + 2] = 0xFFFF
+        x += 12
+
+def _draw_medal(frame, rank):
+    bright, dark = MEDAL_COLORS.get(rank, MEDAL_DEFAULT)
+    cx, cy, r = 147, 67, 10
+    yy, xx = np.ogrid[:RECT_H, :RECT_W]
+    dist = (xx - cx) ** 2 + (yy - cy) ** 2
+    frame[dist <= r * r] = dark
+    frame[(dist > r * r) & (dist <= (r + 1) * (r + 1))] = bright
+    rank_str = str(rank)
+    total_width = len(rank_str) * 10 + (len(rank_str) - 1) * 3
+    x_base = cx - total_width // 2
+    y_base = cy - 8
+    for i, ch in enumerate(rank_str):
+        pattern = RANK_DIGITS[int(ch)] if ch.isdigit() else RANK_DIGITS[0]
+        x = x_base + i * 13
+        for row, bits in enumerate(pattern):
+            for col in range(5):
+                if bits & (1 << (4 - col)):
+                    frame[y_base + row, x + col * 2:x + col * 2 + 2] = bright
+
+def _draw_placeholder_logo(frame, cx, cy, radius):
+    """White disc with a black X — what the device shows when it has no logo."""
+    yy, xx = np.ogrid[:RECT_H, :RECT_W]
+    frame[(xx - cx) ** 2 + (yy - cy) ** 2 <= radius * radius] = 0xFFFF
+    strokes = (
+        [(cx - radius // 2, cy - radius), (cx, cy - radius // 3), (cx + radius // 2, cy + radius)],
+        [(cx + radius // 2, cy - radius), (cx, cy - radius // 3), (cx - radius // 2, cy + radius)],
+        [(cx - radius, cy), (cx, cy + radius // 4), (cx + radius, cy)],
+    )
+    for points in strokes:
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            dx, dy = abs(x1 - x0), abs(y1 - y0)
+            sx = 1 if x0 < x1 else -1
+            sy = 1 if y0 < y1 else -1
+            err = dx - dy
+            while True:
+                if 0 <= x0 < RECT_W and 0 <= y0 < RECT_H:
+                    frame[y0, x0] = 0
+                if x0 == x1 and y0 == y1:
+                    break
+                e2 = 2 * err
+                if e2 > -dy:
+                    err -= dy
+                    x0 += sx
+                if e2 < dx:
+                    err += dx
+                    y0 += sy
+
+def _draw_small_logo(frame, coin_key, x, y):
+    entry = small_logo_bytes(coin_key)
+    if entry is None:
+        _draw_placeholder_logo(frame, x + 10, y + 10, 10)
+        return
+    frame[y:y + 20, x:x + 20] = np.frombuffer(entry[0], dtype='>u2').reshape(20, 20)
+
+def _bottom_line(mac, ranks, rng):
+    # Same coin flip the device makes: a rival's rank or a lucky number
+    if rng.randint(1, 2) == 1:
+        return _pick_rival(mac, ranks, rng) or "ERROR XD"
+    if rng.randint(0, 3):
+        return f"LUK N:{rng.randint(0, 99)}"
+    return f"LUK N:{67}"
+
+def render_rect_frame(mac, screen):
+    """160x80 uint16 RGB565 array for one rect screen ('main' or 'big')."""
+    info = HOLDINGS.get(mac, HOLDINGS[DEFAULT_HOLDING_MAC])
+    coin_key = info['coin']
+    label = coin_key.upper()
+    try:
+        price = float(cached_prices.get(coin_key, "error"))
+        price_str = _format_price(coin_key, price)
+        val_str = "VAL:$%.2f" % (price * info['amount'])
+    except ValueError:
+        price_str = "---"
+        val_str = "VAL:$---"
+    seed = zlib.crc32(f"{mac} {screen} {price_str} {val_str} {snapshot['rank'][1]}".encode())
+
+    if screen == 'big':
+        entry = big_logo_bytes(coin_key)
+        if entry is not None:
+            frame = np.frombuffer(entry[0], dtype='>u2').reshape(RECT_H, RECT_W).astype(np.uint16)
+        else:
+            frame = _noise_frame(seed)
+            _draw_small_logo(frame, coin_key, 70, 30)
+        _draw_text(frame, 30, 4, val_str)
+        return frame
+
+    ranks = snapshot['ranks']
+    frame = _noise_frame(seed)
+    _draw_text(frame, 8, 4, SCREEN_NAMES.get(mac, SCREEN_NAMES[DEFAULT_HOLDING_MAC]) + " " + label)
+    _draw_text(frame, 8, 22, f"{label}:" + price_str)
+    _draw_text(frame, 8, 42, val_str)
+    _draw_text(frame, 8, 62, _bottom_line(mac, ranks, random.Random(seed)))
+    _draw_small_logo(frame, coin_key, 114, 58)
+    rank = ranks.get(mac, 99)
+    if rank < 99:
+        _draw_medal(frame, rank)
+    return frame
+
+@app.route('/frame')
+def get_frame():
+    mac = request.args.get('mac', '').upper()
+    screen = request.args.get('screen', 'main')
+    if screen not in ('main', 'big'):
+        abort(400, "screen must be main or big")
+    key = (mac, screen)
+    with frame_lock:
+        entry = frame_cache.get(key)
+        if entry is None or entry[0] != price_version:
+            data = render_rect_frame(mac, screen).astype('>u2').tobytes()
+            entry = (price_version, data, hashlib.sha1(data).hexdigest()[:16])
+            if mac in HOLDINGS:   # unknown MACs are rendered but never cached
+                frame_cache[key] = entry
+    resp = Response(entry[1], mimetype='application/octet-stream')
+    resp.set_etag(entry[2])
+    return resp.make_conditional(request)
 
 # === ROUND SCREEN PHOTO ENDPOINT (exactly as your standalone server) ===
 @app.route('/pixel')
@@ -362,6 +891,93 @@ def serve_pixel_chunk():
 
     return Response(chunk, mimetype='application/octet-stream')
 
+# === DEVICE TELEMETRY ===
+# Every screen POSTs one small JSON beacon per dwell (chunk/request latency
+# histogram, retries, min gc.mem_free(), paint ms, reset cause). Kept in a fixed
+# ring per MAC so a chatty or stuck device can never grow server memory.
+TELEMETRY_RING = 256
+TELEMETRY_MAX_BODY = 1024
+TELEMETRY_LAT_EDGES = (100, 250, 500, 1000, 2500)   # must match the devices' LAT_EDGES
+TELEMETRY_FIELDS = ('lat', 'ret', 'mem', 'paint', 'big', 'spi', 'rc', 'why', 'ver')
+TELEMETRY_INTS = ('ret', 'mem', 'paint', 'big', 'spi')
+
+telemetry_lock = threading.Lock()
+device_telemetry = {}   # mac → deque of {'t': server time, **beacon fields}
+
+def _is_int(v):
+    return isinstance(v, int) and not isinstance(v, bool)
+
+def _beacon_problem(beacon):
+    """Why a beacon's fields can't be summarised, or None if they can."""
+    lat = beacon.get('lat', [])
+    if not isinstance(lat, list) or not all(_is_int(n) for n in lat):
+        return "'lat' must be a list of ints"
+    for key in TELEMETRY_INTS:
+        if key in beacon and not _is_int(beacon[key]):
+            return f"'{key}' must be an int"
+    return None
+
+@app.route('/telemetry', methods=['POST'])
+def post_telemetry():
+    if (request.content_length or 0) > TELEMETRY_MAX_BODY:
+        abort(413)
+    beacon = request.get_json(force=True, silent=True)
+    if not isinstance(beacon, dict):
+        abort(400, "Expected a JSON object")
+    mac = str(beacon.get('mac', '')).upper()
+    if len(mac) != 17:
+        abort(400, "Missing or invalid 'mac'")
+    problem = _beacon_problem(beacon)
+    if problem:
+        abort(400, problem)
+    entry = {'t': time.time()}
+    for key in TELEMETRY_FIELDS:
+        if key in beacon:
+            entry[key] = beacon[key]
+    with telemetry_lock:
+        ring = device_telemetry.get(mac)
+        if ring is None:
+            ring = device_telemetry[mac] = collections.deque(maxlen=TELEMETRY_RING)
+        ring.append(entry)
+    return Response(status=204)
+
+def _telemetry_summary(entries):
+    """One device's ring summarised; malformed entries are skipped, None if all are."""
+    entries = [e for e in entries if _beacon_problem(e) is None]
+    if not entries:
+        return None
+    lat = [0] * (len(TELEMETRY_LAT_EDGES) + 1)
+    for e in entries:
+        for i, n in enumerate(e.get('lat', [])[:len(lat)]):
+            lat[i] += n
+    mems = [e['mem'] for e in entries if 'mem' in e]
+    paints = sorted(e['paint'] for e in entries if 'paint' in e)
+    last = entries[-1]
+    return {
+        'beacons': len(entries),
+        'last_seen': last['t'],
+        'lat_edges_ms': list(TELEMETRY_LAT_EDGES),
+        'lat_hist': lat,
+        'retries': sum(e.get('ret', 0) for e in entries),
+        'mem_free_min': min(mems) if mems else None,
+        'paint_ms_p50': paints[len(paints) // 2] if paints else None,
+        'paint_ms_max': paints[-1] if paints else None,
+        'spi_bytes_last': last.get('spi'),
+        'reset_cause': last.get('rc'),
+        'reset_why': last.get('why'),
+    }
+
+@app.route('/telemetry', methods=['GET'])
+def get_telemetry():
+    """Fleet summary; ?mac= returns that device's raw ring instead."""
+    mac = request.args.get('mac', '').upper()
+    with telemetry_lock:
+        if mac:
+            return {'mac': mac, 'entries': list(device_telemetry.get(mac, ()))}
+        rings = {m: list(ring) for m, ring in device_telemetry.items() if ring}
+    summaries = {m: _telemetry_summary(entries) for m, entries in rings.items()}
+    return {m: summary for m, summary in summaries.items() if summary is not None}
+
 def cleanup_old_clients():
     while True:
         now = time.time()
@@ -374,64 +990,269 @@ def cleanup_old_clients():
         # often than needed to free a few hundred KB.
         time.sleep(300)
 
+# === CHANGE NOTIFICATION (long poll) ===
+# Screens park on /wait instead of re-fetching on fixed timers. Every change is
+# published under a topic with a global sequence number; a waiter returns as
+# soon as one of its device's topics moves past the cursor it sent, or after
+# the keep-alive timeout (kept under Cloudflare's 100 s origin limit).
+#   price:<coin>, rank           fetch_data, only when the encoded body changed
+#   photos:<screenN>             watch_photo_library, on a photo dir mtime change
+#   fw:<file>.mpy                compile_firmware_loop, after a successful build;
+#                                only sent once the device's rollout slot opens
+#                                (see STAGED ROLLOUT), never straight off the bus
+WAIT_TIMEOUT_S = 50
+PHOTO_WATCH_INTERVAL = 10
+bus_cond = threading.Condition()
+bus_seq = 0
+bus_topics = {}   # topic → bus_seq of its latest change
+
+def publish(*topics):
+    global bus_seq
+    if not topics:
+        return
+    with bus_cond:
+        bus_seq += 1
+        for topic in topics:
+            bus_topics[topic] = bus_seq
+        bus_cond.notify_all()
+
+def _wait_topics(mac, app_kind):
+    if app_kind == 'circle' or (app_kind is None and mac in mac_to_key and mac not in HOLDINGS):
+        return ('photos:' + mac_to_key.get(mac, 'screen4'), 'fw:tertiary.mpy')
+    coin = HOLDINGS.get(mac, HOLDINGS[DEFAULT_HOLDING_MAC])['coin']
+    return ('price:' + coin, 'rank', 'fw:secondary.mpy')
+
+@app.route('/wait')
+def wait_for_change():
+    """Plain-text "<cursor> <reason>". Pass the cursor back as ?since=; reason is
+    the topic that changed, or hello (no since), reset (server restarted) or
+    timeout. ?app=rect|circle picks the topics, ?t= caps the wait in seconds."""
+    mac = request.args.get('mac', '').upper()
+    since = request.args.get('since', -1, type=int)
+    limit = min(max(request.args.get('t', WAIT_TIMEOUT_S, type=int), 1), WAIT_TIMEOUT_S)
+    topics = _wait_topics(mac, request.args.get('app'))
+    fw_topics = [t for t in topics if t.startswith('fw:')]
+    deadline = time.time() + limit
+    with bus_cond:
+        while True:
+            if since < 0:
+                reason = 'hello'
+                break
+            if since > bus_seq:
+                reason = 'reset'
+                break
+            changed = [t for t in topics if t not in fw_topics and bus_topics.get(t, 0) > since]
+            if changed:
+                reason = max(changed, key=bus_topics.get)
+                break
+            due, hold = rollout_due(mac, fw_topics)
+            if due:
+                reason = due
+                break
+            left = deadline - time.time()
+            if left <= 0:
+                reason = 'timeout'
+                break
+            bus_cond.wait(left if hold is None else min(left, hold + 0.05))
+        cursor = bus_seq
+    return Response(f"{cursor} {reason}", mimetype='text/plain')
+
+def watch_photo_library():
+    """One stat() per photo dir; publishes photos:<key> when files come or go."""
+    seen = {}
+    while True:
+        for key, directory in PHOTO_DIRS.items():
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                mtime = None
+            if key in seen and seen[key] != mtime:
+                print(f'[{time.strftime("%H:%M:%S")}] photo library changed: {key}')
+                publish('photos:' + key)
+            seen[key] = mtime
+        time.sleep(PHOTO_WATCH_INTERVAL)
+
 # === LOCAL AUTO-COMPILE (no git) ===
 # Recompiling every source on a timer burned mpy-cross ~1150x/day to produce
 # byte-identical output. Instead: stat() the sources cheaply, and only shell out
 # to mpy-cross when the content actually changed (any edit — a VERSION bump, a
 # one-character fix — so the .mpy is never behind the source).
-_compile_state = {}   # src path → {'fp': (mtime_ns, size), 'sha': hexdigest}
+#
+# Builds are content-addressed: the key is (source sha1, mpy-cross sha1, -march),
+# and every output is kept in BUILD_CACHE_DIR with its size and build time. After
+# a restart, or when a source is reverted, the .mpy is restored by a copy instead
+# of an mtime guess or a rebuild; misses across targets compile in parallel.
+MPY_MARCH = 'rv32imc'
+BUILD_CACHE_DIR = os.path.join(REPO_DIR, '.mpy_cache')
+BUILD_CACHE_KEEP = 20          # outputs kept per target, newest first
+BUILD_INDEX = os.path.join(BUILD_CACHE_DIR, 'index.json')
 
-def _file_sha1(path):
-    h = hashlib.sha1()
+_compile_state = {}   # src path → {'fp': (mtime_ns, size), 'sha': hexdigest, 'key': build key}
+build_lock = threading.Lock()
+_cross_sha = (None, None)     # (mpy-cross (mtime_ns, size), sha1)
+
+def _file_hexdigest(path, h):
     with open(path, 'rb') as f:
         for block in iter(lambda: f.read(65536), b''):
             h.update(block)
     return h.hexdigest()
 
-def _needs_compile(src, dst):
-    """(should_compile, stamp). Stamp is recorded only after a successful compile
-    so a failed build retries on the next tick instead of being marked done."""
+def _file_sha1(path):
+    return _file_hexdigest(path, hashlib.sha1())
+
+def _load_build_index():
+    try:
+        with open(BUILD_INDEX) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+build_index = _load_build_index()   # key → {'target', 'src_sha', 'out_sha', 'size', 'build_s', 'built'}
+
+def _save_build_index():
+    os.makedirs(BUILD_CACHE_DIR, exist_ok=True)
+    with open(BUILD_INDEX + '.tmp', 'w') as f:
+        json.dump(build_index, f, indent=1, sort_keys=True)
+    os.replace(BUILD_INDEX + '.tmp', BUILD_INDEX)
+
+def _build_key(src_sha):
+    """Cache key for a source, or None when mpy-cross is missing."""
+    global _cross_sha
+    try:
+        st = os.stat(MPY_CROSS_PATH)
+    except OSError:
+        print(f'[{time.strftime("%H:%M:%S")}] ❌ mpy-cross not found: {MPY_CROSS_PATH}')
+        return None
+    fp = (st.st_mtime_ns, st.st_size)
+    if _cross_sha[0] != fp:
+        _cross_sha = (fp, _file_sha1(MPY_CROSS_PATH))
+    return hashlib.sha1(f'{src_sha}:{_cross_sha[1]}:{MPY_MARCH}'.encode()).hexdigest()[:24]
+
+def _copy_into(src, dst):
+    tmp = dst + '.tmp'
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+def _compile_mpy(src, out, label):
+    """mpy-cross src → out; build seconds, or None on failure."""
+    t0 = time.monotonic()
+    result = subprocess.run(
+        [MPY_CROSS_PATH, f'-march={MPY_MARCH}', src, '-o', out],
+        capture_output=True, text=True,
+    )
+    if result.returncode == 0 and os.path.isfile(out):
+        return time.monotonic() - t0
+    err = (result.stderr or '')[-200:]
+    print(f'[{time.strftime("%H:%M:%S")}] ❌ Failed {label}: rc={result.returncode} {err}')
+    return None
+
+def _prune_builds(target):
+    """Drop this target's cached outputs beyond the newest BUILD_CACHE_KEEP."""
+    keys = sorted((k for k, e in build_index.items() if e['target'] == target),
+                  key=lambda k: build_index[k]['built'], reverse=True)
+    for k in keys[BUILD_CACHE_KEEP:]:
+        build_index.pop(k, None)
+        try:
+            os.remove(os.path.join(BUILD_CACHE_DIR, k + '.mpy'))
+        except OSError:
+            pass
+
+def _build(src, dst, label):
+    """Bring dst in line with src through the build cache; True when dst changed.
+    _compile_state is only stamped on success, so a failed build retries."""
     try:
         st = os.stat(src)
     except OSError:
-        return False, None                      # source absent — nothing to do, quietly
+        return False                            # source absent — nothing to do, quietly
     fp = (st.st_mtime_ns, st.st_size)
     prev = _compile_state.get(src)
     dst_exists = os.path.isfile(dst)
 
     # Fast path: nothing touched the file since the last look. One stat, no read.
     if prev is not None and prev['fp'] == fp and dst_exists:
-        return False, None
-
-    digest = _file_sha1(src)
-    stamp = {'fp': fp, 'sha': digest}
+        return False
 
-    if not dst_exists:
-        return True, stamp
-    # Touched but identical (git checkout, editor rewrite) — don't rebuild.
-    if prev is not None and prev['sha'] == digest:
+    src_sha = _file_sha1(src)
+    key = _build_key(src_sha)
+    if key is None:
+        return False
+    stamp = {'fp': fp, 'sha': src_sha, 'key': key}
+    # Touched but identical (git checkout, editor rewrite) — nothing to do.
+    if prev is not None and prev['key'] == key and dst_exists:
         _compile_state[src] = stamp
-        return False, None
-    # First look after a restart: trust an existing .mpy that is newer than its source.
-    if prev is None and os.stat(dst).st_mtime_ns >= st.st_mtime_ns:
+        return False
+
+    target = os.path.basename(dst)
+    cached = os.path.join(BUILD_CACHE_DIR, key + '.mpy')
+    with build_lock:
+        entry = build_index.get(key)
+    if entry is not None and os.path.isfile(cached):
+        # Judged against today's BUDGETS, so raising a budget ships the cached build
+        problems = firmware_footprint.over_budget(target, entry.get('footprint', {}))
+        if problems != entry.get('over_budget'):
+            with build_lock:
+                entry['over_budget'] = problems
+            if problems:
+                print(f'[{time.strftime("%H:%M:%S")}] ❌ {label} over budget, not deployed: {"; ".join(problems)}')
+        if problems:
+            return False
+        # First look after a restart: the right build may already be in place.
+        if dst_exists and _file_sha1(dst) == entry['out_sha']:
+            _compile_state[src] = stamp
+            return False
+        _copy_into(cached, dst)
+        print(f'[{time.strftime("%H:%M:%S")}] ♻️  Restored {label} → {target} from cache ({entry["size"]} bytes)')
         _compile_state[src] = stamp
-        return False, None
-    return True, stamp
+        return True
 
-def _compile_mpy(src, dst, label):
-    if not os.path.isfile(MPY_CROSS_PATH):
-        print(f'[{time.strftime("%H:%M:%S")}] ❌ mpy-cross not found: {MPY_CROSS_PATH}')
+    os.makedirs(BUILD_CACHE_DIR, exist_ok=True)
+    build_s = _compile_mpy(src, cached + '.tmp', label)
+    if build_s is None:
         return False
-    result = subprocess.run(
-        [MPY_CROSS_PATH, '-march=rv32imc', src, '-o', dst],
-        capture_output=True, text=True,
-    )
-    if result.returncode == 0 and os.path.isfile(dst):
-        print(f'[{time.strftime("%H:%M:%S")}] ✅ Compiled {label} → {os.path.basename(dst)} ({os.path.getsize(dst)} bytes)')
-        return True
-    err = (result.stderr or '')[-200:]
-    print(f'[{time.strftime("%H:%M:%S")}] ❌ Failed {label}: rc={result.returncode} {err}')
-    return False
+    os.replace(cached + '.tmp', cached)
+    size = os.path.getsize(cached)
+    fp = firmware_footprint.footprint(src, cached)
+    problems = firmware_footprint.over_budget(target, fp)
+    with build_lock:
+        build_index[key] = {'target': target, 'src_sha': src_sha, 'out_sha': _file_sha1(cached),
+                            'size': size, 'build_s': round(build_s, 3), 'built': time.time(),
+                            'footprint': fp, 'over_budget': problems}
+        _prune_builds(target)
+        _save_build_index()
+    print(f'[{time.strftime("%H:%M:%S")}] 📏 {firmware_footprint.format_row(target, fp)}')
+    if problems:
+        # Devices keep the previous .mpy; fix the source (or the budget) to ship
+        print(f'[{time.strftime("%H:%M:%S")}] ❌ {label} over budget, not deployed: {"; ".join(problems)}')
+        return False
+    _copy_into(cached, dst)
+    print(f'[{time.strftime("%H:%M:%S")}] ✅ Compiled {label} → {target} ({size} bytes, {build_s:.2f}s)')
+    _compile_state[src] = stamp
+    return True
+
+# Content-hash ETags for every file served below. Keyed like _compile_state by
+# (mtime_ns, size), so a request only re-hashes a file that actually changed;
+# compile_firmware_loop refreshes a .mpy's entry right after writing it. The tag
+# is the file's full sha256, which boot scripts also compute over their cached
+# .mpy, so a device can send If-None-Match / ?from= without ever having seen it.
+_asset_etags = {}     # served path → {'fp': (mtime_ns, size), 'etag': str}
+
+def asset_etag(path):
+    st = os.stat(path)
+    fp = (st.st_mtime_ns, st.st_size)
+    entry = _asset_etags.get(path)
+    if entry is None or entry['fp'] != fp:
+        entry = _asset_etags[path] = {'fp': fp, 'etag': _file_hexdigest(path, hashlib.sha256())}
+    return entry['etag']
+
+def send_asset(path, mimetype):
+    """send_file with a content-hash ETag and If-None-Match → 304. Firmware changes
+    in place, so caches (Cloudflare, devices) may store it but must revalidate."""
+    if not os.path.isfile(path):
+        abort(404)
+    resp = send_file(path, mimetype=mimetype, etag=asset_etag(path))
+    resp.cache_control.public = True
+    resp.cache_control.no_cache = True
+    return resp
 
 CIRCLE_BOOT_PY = os.path.join(REPO_DIR, 'circle_display', 'boot2.py')
 BOOT2_MPY = os.path.join(REPO_DIR, 'boot2.mpy')
@@ -444,81 +1265,393 @@ COMPILE_TARGETS = [
     (CIRCLE_BOOT_PY, BOOT2_MPY, 'circle_display/boot2.py (circle boot)'),
 ]
 
+def _compile_target(src, dst, label):
+    if not _build(src, dst, label):
+        return
+    asset_etag(dst)
+    if dst in OTA_TARGETS.values():
+        start_release(os.path.basename(dst))
+    publish('fw:' + os.path.basename(dst))
+    if src == CIRCLE_BOOT_PY:
+        try:
+            shutil.copy2(CIRCLE_BOOT_PY, BOOT2_PY)
+            asset_etag(BOOT2_PY)
+            print(f'[{time.strftime("%H:%M:%S")}] ✅ Copied circle boot2.py source → boot2.py')
+        except Exception as e:
+            print(f'[{time.strftime("%H:%M:%S")}] Warning copying boot2.py: {e}')
+
+def _compile_one(target):
+    try:
+        _compile_target(*target)
+    except Exception as e:
+        print(f'[{time.strftime("%H:%M:%S")}] Compile loop error: {e}')
+
+def _compile_all():
+    # mpy-cross runs as a subprocess, so cache misses really do build side by side
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(COMPILE_TARGETS)) as pool:
+        list(pool.map(_compile_one, COMPILE_TARGETS))
+
+# inotify(7) through libc; editors save by rewrite or by rename-over, so the
+# parent directories are watched and events are matched by file name.
+IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x2, 0x8, 0x80, 0x100
+IN_Q_OVERFLOW = 0x4000
+IN_CLOEXEC = 0o2000000
+_INOTIFY_EVENT = struct.Struct('iIII')   # wd, mask, cookie, len (then the name)
+
+def _inotify_watch(dirs):
+    """(fd, {wd: dir}) watching dirs, or (None, None) where inotify is unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        watches = {}
+        for d in dirs:
+            wd = libc.inotify_add_watch(fd, os.fsencode(d), mask)
+            if wd < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch {d}')
+            watches[wd] = d
+        return fd, watches
+    except (OSError, AttributeError, TypeError) as e:
+        print(f'[{time.strftime("%H:%M:%S")}] inotify unavailable ({e}); polling every {COMPILE_CHECK_INTERVAL}s')
+        return None, None
+
 def compile_firmware_loop():
     """Watch local sources; compile only what changed. Does not touch git."""
+    _compile_all()   # catch up on edits made while the server was down
+    targets = {src: (src, dst, label) for src, dst, label in COMPILE_TARGETS}
+    fd, watches = _inotify_watch(sorted({os.path.dirname(src) for src in targets}))
+    if fd is None:
+        while True:
+            time.sleep(COMPILE_CHECK_INTERVAL)
+            _compile_all()
+
+    pending = {}   # src → monotonic time of its latest event
+    # REPO_DIR also sees writes that are not sources (price_history.bin, .mpy
+    # outputs, the build index), so the rescan is timed, not "no event lately"
+    last_scan = time.monotonic()
     while True:
-        try:
-            for src, dst, label in COMPILE_TARGETS:
-                should, stamp = _needs_compile(src, dst)
-                if not should:
+        now = time.monotonic()
+        timeout = max(0.0, last_scan + COMPILE_RESCAN_S - now)
+        if pending:
+            timeout = min(timeout, max(0.0, min(pending.values()) + COMPILE_DEBOUNCE_S - now))
+        ready, _, _ = select.select([fd], [], [], timeout)
+        now = time.monotonic()
+        if ready:
+            buf = os.read(fd, 65536)
+            off = 0
+            while off < len(buf):
+                wd, mask, _cookie, length = _INOTIFY_EVENT.unpack_from(buf, off)
+                name = buf[off + _INOTIFY_EVENT.size:off + _INOTIFY_EVENT.size + length].rstrip(b'\0')
+                off += _INOTIFY_EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    pending.update(dict.fromkeys(targets, now))
                     continue
-                if not _compile_mpy(src, dst, label):
-                    continue
-                _compile_state[src] = stamp
-                if src == CIRCLE_BOOT_PY:
-                    try:
-                        shutil.copy2(CIRCLE_BOOT_PY, BOOT2_PY)
-                        print(f'[{time.strftime("%H:%M:%S")}] ✅ Copied circle boot2.py source → boot2.py')
-                    except Exception as e:
-                        print(f'[{time.strftime("%H:%M:%S")}] Warning copying boot2.py: {e}')
-        except Exception as e:
-            print(f'[{time.strftime("%H:%M:%S")}] Compile loop error: {e}')
+                src = os.path.join(watches.get(wd, ''), os.fsdecode(name))
+                if src in targets:
+                    pending[src] = now
+        if now - last_scan >= COMPILE_RESCAN_S:
+            last_scan = now
+            _compile_all()
+            continue
+        settled = [s for s, t in pending.items() if now - t >= COMPILE_DEBOUNCE_S]
+        for src in settled:
+            del pending[src]
+        if len(settled) == 1:
+            _compile_one(targets[settled[0]])
+        elif settled:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(settled)) as pool:
+                list(pool.map(_compile_one, [targets[src] for src in settled]))
+
+
+# === DELTA OTA ===
+# Screens reboot every ~30 min and used to pull the whole .mpy each time over the
+# tunnel. A device that reports the sha256 of the .mpy it already holds gets a
+# copy/insert delta against that build instead, as long as it is one of the last
+# OTA_DELTA_BASES builds of the target kept in BUILD_CACHE_DIR. Wire format
+# (little-endian):
+#   b'XD1' | u32 new size | sha256 of the new file (32 bytes)
+#   then ops  0x01 u32 offset u32 length   copy from the device's old file
+#             0x02 u16 length + bytes      literal
+#             0x00                         end
+# The device rebuilds into <name>.tmp and renames only if the sha256 matches.
+# A base that already is the served build gets a bodiless 304 (the common case:
+# most reboots find nothing new). An unknown base, or a delta that saves too
+# little, is a 404 and the device falls back to the full download.
+OTA_TARGETS = {'secondary.mpy': SECONDARY_MPY, 'tertiary.mpy': TERTIARY_MPY}
+OTA_DELTA_BASES = 8
+DELTA_MIN_MATCH = 16      # shortest copy worth its 9-byte op
+DELTA_MAX_RATIO = 0.7     # larger than this share of the file → full download instead
+DELTA_HEADER = struct.Struct('<3sI32s')
+DELTA_CACHE_MAX = 64
+
+_build_sha256 = {}        # build key → sha256 hex (cached outputs never change)
+delta_cache = {}          # (base sha256, new sha256) → delta bytes, or None if not worth it
+delta_lock = threading.Lock()
+
+def delta_bases(target):
+    """{sha256: cached path} for the newest deployable builds of target."""
+    with build_lock:
+        keys = sorted((k for k, e in build_index.items()
+                       if e['target'] == target
+                       and not firmware_footprint.over_budget(target, e.get('footprint', {}))),
+                      key=lambda k: build_index[k]['built'], reverse=True)[:OTA_DELTA_BASES]
+    bases = {}
+    for k in keys:
+        path = os.path.join(BUILD_CACHE_DIR, k + '.mpy')
+        if k not in _build_sha256:
+            try:
+                with open(path, 'rb') as f:
+                    _build_sha256[k] = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                continue
+        bases[_build_sha256[k]] = path
+    return bases
+
+def make_delta(old, new):
+    """Greedy copy/insert ops that rebuild new from old (format above)."""
+    k = DELTA_MIN_MATCH
+    index = {}
+    for i in range(len(old) - k + 1):
+        index.setdefault(old[i:i + k], i)
+    out = bytearray(DELTA_HEADER.pack(b'XD1', len(new), hashlib.sha256(new).digest()))
+    n = len(new)
+    lit = j = 0
+    expect = -1      # old offset that would continue the previous copy
+    while j < n:
+        best_at = best_len = 0
+        for at in (expect, index.get(new[j:j + k], -1)):
+            if at < 0:
+                continue
+            m = 0
+            while j + m < n and at + m < len(old) and new[j + m] == old[at + m]:
+                m += 1
+            if m > best_len:
+                best_at, best_len = at, m
+        if best_len < k:
+            j += 1
+            if expect >= 0:
+                expect += 1
+            continue
+        for s in range(lit, j, 0xFFFF):
+            chunk = new[s:min(j, s + 0xFFFF)]
+            out += struct.pack('<BH', 2, len(chunk)) + chunk
+        out += struct.pack('<BII', 1, best_at, best_len)
+        j += best_len
+        lit = j
+        expect = best_at + best_len
+    for s in range(lit, n, 0xFFFF):
+        chunk = new[s:min(n, s + 0xFFFF)]
+        out += struct.pack('<BH', 2, len(chunk)) + chunk
+    out.append(0)
+    return bytes(out)
+
+def delta_bytes(name, base):
+    """Delta from the build whose sha256 is base to the served name, or None."""
+    try:
+        with open(OTA_TARGETS[name], 'rb') as f:
+            new = f.read()
+    except OSError:
+        return None
+    key = (base, hashlib.sha256(new).hexdigest())
+    with delta_lock:
+        if key in delta_cache:
+            return delta_cache[key]
+    old_path = delta_bases(name).get(base)
+    if old_path is None:
+        return None                      # not cached: don't remember, it may be built later
+    with open(old_path, 'rb') as f:
+        data = make_delta(f.read(), new)
+    print(f'[{time.strftime("%H:%M:%S")}] 🩹 Delta {name} {base[:8]}→{key[1][:8]}: '
+          f'{len(data)} of {len(new)} bytes')
+    if len(data) > DELTA_MAX_RATIO * len(new):
+        data = None
+    with delta_lock:
+        if len(delta_cache) >= DELTA_CACHE_MAX:
+            delta_cache.pop(next(iter(delta_cache)))
+        delta_cache[key] = data
+    return data
+
+@app.route('/delta/<name>')
+def serve_delta(name):
+    if name not in OTA_TARGETS or not os.path.isfile(OTA_TARGETS[name]):
+        abort(404)
+    base = request.args.get('from', '')
+    mac = request.args.get('mac', '').upper()
+    etag = asset_etag(OTA_TARGETS[name])
+    hold = rollout_hold(mac, name) if base != etag else 0
+    note_build(mac, name, base)
+    if base == etag or hold:
+        return _rollout_304(base, hold)
+    data = delta_bytes(name, base)
+    if data is None:
+        abort(404)
+    return Response(data, mimetype='application/octet-stream')
+
+
+# === STAGED ROLLOUT ===
+# A new secondary/tertiary build used to reach every screen at once: fw: woke
+# them all together, and after a power blip they all rebooted into the same
+# download through the tunnel. Each MAC now has a wave: ROLLOUT_CANARIES are
+# wave 0 and take a release as soon as it is built; everyone else is hashed
+# into waves 1..ROLLOUT_WAVES-1, wave w opening w * ROLLOUT_WAVE_S later plus a
+# per-MAC, per-release jitter in [0, ROLLOUT_JITTER_S). Until its slot opens a device
+# asking with ?mac= (and a build to keep) gets a 304 + Retry-After from /delta
+# and the .mpy routes, and /wait holds its fw: wakeup until then. A bad build
+# can be fixed (or reverted, which restores from the build cache as a new
+# release) before it leaves the canaries. GET /manifest?mac= shows the plan.
+# Releases live in memory: after a server restart the deployed builds count as
+# fully rolled out, and devices take them on their next boot.
+ROLLOUT_CANARIES = {'34:98:7A:07:12:B8'}   # test device
+ROLLOUT_WAVES = 3
+ROLLOUT_WAVE_S = 20 * 60
+ROLLOUT_JITTER_S = 10 * 60
+ROLLOUT_RENOTIFY_S = 30 * 60   # fw: resend to a device that still hasn't updated
+
+rollout_lock = threading.Lock()
+releases = {}        # target → {'sha': sha256 hex, 'started': unix time}
+device_builds = {}   # (mac, target) → sha256 the device last reported (?from= or If-None-Match)
+fw_sent = {}         # (mac, target) → (release sha, unix time of the fw: wakeup)
+
+def rollout_wave(mac):
+    if mac in ROLLOUT_CANARIES:
+        return 0
+    return 1 + zlib.crc32(mac.encode()) % (ROLLOUT_WAVES - 1)
+
+def rollout_offset(mac, sha):
+    """Seconds after a release starts that mac may take it."""
+    wave = rollout_wave(mac)
+    if wave == 0:
+        return 0
+    return wave * ROLLOUT_WAVE_S + zlib.crc32(f'{mac}:{sha}'.encode()) % ROLLOUT_JITTER_S
 
-        time.sleep(COMPILE_CHECK_INTERVAL)
+def rollout_hold(mac, target):
+    """Seconds until mac may take the served build of target; 0 once it may
+    (or when the request carries no MAC, as older boot scripts don't)."""
+    with rollout_lock:
+        rel = releases.get(target)
+    if rel is None or not mac:
+        return 0
+    return max(0.0, rel['started'] + rollout_offset(mac, rel['sha']) - time.time())
+
+def start_release(target):
+    sha = asset_etag(OTA_TARGETS[target])
+    with rollout_lock:
+        if releases.get(target, {}).get('sha') == sha:
+            return
+        releases[target] = {'sha': sha, 'started': time.time()}
+    print(f'[{time.strftime("%H:%M:%S")}] 🚦 Release {target} {sha[:8]}: canaries now, '
+          f'last wave from +{(ROLLOUT_WAVES - 1) * ROLLOUT_WAVE_S // 60} min')
+
+def note_build(mac, target, sha):
+    if mac and sha:
+        with rollout_lock:
+            device_builds[(mac, target)] = sha
+
+def rollout_due(mac, topics):
+    """(fw: topic to send mac now or None, seconds until one may be due or None).
+    Only devices whose build is known and out of date are woken."""
+    now = time.time()
+    soonest = None
+    with rollout_lock:
+        for topic in topics:
+            target = topic[3:]
+            rel = releases.get(target)
+            have = device_builds.get((mac, target))
+            if rel is None or have is None or have == rel['sha']:
+                continue
+            at = rel['started'] + rollout_offset(mac, rel['sha'])
+            sent = fw_sent.get((mac, target))
+            if sent and sent[0] == rel['sha']:
+                at = max(at, sent[1] + ROLLOUT_RENOTIFY_S)
+            if at <= now:
+                fw_sent[(mac, target)] = (rel['sha'], now)
+                return topic, None
+            soonest = at - now if soonest is None else min(soonest, at - now)
+    return None, soonest
+
+def _rollout_304(etag, hold):
+    """Keep what you have; with hold, try again after Retry-After seconds."""
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    if hold:
+        resp.headers['Retry-After'] = str(int(hold) + 1)
+    return resp
+
+def send_firmware(target):
+    """A .mpy route: send_asset, held back by the rollout for a device that
+    already has a build (If-None-Match) and whose slot hasn't opened."""
+    path = OTA_TARGETS[target]
+    mac = request.args.get('mac', '').upper()
+    have = next(iter(request.if_none_match), None)
+    note_build(mac, target, have)
+    if have and os.path.isfile(path) and have != asset_etag(path):
+        hold = rollout_hold(mac, target)
+        if hold:
+            return _rollout_304(have, hold)
+    return send_asset(path, 'application/octet-stream')
+
+@app.route('/manifest')
+def rollout_manifest():
+    """Per OTA target: the served build, its release time and, for ?mac=, the
+    device's wave, last known build and seconds until it may update."""
+    mac = request.args.get('mac', '').upper()
+    out = {}
+    for target, path in OTA_TARGETS.items():
+        if not os.path.isfile(path):
+            continue
+        with rollout_lock:
+            rel = releases.get(target)
+            have = device_builds.get((mac, target))
+        out[target] = {'sha': asset_etag(path), 'size': os.path.getsize(path),
+                       'started': rel['started'] if rel else None}
+        if mac:
+            out[target].update(wave=rollout_wave(mac), have=have,
+                               hold_s=round(rollout_hold(mac, target)))
+    return out
 
 
 # === UPDATE ENDPOINT ===
 @app.route('/update')
 def serve_update():
-    mac = request.args.get('mac')
+    mac = (request.args.get('mac') or '').upper()
     file_type = request.args.get('file')
-    if mac == '34:98:7A:07:12:B8':
-        try:
-            if file_type == 'secondary':
-                return send_file(SECONDARY_PY, mimetype='text/plain')
-            elif file_type == 'tertiary':
-                return send_file(TERTIARY_PY, mimetype='text/plain')
-            elif file_type == 'boot':
-                return send_file(BOOT_PY, mimetype='text/plain')
-        except:
-            abort(404)
+    if rollout_wave(mac) == 0:          # raw sources only go to canaries
+        if file_type == 'secondary':
+            return send_asset(SECONDARY_PY, 'text/plain')
+        elif file_type == 'tertiary':
+            return send_asset(TERTIARY_PY, 'text/plain')
+        elif file_type == 'boot':
+            return send_asset(BOOT_PY, 'text/plain')
     return "error"
 
 # === STATIC FILE ROUTES ===
 @app.route('/secondary.mpy')
 def serve_secondary_mpy():
-    if not os.path.isfile(SECONDARY_MPY): abort(404)
-    return send_file(SECONDARY_MPY, mimetype='application/octet-stream')
+    return send_firmware('secondary.mpy')
 
 @app.route('/boot.mpy')
 def serve_boot_mpy():
-    if not os.path.isfile(BOOT_MPY): abort(404)
-    return send_file(BOOT_MPY, mimetype='application/octet-stream')
+    return send_asset(BOOT_MPY, 'application/octet-stream')
 
 @app.route('/boot.py')
 def serve_boot_py_source():
     """Rect screens need SOURCE boot.py flashed to the device."""
-    if not os.path.isfile(BOOT_PY): abort(404)
-    return send_file(BOOT_PY, mimetype='text/plain')
+    return send_asset(BOOT_PY, 'text/plain')
 
 @app.route('/tertiary.mpy')
 def serve_tertiary_mpy():
-    if not os.path.isfile(TERTIARY_MPY): abort(404)
-    return send_file(TERTIARY_MPY, mimetype='application/octet-stream')
+    return send_firmware('tertiary.mpy')
 
 @app.route('/boot2.mpy')
 def serve_boot2_mpy():
-    boot2_mpy = os.path.join(REPO_DIR, 'boot2.mpy')
-    if not os.path.isfile(boot2_mpy):
-        abort(404)
-    return send_file(boot2_mpy, mimetype='application/octet-stream')
+    return send_asset(BOOT2_MPY, 'application/octet-stream')
 
 @app.route('/boot2.py')
 def serve_boot2_py():
-    boot2_py = os.path.join(REPO_DIR, 'boot2.py')
-    if not os.path.isfile(boot2_py):
-        abort(404)
-    return send_file(boot2_py, mimetype='text/plain')
+    return send_asset(BOOT2_PY, 'text/plain')
 
 @app.route('/')
 def index():
@@ -528,6 +1661,7 @@ if __name__ == '__main__':
     threading.Thread(target=compile_firmware_loop, daemon=True).start()
     threading.Thread(target=fetch_data, daemon=True).start()
     threading.Thread(target=cleanup_old_clients, daemon=True).start()
+    threading.Thread(target=watch_photo_library, daemon=True).start()
     print("✅ Full merged XH-C2X server starting on port 9019...")
     print("   (git sync disabled — local tree will not be reset)")
     app.run(host='0.0.0.0', port=9019, debug=False)
\ No newline at end of file